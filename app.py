@@ -5,6 +5,8 @@
 import os
 import time
 import asyncio
+import logging
+import threading
 from datetime import datetime
 from typing import List, Optional
 from dotenv import load_dotenv
@@ -51,7 +53,16 @@ from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 import json
 
-from tts_engine import generate_speech_from_api, AVAILABLE_VOICES, DEFAULT_VOICE, VOICE_TO_LANGUAGE, AVAILABLE_LANGUAGES
+from tts_engine import synthesize, AVAILABLE_VOICES, DEFAULT_VOICE, VOICE_TO_LANGUAGE, AVAILABLE_LANGUAGES
+from tts_engine import resolve_decode_mode
+from tts_engine import open_client, close_client, start_health_checks, BackendUnavailableError
+from tts_engine import initialize_engine, stop_decode_workers, warm_up, is_ready
+from tts_engine.logging_utils import configure_logging, request_context
+
+# Importing tts_engine already configured logging; this call only applies
+# ORPHEUS_LOG_LEVEL again, so the app does not depend on that import side effect
+configure_logging()
+logger = logging.getLogger("orpheus.app")
 
 # Create FastAPI app
 app = FastAPI(
@@ -60,9 +71,51 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# We'll use FastAPI's built-in startup complete mechanism
-# The log message "INFO:     Application startup complete." indicates
-# that the application is ready
+# The server accepts connections as soon as startup completes, while the engine
+# is still loading and warming up in the background; GET /ready turns 200 once
+# it is done, and speech endpoints answer 503 until then. If the engine fails
+# to load, both answer 500 with the error instead.
+_engine_error: Optional[str] = None
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag log records for this request with its id (X-Request-ID header if sent)"""
+    with request_context(request.headers.get("x-request-id")) as request_id:
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.exception_handler(BackendUnavailableError)
+async def backend_unavailable_handler(request: Request, exc: BackendUnavailableError):
+    """Fail fast with 503 when no LLM backend can take the request"""
+    headers = {"Retry-After": str(max(1, int(exc.retry_after + 0.999)))} if exc.retry_after else None
+    return JSONResponse(status_code=503, content={"error": str(exc)}, headers=headers)
+
+@app.on_event("startup")
+async def startup_event():
+    """Open the shared LLM connection pool and start backend health checks, then load and warm up the engine in the background"""
+    open_client()
+    start_health_checks()
+    threading.Thread(target=_prepare_engine, name="EngineInit", daemon=True).start()
+
+def _prepare_engine():
+    # torch, SNAC and any decode workers are loaded here rather than at import,
+    # so the server (and e.g. /v1/audio/voices) answers while they load
+    global _engine_error
+    try:
+        initialize_engine()
+    except Exception as e:
+        # Without this the probe would report warming_up forever
+        logger.exception(f"Engine failed to start: {e}")
+        _engine_error = f"{type(e).__name__}: {e}"
+        return
+    warm_up()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled LLM connections and stop decode workers"""
+    close_client()
+    stop_decode_workers()
 
 # Ensure directories exist
 os.makedirs("outputs", exist_ok=True)
@@ -82,6 +135,7 @@ class SpeechRequest(BaseModel):
     voice: str = DEFAULT_VOICE
     response_format: str = "wav"
     speed: float = 1.0
+    decode_mode: Optional[str] = None  # "sliding", "incremental" or "offline"; None uses ORPHEUS_FILE_DECODE_MODE
 
 class APIResponse(BaseModel):
     status: str
@@ -89,8 +143,24 @@ class APIResponse(BaseModel):
     output_file: str
     generation_time: float
 
+async def require_ready():
+    """Reject speech requests with 503 while the decoder is still warming up, or 500 if it failed to start"""
+    if _engine_error is not None:
+        raise HTTPException(status_code=500, detail=f"Engine failed to start: {_engine_error}")
+    if not is_ready():
+        raise HTTPException(status_code=503, detail="Decoder is warming up", headers={"Retry-After": "5"})
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the decoder has warmed up, 503 before, 500 if the engine failed to start"""
+    if _engine_error is not None:
+        return JSONResponse(status_code=500, content={"status": "failed", "error": _engine_error})
+    if not is_ready():
+        return JSONResponse(status_code=503, content={"status": "warming_up"}, headers={"Retry-After": "5"})
+    return JSONResponse(content={"status": "ready"})
+
 # OpenAI-compatible API endpoint
-@app.post("/v1/audio/speech")
+@app.post("/v1/audio/speech", dependencies=[Depends(require_ready)])
 async def create_speech_api(request: SpeechRequest):
     """
     Generate speech from text using the Orpheus TTS model.
@@ -101,6 +171,10 @@ async def create_speech_api(request: SpeechRequest):
     """
     if not request.input:
         raise HTTPException(status_code=400, detail="Missing input text")
+    try:
+        decode_mode = resolve_decode_mode(request.decode_mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Generate unique filename
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -109,16 +183,17 @@ async def create_speech_api(request: SpeechRequest):
     # Check if we should use batched generation
     use_batching = len(request.input) > 1000
     if use_batching:
-        print(f"Using batched generation for long text ({len(request.input)} characters)")
+        logger.info(f"Using batched generation for long text ({len(request.input)} characters)")
     
     # Generate speech with automatic batching for long texts
     start = time.time()
-    generate_speech_from_api(
+    await synthesize(
         prompt=request.input,
         voice=request.voice,
         output_file=output_path,
         use_batching=use_batching,
-        max_batch_chars=1000  # Process in ~1000 character chunks (roughly 1 paragraph)
+        max_batch_chars=1000,  # Process in ~1000 character chunks (roughly 1 paragraph)
+        decode_mode=decode_mode
     )
     end = time.time()
     generation_time = round(end - start, 2)
@@ -143,7 +218,7 @@ async def list_voices():
     )
 
 # Legacy API endpoint for compatibility
-@app.post("/speak")
+@app.post("/speak", dependencies=[Depends(require_ready)])
 async def speak(request: Request):
     """Legacy endpoint for compatibility with existing clients"""
     data = await request.json()
@@ -155,6 +230,10 @@ async def speak(request: Request):
             status_code=400, 
             content={"error": "Missing 'text'"}
         )
+    try:
+        decode_mode = resolve_decode_mode(data.get("decode_mode"))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_path = f"outputs/{voice}_{timestamp}.wav"
@@ -162,16 +241,17 @@ async def speak(request: Request):
     # Check if we should use batched generation for longer texts
     use_batching = len(text) > 1000
     if use_batching:
-        print(f"Using batched generation for long text ({len(text)} characters)")
+        logger.info(f"Using batched generation for long text ({len(text)} characters)")
     
     # Generate speech with batching for longer texts
     start = time.time()
-    generate_speech_from_api(
+    await synthesize(
         prompt=text, 
         voice=voice, 
         output_file=output_path,
         use_batching=use_batching,
-        max_batch_chars=1000
+        max_batch_chars=1000,
+        decode_mode=decode_mode
     )
     end = time.time()
     generation_time = round(end - start, 2)
@@ -258,7 +338,7 @@ async def restart_server():
         with open(restart_file, "w") as f:
             f.write(str(time.time()))
             
-        print("🔄 Restart flag created, server will reload momentarily...")
+        logger.info("🔄 Restart flag created, server will reload momentarily...")
     
     # Start the touch operation in a separate thread
     threading.Thread(target=touch_restart_file, daemon=True).start()
@@ -299,7 +379,7 @@ def get_current_config():
     
     return config
 
-@app.post("/web/", response_class=HTMLResponse)
+@app.post("/web/", response_class=HTMLResponse, dependencies=[Depends(require_ready)])
 async def generate_from_web(
     request: Request,
     text: str = Form(...),
@@ -324,11 +404,11 @@ async def generate_from_web(
     # Check if we should use batched generation for longer texts
     use_batching = len(text) > 1000
     if use_batching:
-        print(f"Using batched generation for long text from web form ({len(text)} characters)")
+        logger.info(f"Using batched generation for long text from web form ({len(text)} characters)")
     
     # Generate speech with batching for longer texts
     start = time.time()
-    generate_speech_from_api(
+    await synthesize(
         prompt=text, 
         voice=voice, 
         output_file=output_path,
@@ -360,35 +440,35 @@ if __name__ == "__main__":
     required_settings = ["ORPHEUS_HOST", "ORPHEUS_PORT"]
     missing_settings = [s for s in required_settings if s not in os.environ]
     if missing_settings:
-        print(f"⚠️ Missing environment variable(s): {', '.join(missing_settings)}")
-        print("   Using fallback values for server startup.")
+        logger.warning(f"⚠️ Missing environment variable(s): {', '.join(missing_settings)}")
+        logger.warning("   Using fallback values for server startup.")
     
     # Get host and port from environment variables with better error handling
     try:
         host = os.environ.get("ORPHEUS_HOST")
         if not host:
-            print("⚠️ ORPHEUS_HOST not set, using 0.0.0.0 as fallback")
+            logger.warning("⚠️ ORPHEUS_HOST not set, using 0.0.0.0 as fallback")
             host = "0.0.0.0"
     except Exception:
-        print("⚠️ Error reading ORPHEUS_HOST, using 0.0.0.0 as fallback")
+        logger.warning("⚠️ Error reading ORPHEUS_HOST, using 0.0.0.0 as fallback")
         host = "0.0.0.0"
         
     try:
         port = int(os.environ.get("ORPHEUS_PORT", "5005"))
     except (ValueError, TypeError):
-        print("⚠️ Invalid ORPHEUS_PORT value, using 5005 as fallback")
+        logger.warning("⚠️ Invalid ORPHEUS_PORT value, using 5005 as fallback")
         port = 5005
     
-    print(f"🔥 Starting Orpheus-FASTAPI Server on {host}:{port}")
-    print(f"💬 Web UI available at http://{host if host != '0.0.0.0' else 'localhost'}:{port}")
-    print(f"📖 API docs available at http://{host if host != '0.0.0.0' else 'localhost'}:{port}/docs")
+    logger.info(f"🔥 Starting Orpheus-FASTAPI Server on {host}:{port}")
+    logger.info(f"💬 Web UI available at http://{host if host != '0.0.0.0' else 'localhost'}:{port}")
+    logger.info(f"📖 API docs available at http://{host if host != '0.0.0.0' else 'localhost'}:{port}/docs")
     
     # Read current API_URL for user information
     api_url = os.environ.get("ORPHEUS_API_URL")
     if not api_url:
-        print("⚠️ ORPHEUS_API_URL not set. Please configure in .env file before generating speech.")
+        logger.warning("⚠️ ORPHEUS_API_URL not set. Please configure in .env file before generating speech.")
     else:
-        print(f"🔗 Using LLM inference server at: {api_url}")
+        logger.info(f"🔗 Using LLM inference server at: {api_url}")
         
     # Include restart.flag in the reload_dirs to monitor it for changes
     extra_files = ["restart.flag"] if os.path.exists("restart.flag") else []
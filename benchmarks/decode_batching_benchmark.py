@@ -0,0 +1,100 @@
+"""
+Decode throughput with and without cross-request batching.
+
+Starts N concurrent streams, each in its own thread running the same decoder
+the server uses (inference.tokens_decoder, or the incremental decoder with
+--mode incremental) over a synthetic token stream delivered in 7-token
+chunks. There is no LLM in the loop, so the run measures SNAC decode
+capacity. Each stream count runs once with per-request decodes (batching off)
+and once through a DecodeScheduler, and the script reports aggregate
+throughput, per-stream latency and how the batches formed.
+
+Usage:
+    python benchmarks/decode_batching_benchmark.py --streams 8,16,32 --frames 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_token_text
+from tts_engine import decode_scheduler, inference, speechpipe
+
+
+def run_streams(decoder, token_streams):
+    """Decode every stream in its own thread; returns (wall seconds, audio seconds, per-stream seconds)."""
+    audio_bytes = [0] * len(token_streams)
+    durations = [0.0] * len(token_streams)
+    barrier = threading.Barrier(len(token_streams))
+
+    def one(index, numbers):
+        async def token_gen():
+            for start in range(0, numbers.size, 7):
+                yield numbers[start:start + 7]
+
+        async def consume():
+            async for audio in decoder(token_gen()):
+                audio_bytes[index] += len(audio)
+
+        barrier.wait()
+        start = time.perf_counter()
+        asyncio.run(consume())
+        durations[index] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=one, args=(i, numbers)) for i, numbers in enumerate(token_streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return wall, sum(audio_bytes) / 2 / 24000, sorted(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNAC decode throughput with cross-request batching")
+    parser.add_argument("--streams", default="8,16,32", help="Comma-separated concurrent stream counts")
+    parser.add_argument("--frames", type=int, default=10, help="Frames (7 tokens each) per stream")
+    parser.add_argument("--mode", choices=inference.DECODE_MODES, default="sliding", help="Decoder to run")
+    parser.add_argument("--max-batch", type=int, default=decode_scheduler.MAX_BATCH, help="Scheduler max batch")
+    parser.add_argument("--max-wait-ms", type=float, default=decode_scheduler.MAX_WAIT_MS, help="Scheduler max wait")
+    parser.add_argument("--max-per-stream", type=int, default=decode_scheduler.MAX_PER_STREAM,
+                        help="Scheduler per-stream cap")
+    args = parser.parse_args()
+
+    decoder = inference.incremental_tokens_decoder if args.mode == "incremental" else inference.tokens_decoder
+    print(f"{args.mode} decoder, {args.frames} frames per stream, device {speechpipe.snac_device}")
+    print(f"{'streams':>7} {'batching':>8} {'wall s':>7} {'audio s':>8} {'x realtime':>10} {'stream p50 s':>12} "
+          f"{'stream max s':>12}  batches")
+    for count in (int(n) for n in args.streams.split(",")):
+        token_streams = [speechpipe.parse_custom_token_numbers("".join(make_token_text(args.frames * 7, seed=i)))
+                         for i in range(count)]
+        for batching in (False, True):
+            scheduler = None
+            if batching:
+                scheduler = decode_scheduler.DecodeScheduler(args.max_batch, args.max_wait_ms, args.max_per_stream)
+                decode_scheduler._scheduler = scheduler
+            decode_scheduler.DECODE_BATCHING = batching
+            try:
+                wall, audio, durations = run_streams(decoder, token_streams)
+            finally:
+                if scheduler is not None:
+                    scheduler.close()
+                    decode_scheduler._scheduler = None
+            summary = "-"
+            if scheduler is not None:
+                stats = scheduler.stats()
+                summary = (f"{stats['batches']} (mean {stats['mean_batch_size']:.1f}, sizes {stats['batch_sizes']}, "
+                           f"sent because {stats['dispatch_reasons']}, mean wait {stats['mean_wait_ms']:.1f} ms)")
+            print(f"{count:7d} {'on' if batching else 'off':>8} {wall:7.1f} {audio:8.1f} {audio / wall:10.2f} "
+                  f"{durations[len(durations) // 2]:12.1f} {durations[-1]:12.1f}  {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Quality and speed of the incremental SNAC decode mode against the sliding window.
+
+Runs one token stream through inference.tokens_decoder (sliding: a 28-token
+window every 7 tokens, one frame kept) and inference.incremental_tokens_decoder
+for several hop / context settings, then compares the audio over the frames
+both produce. The sliding decoder emits frames 1 .. F-3 of an F-frame
+stream; the incremental decoder also flushes the last frames, which are
+left out of the comparison.
+
+Each mode is also compared with one SNAC decode of the whole stream (full
+context for every frame), which neither streaming mode can beat.
+
+SNAC's decoder injects random noise, so two sliding runs with different
+seeds differ too; that "sliding vs sliding" SNR is the floor to compare the
+incremental settings against. --no-noise bypasses the noise blocks so the
+comparison measures only the error from the shorter decode contexts. Besides
+the overall SNR the harness reports the worst single-frame SNR, which
+catches clicks at hop boundaries.
+
+Pass --tokens-file with captured LLM output (text containing <custom_token_N>)
+to measure on real speech; the default is a deterministic synthetic stream,
+which exercises the mechanics but not perceptual quality.
+
+Usage:
+    python benchmarks/decode_quality_benchmark.py --tokens 700 --no-noise
+    python benchmarks/decode_quality_benchmark.py --tokens-file captured.txt --configs 4:1,4:2,8:2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_token_text
+from tts_engine import inference, speechpipe
+
+SAMPLES_PER_FRAME = speechpipe.SAMPLES_PER_FRAME
+
+
+def decode(decoder, numbers, seed, **kwargs):
+    """Run a decoder over the stream in 7-token chunks; returns (float audio, seconds)."""
+    async def token_gen():
+        for start in range(0, numbers.size, 7):
+            yield numbers[start:start + 7]
+
+    async def collect():
+        return [chunk async for chunk in decoder(token_gen(), **kwargs)]
+
+    torch.manual_seed(seed)
+    start = time.perf_counter()
+    chunks = asyncio.run(collect())
+    elapsed = time.perf_counter() - start
+    audio = np.frombuffer(b"".join(chunks), dtype=np.int16).astype(np.float64) / 32767.0
+    return audio, elapsed
+
+
+def snr_db(reference, test):
+    noise = np.sum((reference - test) ** 2)
+    if noise == 0:
+        return float("inf")
+    return 10 * np.log10(np.sum(reference ** 2) / noise)
+
+
+def compare(reference, test):
+    """Overall and worst per-frame SNR over the samples both signals cover."""
+    frames = min(reference.size, test.size) // SAMPLES_PER_FRAME
+    reference = reference[:frames * SAMPLES_PER_FRAME]
+    test = test[:frames * SAMPLES_PER_FRAME]
+    per_frame = [snr_db(reference[i:i + SAMPLES_PER_FRAME], test[i:i + SAMPLES_PER_FRAME])
+                 for i in range(0, reference.size, SAMPLES_PER_FRAME)]
+    return snr_db(reference, test), min(per_frame), frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental vs sliding-window SNAC decoding")
+    parser.add_argument("--tokens", type=int, default=700, help="Synthetic stream length (700 ~ 8.5 s of audio)")
+    parser.add_argument("--tokens-file", help="Captured LLM output containing <custom_token_N> entries")
+    parser.add_argument("--configs", default="2:1,4:1,4:2,8:2", help="Comma-separated hop:context frame pairs")
+    parser.add_argument("--seed", type=int, default=0, help="Torch seed for SNAC's noise")
+    parser.add_argument("--no-noise", action="store_true", help="Bypass SNAC's noise blocks")
+    args = parser.parse_args()
+
+    if args.no_noise:
+        from snac.layers import NoiseBlock
+        for module in speechpipe.model.modules():
+            if isinstance(module, NoiseBlock):
+                module.forward = lambda x: x
+
+    if args.tokens_file:
+        with open(args.tokens_file) as f:
+            text = f.read()
+    else:
+        text = "".join(make_token_text(args.tokens))
+    numbers = speechpipe.parse_custom_token_numbers(text)
+    frames = numbers.size // 7
+    print(f"{numbers.size} tokens, {frames} frames ({frames * SAMPLES_PER_FRAME / 24000:.1f} s of audio), "
+          f"device {speechpipe.snac_device}")
+
+    torch.manual_seed(args.seed)
+    token_ids = speechpipe.token_numbers_to_ids(numbers, 0).astype(np.int32)
+    full = np.frombuffer(speechpipe.decode_frames(token_ids, 1, frames - 1), dtype=np.int16) / 32767.0
+
+    reference, sliding_time = decode(inference.tokens_decoder, numbers, args.seed)
+    audio_seconds = reference.size / 24000
+    print(f"{'mode':22s} {'SNR dB':>8s} {'worst frame':>12s} {'vs full dB':>10s} {'frames cmp':>10s} "
+          f"{'decode s':>9s} {'x realtime':>10s} {'SNAC frames/out frame':>22s}")
+    print(f"{'sliding (reference)':22s} {'-':>8s} {'-':>12s} {compare(full, reference)[0]:10.1f} {'-':>10s} "
+          f"{sliding_time:9.2f} {audio_seconds / sliding_time:10.2f} {4:22.2f}")
+
+    floor, _ = decode(inference.tokens_decoder, numbers, args.seed + 1)
+    snr, worst, compared = compare(reference, floor)
+    print(f"{'sliding, other seed':22s} {snr:8.1f} {worst:12.1f} {compare(full, floor)[0]:10.1f} {compared:10d}")
+
+    for config in args.configs.split(","):
+        hop, context = (int(part) for part in config.split(":"))
+        audio, elapsed = decode(inference.incremental_tokens_decoder, numbers, args.seed,
+                                hop_frames=hop, context_frames=context)
+        snr, worst, compared = compare(reference, audio)
+        work = (hop + context + inference.DECODE_LOOKAHEAD_FRAMES) / hop
+        print(f"{f'incremental {hop}:{context}':22s} {snr:8.1f} {worst:12.1f} {compare(full, audio)[0]:10.1f} "
+              f"{compared:10d} {elapsed:9.2f} {audio.size / 24000 / elapsed:10.2f} {work:22.2f}")
+
+
+if __name__ == "__main__":
+    main()
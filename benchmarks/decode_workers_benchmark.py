@@ -0,0 +1,98 @@
+"""
+Scaling of the multi-process SNAC decode tier (tts_engine/decode_workers.py).
+
+Runs --clients concurrent threads (default: two per worker, so every worker
+always has a call queued behind the one it is decoding), each making --calls
+decodes of a --frames window. It first measures this in-process, as the
+server does without ORPHEUS_DECODE_WORKERS, and then through a
+DecodeWorkerPool of each size in --workers, pinned to disjoint core groups.
+
+Reports pool start-up time, decodes per second, speedup over in-process, and
+p50/p95 call latency. It also reports the round-trip overhead of one call
+through the shared-memory ring (1 worker, 1 client, against the same decode
+in-process).
+
+Usage:
+    python benchmarks/decode_workers_benchmark.py --workers 1,2,4,8 --frames 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_engine import decode_workers, speechpipe
+
+
+def run(decode, clients, windows, frames, calls):
+    latencies = [[] for _ in range(clients)]
+    start_barrier = threading.Barrier(clients + 1)
+
+    def client(index):
+        keep = [(0, frames)]
+        start_barrier.wait()
+        for call in range(calls):
+            start = time.perf_counter()
+            decode([windows[(index + call) % len(windows)]], frames, keep)
+            latencies[index].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, np.concatenate(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNAC decode throughput with 1..N worker processes")
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated pool sizes")
+    parser.add_argument("--clients", type=int, default=0, help="Concurrent callers (default: 2 per worker)")
+    parser.add_argument("--frames", type=int, default=4, help="Frames per decode window")
+    parser.add_argument("--calls", type=int, default=20, help="Decodes per client")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    windows = [speechpipe.deinterleave_codes(rng.integers(0, 4096, args.frames * 7).astype(np.int32))[0]
+               for _ in range(16)]
+    print(f"CPUs available {len(os.sched_getaffinity(0))}, {args.frames}-frame windows, {args.calls} calls per client")
+
+    # Round-trip overhead of the shared-memory path
+    pool = decode_workers.DecodeWorkerPool(1)
+    try:
+        _, local = run(speechpipe.decode_code_windows, 1, windows, args.frames, args.calls)
+        _, remote = run(pool.decode, 1, windows, args.frames, args.calls)
+    finally:
+        pool.close()
+    print(f"one call: in-process {np.median(local) * 1e3:.1f} ms, worker {np.median(remote) * 1e3:.1f} ms "
+          f"(+{(np.median(remote) - np.median(local)) * 1e3:.1f} ms round trip)")
+
+    print(f"{'workers':>8} {'clients':>8} {'start s':>8} {'decodes/s':>10} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        clients = args.clients or 2 * workers
+        elapsed, latencies = run(speechpipe.decode_code_windows, clients, windows, args.frames, args.calls)
+        baseline = len(latencies) / elapsed
+        print(f"{'in-proc':>8} {clients:8d} {'':>8} {baseline:10.1f} {1.0:7.2f}x "
+              f"{np.percentile(latencies, 50) * 1e3:8.1f} {np.percentile(latencies, 95) * 1e3:8.1f}")
+        start = time.perf_counter()
+        pool = decode_workers.DecodeWorkerPool(workers)
+        started = time.perf_counter() - start
+        try:
+            pool.decode([windows[0]], args.frames, [(0, args.frames)])
+            elapsed, latencies = run(pool.decode, clients, windows, args.frames, args.calls)
+        finally:
+            pool.close()
+        throughput = len(latencies) / elapsed
+        print(f"{workers:8d} {clients:8d} {started:8.1f} {throughput:10.1f} {throughput / baseline:7.2f}x "
+              f"{np.percentile(latencies, 50) * 1e3:8.1f} {np.percentile(latencies, 95) * 1e3:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
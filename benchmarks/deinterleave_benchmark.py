@@ -0,0 +1,114 @@
+"""
+Microbenchmark: SNAC code de-interleaving and validation in convert_to_audio.
+
+Compares the previous per-frame loop (seven scalar tensor writes per frame,
+then six torch.any range checks) with speechpipe.deinterleave_codes (one
+gather and one range check on the host, then a single tensor copy) for the
+window sizes the decoders use: 7, 28 and 49 tokens. Both must produce the
+same codes, and reject the same out-of-range windows. The full
+convert_to_audio time, including the SNAC decode, is shown for scale.
+
+Usage:
+    python benchmarks/deinterleave_benchmark.py --device cpu
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_engine import speechpipe
+
+
+def legacy_codes(multiframe, device):
+    # The previous de-interleave and validation from convert_to_audio
+    num_frames = len(multiframe) // 7
+    frame = multiframe[:num_frames * 7]
+    codes_0 = torch.zeros(num_frames, dtype=torch.int32, device=device)
+    codes_1 = torch.zeros(num_frames * 2, dtype=torch.int32, device=device)
+    codes_2 = torch.zeros(num_frames * 4, dtype=torch.int32, device=device)
+    frame_tensor = torch.tensor(frame, dtype=torch.int32, device=device)
+    for j in range(num_frames):
+        idx = j * 7
+        codes_0[j] = frame_tensor[idx]
+        codes_1[j * 2] = frame_tensor[idx + 1]
+        codes_1[j * 2 + 1] = frame_tensor[idx + 4]
+        codes_2[j * 4] = frame_tensor[idx + 2]
+        codes_2[j * 4 + 1] = frame_tensor[idx + 3]
+        codes_2[j * 4 + 2] = frame_tensor[idx + 5]
+        codes_2[j * 4 + 3] = frame_tensor[idx + 6]
+    codes = [codes_0.unsqueeze(0), codes_1.unsqueeze(0), codes_2.unsqueeze(0)]
+    if (torch.any(codes[0] < 0) or torch.any(codes[0] > 4096) or
+            torch.any(codes[1] < 0) or torch.any(codes[1] > 4096) or
+            torch.any(codes[2] < 0) or torch.any(codes[2] > 4096)):
+        return None
+    return codes
+
+
+def current_codes(multiframe, device):
+    # The same steps convert_to_audio now runs before model.decode
+    deinterleaved = speechpipe.deinterleave_codes(multiframe)
+    if deinterleaved is None:
+        return None
+    host_codes, num_frames = deinterleaved
+    codes_tensor = torch.from_numpy(host_codes).to(device)
+    return [codes_tensor[:num_frames].unsqueeze(0),
+            codes_tensor[num_frames:3 * num_frames].unsqueeze(0),
+            codes_tensor[3 * num_frames:].unsqueeze(0)]
+
+
+def same(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return all(torch.equal(x.cpu(), y.cpu()) for x, y in zip(a, b))
+
+
+def check(device, rng):
+    for size in (7, 28, 49, 52):
+        window = rng.integers(0, 4097, size=size).astype(np.int32)
+        assert same(legacy_codes(window.tolist(), device), current_codes(window, device))
+        for bad in (-1, 4097, -2 ** 31):
+            broken = window.copy()
+            broken[rng.integers(0, size - size % 7)] = bad
+            assert legacy_codes(broken.tolist(), device) is None
+            assert current_codes(broken, device) is None
+        edge = window.copy()
+        edge[0] = 4096
+        assert same(legacy_codes(edge.tolist(), device), current_codes(edge, device))
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="De-interleave + validation cost per window")
+    parser.add_argument("--device", default="cpu", help="Device for the code tensors (cpu, cuda, mps)")
+    parser.add_argument("--number", type=int, default=2000, help="Calls per timing")
+    parser.add_argument("--decode-number", type=int, default=20, help="Calls per full convert_to_audio timing")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    check(args.device, rng)
+    print(f"Codes and rejections identical to the previous loop on {args.device}")
+
+    print(f"{'window':>6}  {'loop + 6x any':>14}  {'gather + 1 check':>17}  {'speedup':>7}  {'full convert':>13}")
+    for size in (7, 28, 49):
+        window = rng.integers(0, 4096, size=size).astype(np.int32)
+        window_list = window.tolist()
+        old = per_call(lambda: legacy_codes(window_list, args.device), args.number)
+        new = per_call(lambda: current_codes(window, args.device), args.number)
+        full = None
+        if args.device == speechpipe.snac_device:
+            full = per_call(lambda: speechpipe.convert_to_audio(window, size), args.decode_number)
+        full_text = f"{full * 1e3:10.2f} ms" if full is not None else "           -"
+        print(f"{size:6d}  {old * 1e6:11.1f} us  {new * 1e6:14.1f} us  {old / new:6.1f}x  {full_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Latency of cheap requests (GET /v1/audio/voices) while the server is busy
+with long syntheses.
+
+Starts the server with uvicorn (one worker) against a mock LLM backend
+that streams its tokens slowly, so each synthesis takes several seconds.
+A probe requests /v1/audio/voices every --interval seconds, first with the
+server idle and then while --syntheses POST /v1/audio/speech requests run
+at once. The probe's p50/p95/max latency is reported for both phases,
+along with how long each synthesis took.
+
+When the endpoints run synthesis on the event loop, every probe during a
+synthesis waits for it to finish. With synthesize() the probe stays at
+its idle latency. To compare against another checkout (e.g. a git
+worktree of an older commit), pass it with --root.
+
+The server runs in a scratch directory so app.py's .env handling does not
+touch the checkout.
+
+Usage:
+    python benchmarks/event_loop_benchmark.py --syntheses 4 --tokens 700 --token-delay 0.005
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import free_port, spawn_server_process
+
+
+def probe(url, interval, stop):
+    """GET url every interval seconds until stop is set; returns the latencies in ms."""
+    latencies = []
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            session.get(url, timeout=600).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+            stop.wait(interval)
+    return latencies
+
+
+def summary(latencies):
+    return (f"p50 {np.percentile(latencies, 50):7.1f}  p95 {np.percentile(latencies, 95):7.1f}  "
+            f"max {max(latencies):7.1f} ms  ({len(latencies)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of /v1/audio/voices during long syntheses")
+    parser.add_argument("--root", default=ROOT, help="Checkout to serve (default: this one)")
+    parser.add_argument("--syntheses", type=int, default=4, help="Concurrent speech requests")
+    parser.add_argument("--tokens", type=int, default=700, help="Tokens the mock backend generates per request")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed tokens")
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between probes")
+    parser.add_argument("--idle", type=float, default=3.0, help="Seconds to probe the idle server")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the server")
+    args = parser.parse_args()
+
+    backend_port = free_port()
+    backend = spawn_server_process(backend_port, "--tokens", args.tokens, "--token-delay", args.token_delay)
+    port = free_port()
+    env = dict(os.environ, ORPHEUS_API_URL=f"http://127.0.0.1:{backend_port}/v1/completions",
+               ORPHEUS_API_KEY="benchmark",
+               PYTHONPATH=os.pathsep.join(filter(None, [os.path.abspath(args.root), os.environ.get("PYTHONPATH")])))
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as scratch:
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+                                   "--port", str(port)], cwd=scratch, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.perf_counter() + args.timeout
+            while True:
+                if server.poll() is not None or time.perf_counter() > deadline:
+                    raise RuntimeError("Server did not become ready")
+                try:
+                    if requests.get(f"{base}/ready", timeout=5).status_code == 200:
+                        break
+                except requests.ConnectionError:
+                    pass
+                time.sleep(0.2)
+
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                idle = pool.submit(probe, f"{base}/v1/audio/voices", args.interval, stop)
+                time.sleep(args.idle)
+                stop.set()
+                idle = idle.result()
+
+            def speak(index):
+                start = time.perf_counter()
+                response = requests.post(f"{base}/v1/audio/speech", timeout=args.timeout,
+                                         json={"input": f"Event loop benchmark request {index}.", "voice": "tara"})
+                response.raise_for_status()
+                return time.perf_counter() - start
+
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=args.syntheses + 1) as pool:
+                busy = pool.submit(probe, f"{base}/v1/audio/voices", args.interval, stop)
+                syntheses = list(pool.map(speak, range(args.syntheses)))
+                stop.set()
+                busy = busy.result()
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            backend.terminate()
+
+    print(f"Serving {args.root}")
+    print(f"{'idle':<22} {summary(idle)}")
+    print(f"{f'during {args.syntheses} syntheses':<22} {summary(busy)}")
+    print(f"synthesis time: {', '.join(f'{seconds:.2f}' for seconds in syntheses)} s")
+
+
+if __name__ == "__main__":
+    main()
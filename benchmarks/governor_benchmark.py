@@ -0,0 +1,90 @@
+"""
+SNAC decode throughput and latency under concurrency, with and without the
+thread-budget governor (tts_engine/governor.py).
+
+For each concurrency level, that many threads (one per simulated request)
+each run --calls decodes of a --frames window through
+speechpipe.decode_code_windows. Two settings are compared:
+
+- ungoverned: torch intra-op threads = host core count, no limit on
+  concurrent decodes (the behaviour before the governor);
+- governed: the governor's threads and decode slots, sized from the CPU
+  budget (cgroup quota / affinity, or ORPHEUS_CPU_BUDGET).
+
+Reports decodes per second, p50/p95 call latency (slot wait included) and
+the mean time a call waited for a decode slot.
+
+Usage:
+    python benchmarks/governor_benchmark.py --concurrency 1,2,4,8,16,32 --frames 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_engine import governor, speechpipe
+
+
+def run(concurrency, windows, frames, calls):
+    latencies = [[] for _ in range(concurrency)]
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index):
+        keep = [(0, frames)]
+        start_barrier.wait()
+        for call in range(calls):
+            start = time.perf_counter()
+            speechpipe.decode_code_windows([windows[(index + call) % len(windows)]], frames, keep)
+            latencies[index].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, np.concatenate(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent SNAC decodes with and without the governor")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Comma-separated concurrent decode threads")
+    parser.add_argument("--frames", type=int, default=4, help="Frames per decode window")
+    parser.add_argument("--calls", type=int, default=20, help="Decodes per thread")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    windows = [speechpipe.deinterleave_codes(rng.integers(0, 4096, args.frames * 7).astype(np.int32))[0]
+               for _ in range(16)]
+    host_cores = os.cpu_count() or 1
+    settings = {
+        "ungoverned": (host_cores, 1_000_000),
+        "governed": (governor.INTRA_OP_THREADS, governor.DECODE_SLOTS),
+    }
+
+    print(f"host cores {host_cores}, CPU budget {governor.CPU_BUDGET} ({governor.CPU_BUDGET_SOURCE}), "
+          f"governed: {governor.INTRA_OP_THREADS} threads x {governor.DECODE_SLOTS} slots, "
+          f"{args.frames}-frame windows, {args.calls} calls per thread")
+    print(f"{'setting':>10} {'conc':>5} {'decodes/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'slot wait ms':>13}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        for label, (threads, slots) in settings.items():
+            governor.configure(intra_op_threads=threads)
+            speechpipe.decode_code_windows([windows[0]], args.frames, [(0, args.frames)])
+            governor.configure(decode_slots=slots)
+            elapsed, latencies = run(concurrency, windows, args.frames, args.calls)
+            stats = governor.decode_slot_stats()
+            print(f"{label:>10} {concurrency:5d} {len(latencies) / elapsed:10.1f} "
+                  f"{np.percentile(latencies, 50) * 1e3:8.1f} {np.percentile(latencies, 95) * 1e3:8.1f} "
+                  f"{stats['mean_wait_ms']:13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Tail latency with and without hedged requests.
+
+Starts several mock replicas where a small share of requests stall before
+their first token (--stall-probability / --stall-delay). The same workload
+then runs without and with hedging, and the script reports time-to-first-chunk
+percentiles, total latency, and the hedging counters (share of extra requests
+sent versus the budget).
+
+Usage:
+    python benchmarks/hedging_benchmark.py --requests 400 --stall-probability 0.03
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import free_port, spawn_server_process
+
+TEXT = "Hello there, this is a hedging test."
+
+
+async def run_workload(inference, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    first_chunk, latencies = [], []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            first = None
+            async for _ in inference.agenerate_tokens_from_api(TEXT, max_tokens=8192):
+                if first is None:
+                    first = time.perf_counter() - start
+            first_chunk.append(first if first is not None else float("inf"))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return sorted(first_chunk), sorted(latencies)
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged requests against stalling mock backends")
+    parser.add_argument("--backends", type=int, default=3, help="Mock replicas to start")
+    parser.add_argument("--requests", type=int, default=400, help="Generations per run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Generations in flight")
+    parser.add_argument("--stall-probability", type=float, default=0.03, help="Chance a request stalls")
+    parser.add_argument("--stall-delay", type=float, default=1.0, help="Stall length in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.0002, help="Seconds per streamed token")
+    parser.add_argument("--budget", type=float, default=5.0, help="ORPHEUS_HEDGE_BUDGET_PERCENT")
+    parser.add_argument("--percentile", type=float, default=95.0, help="ORPHEUS_HEDGE_PERCENTILE")
+    args = parser.parse_args()
+
+    procs, urls = [], []
+    for i in range(args.backends):
+        port = free_port()
+        procs.append(spawn_server_process(port, "--tokens-per-char", 6, "--token-delay", args.token_delay,
+                                          "--stall-probability", args.stall_probability,
+                                          "--stall-delay", args.stall_delay, "--seed", i))
+        urls.append(f"http://127.0.0.1:{port}/v1/completions")
+    os.environ["ORPHEUS_API_URLS"] = ",".join(urls)
+    os.environ["ORPHEUS_HEDGE_BUDGET_PERCENT"] = str(args.budget)
+    os.environ["ORPHEUS_HEDGE_PERCENTILE"] = str(args.percentile)
+    os.environ.setdefault("ORPHEUS_LOG_LEVEL", "WARNING")
+
+    from tts_engine import backends, http_client, inference
+
+    async def set_hedging(enabled):
+        # Fresh counters, but keep the first-chunk latencies seen so far
+        pool = backends.get_pool()
+        samples = pool.hedging._samples
+        pool.hedging = backends.HedgePolicy(enabled=enabled)
+        pool.hedging._samples.extend(samples)
+        return pool
+
+    print(f"{args.backends} backends, {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.stall_probability:.0%} of requests stall {args.stall_delay}s")
+    try:
+        # Warm up: fills the first-chunk latency window used for the hedge delay
+        http_client.run_coroutine(set_hedging(False))
+        http_client.run_coroutine(run_workload(inference, 50, args.concurrency))
+        for enabled in (False, True):
+            pool = http_client.run_coroutine(set_hedging(enabled))
+            first, total = http_client.run_coroutine(run_workload(inference, args.requests, args.concurrency))
+            stats = pool.hedging.stats()
+            print(f"hedging {'on ' if enabled else 'off'}  first chunk p50 {percentile(first, 50) * 1000:7.1f} ms  "
+                  f"p99 {percentile(first, 99) * 1000:7.1f} ms  max {first[-1] * 1000:7.1f} ms  |  "
+                  f"total p99 {percentile(total, 99) * 1000:7.1f} ms  |  hedges {stats['hedges_sent']} "
+                  f"({stats['hedge_rate']:.1%}), won {stats['hedges_won']}, "
+                  f"skipped for budget {stats['hedges_skipped_budget']}")
+    finally:
+        http_client.close_client()
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Requests/sec against a local mock backend: a new requests.Session() per call
+(the previous generate_tokens_from_api behaviour) versus the shared httpx pool
+in tts_engine.http_client.
+
+Usage:
+    python benchmarks/http_pool_benchmark.py --requests 500 --concurrency 8
+
+--connect-delay adds a simulated handshake cost to every new connection on the
+mock, approximating TLS to a remote (e.g. RunPod) backend. On bare loopback
+connection setup is almost free and the two approaches are close.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import free_port, spawn_server_process
+from tts_engine import http_client
+
+PAYLOAD = {"input": {"prompt": "<|audio|>tara: hi<|eot_id|>", "max_tokens": 70, "stream": False}}
+
+
+def per_call_session(url):
+    # One Session per call, as generate_tokens_from_api used to do
+    session = requests.Session()
+    response = session.post(url, json=PAYLOAD, timeout=30)
+    response.raise_for_status()
+    response.json()
+    session.close()
+
+
+def bench_per_call_sessions(url, total, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: per_call_session(url), range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def _pooled(url, total, concurrency):
+    client = http_client.get_client()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.post(url, json=PAYLOAD, timeout=30)
+            response.raise_for_status()
+            response.json()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def bench_shared_pool(url, total, concurrency):
+    return http_client.run_coroutine(_pooled(url, total, concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call session vs shared connection pool")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--connect-delay", type=float, default=0.02, help="Mock handshake cost per new connection (s)")
+    parser.add_argument("--url", type=str, default=None, help="Existing backend URL (default: start a mock)")
+    args = parser.parse_args()
+
+    url = args.url
+    server = None
+    if url is None:
+        port = free_port()
+        server = spawn_server_process(port, "--tokens", 70, "--connect-delay", args.connect_delay)
+        url = f"http://127.0.0.1:{port}/v1/completions"
+
+    # Warm up both paths once
+    per_call_session(url)
+    bench_shared_pool(url, 1, 1)
+
+    old_rps = bench_per_call_sessions(url, args.requests, args.concurrency)
+    new_rps = bench_shared_pool(url, args.requests, args.concurrency)
+    http_client.close_client()
+    if server is not None:
+        server.terminate()
+
+    print(f"Backend: {url}")
+    print(f"Requests: {args.requests}, concurrency: {args.concurrency}")
+    print(f"Per-call requests.Session: {old_rps:8.1f} req/s")
+    print(f"Shared httpx pool:         {new_rps:8.1f} req/s ({new_rps / old_rps:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
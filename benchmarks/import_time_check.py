@@ -0,0 +1,78 @@
+"""
+Import-time budget for the tts_engine package.
+
+Importing tts_engine must stay cheap: torch, SNAC and the hardware probes are
+loaded by initialize_engine(), not as a side effect of the import, so
+`--list-voices`, /v1/audio/voices and the server's startup do not wait for
+them. This script imports the package in fresh interpreters with
+`python -X importtime`, takes the best cumulative time of --runs attempts and
+lists the slowest modules. It exits with status 1 if the import takes longer
+than --max-seconds or pulls in any of the heavy modules.
+
+Run it from a clean environment: a sitecustomize that imports torch would be
+counted against the package.
+
+Usage:
+    python benchmarks/import_time_check.py --max-seconds 1.0
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that initialize_engine() loads and a plain import must not
+HEAVY_MODULES = ("torch", "snac", "psutil", "sounddevice", "onnxruntime")
+
+# Logging goes to stdout too, so the result line is tagged
+PROBE = ("import sys, tts_engine; "
+         f"print('HEAVY:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+
+
+def import_once():
+    """(cumulative seconds, {module: cumulative seconds}, heavy modules loaded) for one fresh import."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (field.strip() for field in line[len("import time:"):].split("|"))
+        modules[name] = int(cumulative) / 1e6
+    loaded = [line[len("HEAVY:"):] for line in result.stdout.splitlines() if line.startswith("HEAVY:")][-1]
+    heavy = [module for module in loaded.split(",") if module]
+    return modules["tts_engine"], modules, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing tts_engine is too slow or too heavy")
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="Import-time budget")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh imports; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    args = parser.parse_args()
+
+    runs = [import_once() for _ in range(args.runs)]
+    seconds, modules, heavy = min(runs, key=lambda run: run[0])
+    print(f"import tts_engine: {seconds * 1000:.0f} ms (best of {args.runs}; "
+          f"all runs {', '.join(f'{run[0] * 1000:.0f}' for run in runs)} ms)")
+    print("slowest modules (cumulative):")
+    for name, elapsed in sorted(modules.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {elapsed * 1000:8.1f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: importing tts_engine loaded {', '.join(heavy)}; load them in initialize_engine()")
+        failed = True
+    if seconds > args.max_seconds:
+        print(f"FAIL: import took {seconds:.2f} s, over the {args.max_seconds:g} s budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"OK: import within {args.max_seconds:g} s and no heavy modules loaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Decoder-loop throughput with logging at INFO versus DEBUG.
+
+Runs inference.tokens_decoder over a synthetic token stream with
+convert_to_audio replaced by a stub, so the numbers cover only the per-chunk
+bookkeeping and logging, not SNAC. Log output goes to /dev/null through the
+normal request-id formatter, so formatting cost is included.
+
+Usage:
+    python benchmarks/logging_benchmark.py --tokens 70000 --chunk-size 1
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_token_text
+from tts_engine import inference, speechpipe
+from tts_engine.logging_utils import LOG_FORMAT, RequestIdFilter, request_context
+
+
+def make_chunks(num_tokens, chunk_size):
+    numbers = speechpipe.parse_custom_token_numbers("".join(make_token_text(num_tokens)))
+    return [numbers[i:i + chunk_size] for i in range(0, len(numbers), chunk_size)]
+
+
+async def _drain(chunks):
+    async def token_gen():
+        for chunk in chunks:
+            yield chunk
+
+    produced = 0
+    async for _ in inference.tokens_decoder(token_gen()):
+        produced += 1
+    return produced
+
+
+def run(chunks, level, repeat):
+    logging.getLogger().setLevel(level)
+    best = float("inf")
+    for _ in range(repeat):
+        with request_context("bench"):
+            start = time.perf_counter()
+            asyncio.run(_drain(chunks))
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tokens_decoder throughput at INFO vs DEBUG")
+    parser.add_argument("--tokens", type=int, default=70000, help="Tokens per run")
+    parser.add_argument("--chunk-size", type=int, default=1, help="Tokens per chunk (1 = one SSE event per token)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per level (best is reported)")
+    args = parser.parse_args()
+
+    # Send everything to /dev/null through the usual formatter
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    devnull = open(os.devnull, "w")
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RequestIdFilter())
+    root.addHandler(handler)
+
+    # Only the decoder loop is measured
+    inference.convert_to_audio = lambda multiframe, count: b"\x00"
+
+    chunks = make_chunks(args.tokens, args.chunk_size)
+    info = run(chunks, logging.INFO, args.repeat)
+    debug = run(chunks, logging.DEBUG, args.repeat)
+    devnull.close()
+
+    total = sum(len(c) for c in chunks)
+    print(f"Tokens: {total} in {len(chunks)} chunks")
+    print(f"INFO:  {total / info:12.0f} tokens/s ({info * 1000:.1f} ms)")
+    print(f"DEBUG: {total / debug:12.0f} tokens/s ({debug * 1000:.1f} ms, {debug / info:.2f}x the INFO time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Wall-clock time of a multi-paragraph text with its batches generated one
+after another versus ORPHEUS_BATCH_CONCURRENCY at once.
+
+Runs generate_speech_from_api on --paragraphs paragraphs of generated
+sentences, batched at --max-batch-chars characters as the API endpoints do.
+It runs against a mock LLM backend that streams --tokens-per-char tokens per
+prompt character, --token-delay seconds apart. Each concurrency level writes
+a WAV file, and all must be identical: batches are reassembled in order
+whichever finishes first. SNAC's noise blocks draw from the global torch
+RNG on every decode, which concurrent batches do in a different order, so
+they are bypassed here to make the files comparable byte for byte.
+
+Usage:
+    python benchmarks/long_text_benchmark.py --paragraphs 8 --concurrency 1,2,4,8
+"""
+
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import free_port, spawn_server_process
+
+
+def fixture(paragraphs, sentences):
+    return "\n\n".join(
+        " ".join(f"Paragraph {p + 1}, sentence {s + 1} of the long text benchmark, which goes on for a while."
+                 for s in range(sentences))
+        for p in range(paragraphs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential versus concurrent long-text batches")
+    parser.add_argument("--paragraphs", type=int, default=8, help="Paragraphs in the fixture")
+    parser.add_argument("--sentences", type=int, default=10, help="Sentences per paragraph (~90 characters each)")
+    parser.add_argument("--max-batch-chars", type=int, default=1000, help="Batch size, as used by the endpoints")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated ORPHEUS_BATCH_CONCURRENCY values")
+    parser.add_argument("--tokens-per-char", type=float, default=1.0, help="Tokens the mock backend generates per character")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed tokens")
+    parser.add_argument("--decode-mode", default=None, help="Decode mode (default: ORPHEUS_FILE_DECODE_MODE)")
+    args = parser.parse_args()
+
+    port = free_port()
+    backend = spawn_server_process(port, "--tokens-per-char", args.tokens_per_char, "--token-delay", args.token_delay)
+    os.environ["ORPHEUS_API_URL"] = f"http://127.0.0.1:{port}/v1/completions"
+    os.environ.setdefault("ORPHEUS_API_KEY", "benchmark")
+    from tts_engine import inference, initialize_engine, speechpipe, warm_up
+
+    text = fixture(args.paragraphs, args.sentences)
+    try:
+        initialize_engine()
+        from snac.layers import NoiseBlock
+        for module in speechpipe.model.modules():
+            if isinstance(module, NoiseBlock):
+                module.forward = lambda x: x
+        warm_up()
+        with tempfile.TemporaryDirectory() as scratch:
+            results = []
+            for concurrency in (int(value) for value in args.concurrency.split(",")):
+                inference.BATCH_CONCURRENCY = concurrency
+                output_file = os.path.join(scratch, f"concurrency_{concurrency}.wav")
+                start = time.perf_counter()
+                ok, error = inference.generate_speech_from_api(text, output_file=output_file, use_batching=True,
+                                                               max_batch_chars=args.max_batch_chars,
+                                                               decode_mode=args.decode_mode)
+                elapsed = time.perf_counter() - start
+                if not ok:
+                    raise RuntimeError(f"Generation failed at concurrency {concurrency}: {error}")
+                results.append((concurrency, elapsed, output_file))
+
+            print(f"{len(text)} characters, {args.paragraphs} paragraphs, "
+                  f"batches of up to {args.max_batch_chars} characters")
+            baseline = results[0][1]
+            failed = False
+            for concurrency, elapsed, output_file in results:
+                same = filecmp.cmp(results[0][2], output_file, shallow=False)
+                print(f"  {concurrency:>2} at once: {elapsed:7.2f} s  ({baseline / elapsed:4.1f}x)  "
+                      f"{os.path.getsize(output_file)} bytes{'' if same else '  DIFFERENT OUTPUT'}")
+                if not same:
+                    failed = True
+    finally:
+        backend.terminate()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Stand-in for the Orpheus LLM backend used by the benchmarks.
+
+Speaks just enough of the OpenAI-compatible /v1/completions protocol to drive
+tts_engine: an SSE stream when the request asks for "stream": true, and the
+RunPod-style JSON body ({"output": [{"output": {"generated_text": ...}}]})
+otherwise. Generated tokens are valid SNAC codes, so the full decode pipeline
+can run against it.
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 1234 --tokens 700 --token-delay 0.005
+    ORPHEUS_API_URL=http://127.0.0.1:1234/v1/completions python -m tts_engine.inference --text "Hello"
+"""
+
+import argparse
+import contextlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_token_text(num_tokens, seed=0):
+    """Build a deterministic string of <custom_token_N> entries with valid SNAC codes."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(num_tokens):
+        # Position-dependent offset mirrors speechpipe.turn_token_into_id
+        number = 10 + (i % 7) * 4096 + rng.randint(1, 4095)
+        parts.append(f"<custom_token_{number}>")
+    return parts
+
+
+class MockBackendHandler(BaseHTTPRequestHandler):
+    """Request handler; behaviour is configured through the server attributes."""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY, reused
+    # keep-alive connections stall on Nagle + delayed ACK (~40 ms per request)
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # Simulated per-connection handshake cost (TLS + RTT to a remote backend)
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", "/v1/models"):
+            if self.server.healthy:
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(503, {"status": "unavailable"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        request = body.get("input", body)
+        with self.server.lock:
+            self.server.request_count += 1
+
+        if not self.server.healthy:
+            self._send_json(503, {"error": "backend unavailable"})
+            return
+
+        max_tokens = int(request.get("max_tokens", self.server.num_tokens))
+        num_tokens = self.server.num_tokens
+        if self.server.tokens_per_char:
+            # Output length follows the text, like the real model
+            num_tokens = int(len(request.get("prompt", "")) * self.server.tokens_per_char)
+        tokens = make_token_text(min(num_tokens, max_tokens), seed=self.server.seed)
+
+        # Like llama.cpp -np N: at most `slots` generations run at once, the rest queue
+        with self.server.slots:
+            self._generate(request, tokens)
+
+    def _generate(self, request, tokens):
+        if self.server.first_token_delay:
+            time.sleep(self.server.first_token_delay)
+        # Occasional long pause before the first token (GC, swapping, a stuck batch)
+        if self.server.stall_probability and random.random() < self.server.stall_probability:
+            time.sleep(self.server.stall_delay)
+
+        if request.get("stream"):
+            if self.server.reject_stream:
+                self._send_json(400, {"error": "streaming not supported"})
+                return
+            self._send_stream(tokens)
+        else:
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json(200, {"output": [{"output": {"generated_text": "".join(tokens)}}]})
+
+    def _send_json(self, status, data):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, tokens):
+        # Chunked encoding keeps the connection reusable after the stream ends
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        text = "".join(tokens)
+        # Optionally cut events mid-token to exercise partial-token handling
+        if self.server.split_tokens:
+            step = max(1, len(text) // max(1, len(tokens)) // 2 + 3)
+            pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        else:
+            pieces = tokens
+        for piece in pieces:
+            event = {"choices": [{"text": piece, "index": 0, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockBackendServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog (5) drops connections under benchmark load
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients hang up mid-stream on purpose (cancelled hedges, killed runs)
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(port=0, num_tokens=700, token_delay=0.0, first_token_delay=0.0,
+                 reject_stream=False, split_tokens=False, seed=0, verbose=False, connect_delay=0.0,
+                 slots=0, tokens_per_char=0.0, stall_probability=0.0, stall_delay=1.0):
+    """Start a mock backend in a daemon thread and return the server object.
+
+    The bound port is available as server.server_address[1].
+    """
+    server = MockBackendServer(("127.0.0.1", port), MockBackendHandler)
+    server.num_tokens = num_tokens
+    server.token_delay = token_delay
+    server.first_token_delay = first_token_delay
+    server.reject_stream = reject_stream
+    server.split_tokens = split_tokens
+    server.seed = seed
+    server.connect_delay = connect_delay
+    server.slots = threading.BoundedSemaphore(slots) if slots > 0 else contextlib.nullcontext()
+    server.tokens_per_char = tokens_per_char
+    server.stall_probability = stall_probability
+    server.stall_delay = stall_delay
+    server.verbose = verbose
+    server.healthy = True
+    server.request_count = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True, name="MockBackend").start()
+    return server
+
+
+def spawn_server_process(port, *extra_args):
+    """Run a mock backend in a separate process (so it doesn't share the caller's GIL).
+
+    Returns the Popen handle once the port accepts connections.
+    """
+    import socket
+    import subprocess
+
+    proc = subprocess.Popen([sys.executable, __file__, "--port", str(port), *map(str, extra_args)],
+                            stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"Mock backend on port {port} did not start")
+
+
+def free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Orpheus LLM backend for benchmarks")
+    parser.add_argument("--port", type=int, default=1234, help="Port to listen on")
+    parser.add_argument("--tokens", type=int, default=700, help="Tokens generated per request")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--reject-stream", action="store_true", help="Answer streaming requests with 400")
+    parser.add_argument("--split-tokens", action="store_true", help="Split tokens across SSE events")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generated codes")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="Simulated handshake cost per new connection")
+    parser.add_argument("--slots", type=int, default=0, help="Concurrent generations (0 = unlimited)")
+    parser.add_argument("--tokens-per-char", type=float, default=0.0,
+                        help="Generate this many tokens per prompt character instead of --tokens")
+    parser.add_argument("--stall-probability", type=float, default=0.0,
+                        help="Chance that a request stalls before its first token")
+    parser.add_argument("--stall-delay", type=float, default=1.0, help="Length of a stall in seconds")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.tokens, args.token_delay, args.first_token_delay,
+                          args.reject_stream, args.split_tokens, args.seed, args.verbose,
+                          args.connect_delay, args.slots, args.tokens_per_char,
+                          args.stall_probability, args.stall_delay)
+    print(f"Mock LLM backend listening on http://127.0.0.1:{server.server_address[1]}/v1/completions")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Routing across several local mock backends.
+
+Starts N mock replicas as separate processes. Each one runs at most --slots
+generations at once and produces ~6 tokens per prompt character, like the real
+model. One replica (--slow) generates at a third of the speed. A mixed
+workload of short and long texts then goes through agenerate_tokens_from_api
+once per routing mode, and the script reports latency percentiles and how the
+requests were spread.
+
+With --kill-one, one replica is terminated halfway through each run to check
+that it leaves rotation without failing requests beyond those already on it.
+
+Usage:
+    python benchmarks/multi_backend_benchmark.py --backends 3 --requests 120 --concurrency 12
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import free_port, spawn_server_process
+
+
+def start_backends(count, slots, token_delay, slow):
+    procs, urls = [], []
+    for i in range(count):
+        delay = token_delay * 3 if (slow and i == 0) else token_delay
+        port = free_port()
+        procs.append(spawn_server_process(port, "--slots", slots, "--tokens-per-char", 6,
+                                          "--token-delay", delay, "--seed", i))
+        urls.append(f"http://127.0.0.1:{port}/v1/completions")
+    return procs, urls
+
+
+def make_workload(total, seed=0):
+    rng = random.Random(seed)
+    short = "Hi there, how are you?"
+    long = "This is a much longer sentence that keeps the backend busy for a while. " * 3
+    return [long if rng.random() < 0.3 else short for _ in range(total)]
+
+
+async def run_workload(inference, texts, concurrency, kill=None):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(text):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            tokens = 0
+            async for chunk in inference.agenerate_tokens_from_api(text, max_tokens=8192):
+                tokens += chunk.size
+            if tokens == 0:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    async def killer():
+        await asyncio.sleep(kill[1])
+        kill[0].terminate()
+
+    start = time.perf_counter()
+    tasks = [one(t) for t in texts]
+    if kill is not None:
+        tasks.append(killer())
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - start, sorted(latencies), failures
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing across several mock LLM backends")
+    parser.add_argument("--backends", type=int, default=3, help="Mock replicas to start")
+    parser.add_argument("--slots", type=int, default=2, help="Concurrent generations per replica")
+    parser.add_argument("--token-delay", type=float, default=0.0005, help="Seconds per streamed token")
+    parser.add_argument("--no-slow", action="store_true", help="Make all replicas equally fast")
+    parser.add_argument("--requests", type=int, default=120, help="Generations per routing mode")
+    parser.add_argument("--concurrency", type=int, default=12, help="Generations in flight")
+    parser.add_argument("--kill-one", action="store_true", help="Terminate one replica mid-run")
+    args = parser.parse_args()
+
+    procs, urls = start_backends(args.backends, args.slots, args.token_delay, not args.no_slow)
+    os.environ["ORPHEUS_API_URLS"] = ",".join(urls)
+    os.environ["ORPHEUS_HEALTH_CHECK_INTERVAL"] = "0.5"
+    os.environ.setdefault("ORPHEUS_LOG_LEVEL", "WARNING")
+
+    from tts_engine import backends, http_client, inference
+
+    texts = make_workload(args.requests)
+    print(f"{args.backends} backends x {args.slots} slots, {args.requests} requests, "
+          f"concurrency {args.concurrency}{', replica 0 is 3x slower' if not args.no_slow else ''}")
+    try:
+        for mode in backends.ROUTING_MODES:
+            async def configure():
+                pool = backends.get_pool()
+                pool.routing = mode
+                for backend in pool.backends:
+                    backend.total_requests = backend.failures = 0
+                return pool
+            pool = http_client.run_coroutine(configure())
+
+            kill = None
+            if args.kill_one:
+                port = free_port()
+                victim = spawn_server_process(port, "--slots", args.slots, "--tokens-per-char", 6,
+                                              "--token-delay", args.token_delay)
+                procs.append(victim)
+                pool.backends.append(backends.Backend(f"http://127.0.0.1:{port}/v1/completions"))
+                kill = (victim, 1.0)
+
+            wall, latencies, failures = http_client.run_coroutine(
+                run_workload(inference, texts, args.concurrency, kill))
+            spread = "/".join(str(b.total_requests) for b in pool.backends)
+            print(f"{mode:15s} wall {wall:6.2f}s  p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+                  f"p95 {percentile(latencies, 95) * 1000:7.1f} ms  failed {failures:3d}  per-backend {spread}")
+            if args.kill_one:
+                pool.backends.pop()
+    finally:
+        http_client.close_client()
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Tolerance and throughput of the offline (whole-utterance) SNAC decode.
+
+Runs one token stream through the streaming decoders (sliding and
+incremental) and through inference.offline_tokens_decoder for several
+segment sizes. For each mode it reports the SNR against the sliding output,
+which file responses used before, and against one SNAC decode of the whole
+stream. It also reports the number of model.decode calls and the decode
+speed. The comparison covers the frames both outputs contain.
+
+The script exits with status 1 if any offline setting falls below --min-snr
+against the sliding output. Use --no-noise so the threshold measures decode
+differences rather than SNAC's random noise. See decode_quality_benchmark.py
+for the noise floor between two sliding runs.
+
+Usage:
+    python benchmarks/offline_decode_benchmark.py --tokens 2100 --no-noise
+    python benchmarks/offline_decode_benchmark.py --tokens-file captured.txt --segments 24,56
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from decode_quality_benchmark import compare, decode
+from mock_llm_server import make_token_text
+from tts_engine import inference, speechpipe
+
+
+class CallCounter:
+    """Wraps model.decode to count SNAC calls."""
+    def __init__(self, model):
+        self.calls = 0
+        self._decode = model.decode
+        model.decode = self
+
+    def __call__(self, codes):
+        self.calls += 1
+        return self._decode(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline vs streaming SNAC decoding")
+    parser.add_argument("--tokens", type=int, default=2100, help="Synthetic stream length (2100 ~ 25 s of audio)")
+    parser.add_argument("--tokens-file", help="Captured LLM output containing <custom_token_N> entries")
+    parser.add_argument("--segments", default="8,24,56", help="Comma-separated offline segment sizes in frames")
+    parser.add_argument("--seed", type=int, default=0, help="Torch seed for SNAC's noise")
+    parser.add_argument("--no-noise", action="store_true", help="Bypass SNAC's noise blocks")
+    parser.add_argument("--min-snr", type=float, default=30.0, help="Fail below this SNR (dB) against sliding")
+    args = parser.parse_args()
+
+    if args.no_noise:
+        from snac.layers import NoiseBlock
+        for module in speechpipe.model.modules():
+            if isinstance(module, NoiseBlock):
+                module.forward = lambda x: x
+
+    if args.tokens_file:
+        with open(args.tokens_file) as f:
+            text = f.read()
+    else:
+        text = "".join(make_token_text(args.tokens))
+    numbers = speechpipe.parse_custom_token_numbers(text)
+    frames = numbers.size // 7
+    print(f"{numbers.size} tokens, {frames} frames ({frames * speechpipe.SAMPLES_PER_FRAME / 24000:.1f} s of audio), "
+          f"device {speechpipe.snac_device}")
+
+    counter = CallCounter(speechpipe.model)
+    torch.manual_seed(args.seed)
+    token_ids = speechpipe.token_numbers_to_ids(numbers, 0).astype(np.int32)
+    full = np.frombuffer(speechpipe.decode_frames(token_ids, 1, frames - 1), dtype=np.int16) / 32767.0
+
+    runs = [("sliding", inference.tokens_decoder, {}),
+            ("incremental", inference.incremental_tokens_decoder, {})]
+    runs += [(f"offline {segment}", inference.offline_tokens_decoder, {"segment_frames": segment})
+             for segment in (int(s) for s in args.segments.split(","))]
+
+    print(f"{'mode':16s} {'vs sliding dB':>13s} {'worst frame':>12s} {'vs full dB':>10s} {'frames':>7s} "
+          f"{'SNAC calls':>10s} {'decode s':>9s} {'x realtime':>10s}")
+    reference = None
+    failed = False
+    for label, decoder, kwargs in runs:
+        counter.calls = 0
+        audio, elapsed = decode(decoder, numbers, args.seed, **kwargs)
+        calls = counter.calls
+        if reference is None:
+            reference = audio
+            snr_text = f"{'-':>13s} {'-':>12s}"
+        else:
+            snr, worst, _ = compare(reference, audio)
+            snr_text = f"{snr:13.1f} {worst:12.1f}"
+            if label.startswith("offline") and snr < args.min_snr:
+                failed = True
+        print(f"{label:16s} {snr_text} {compare(full, audio)[0]:10.1f} "
+              f"{audio.size // speechpipe.SAMPLES_PER_FRAME:7d} {calls:10d} {elapsed:9.2f} "
+              f"{audio.size / 24000 / elapsed:10.2f}")
+
+    if failed:
+        print(f"FAIL: offline output below {args.min_snr:g} dB against sliding")
+        sys.exit(1)
+    print(f"OK: every offline setting is at least {args.min_snr:g} dB SNR against sliding")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Per-call overhead of inference.tokens_decoder_sync: a new thread and event
+loop per call (the previous implementation, kept here) versus the
+long-lived pipeline workers (tts_engine/pipeline.py).
+
+The decoder is replaced by a stub that yields one 4 KiB chunk per token
+chunk, so the numbers cover only the pipeline plumbing, not SNAC. For
+each concurrency level, that many threads (one per simulated request) make
+--calls calls each, with --chunks token chunks spaced --token-delay
+seconds apart. As in the server, the previous implementation reads the
+tokens from a blocking generator (generate_tokens_from_api) and the
+pipeline awaits them (relay_tokens_from_api). Reported per call:
+
+- overhead: call time minus the time spent waiting for tokens;
+- tail: time from the decoder's last chunk to the call returning, which
+  is the delay the consumer's completion handling adds to every request.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --concurrency 1,8,32 --calls 50
+"""
+
+import argparse
+import asyncio
+import contextvars
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_engine import inference
+
+
+def per_call_tokens_decoder_sync(tokens, async_tokens, decoder):
+    """The previous tokens_decoder_sync, minus the WAV writing and logging."""
+    syn_token_gen = tokens()
+    audio_queue = queue.Queue(maxsize=50)
+    audio_segments = []
+    producer_done_event = threading.Event()
+    producer_started_event = threading.Event()
+
+    async def async_token_gen():
+        for chunk in syn_token_gen:
+            yield chunk
+
+    async def async_producer():
+        try:
+            producer_started_event.set()
+            async for audio_chunk in decoder(async_token_gen()):
+                if audio_chunk:
+                    audio_queue.put(audio_chunk)
+        finally:
+            producer_done_event.set()
+            audio_queue.put(None)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(asyncio.run, async_producer()),
+                              daemon=True)
+    thread.start()
+    producer_started_event.wait(timeout=5.0)
+    last_check_time = time.time()
+    while True:
+        try:
+            audio = audio_queue.get(timeout=0.1)
+            if audio is None:
+                break
+            audio_segments.append(audio)
+        except queue.Empty:
+            if time.time() - last_check_time > 1.0:
+                last_check_time = time.time()
+                if producer_done_event.is_set() and audio_queue.empty():
+                    break
+    if thread.is_alive():
+        thread.join(timeout=10.0)
+    return audio_segments
+
+
+def pipeline_tokens_decoder_sync(tokens, async_tokens, decoder):
+    # main() installs stub_decoder as the offline decoder
+    return inference.tokens_decoder_sync(async_tokens(), decode_mode="offline")
+
+
+# Holds [time of the decoder's latest chunk] for the calling thread; both
+# implementations run the decoder in a copy of the caller's context
+last_yield = contextvars.ContextVar("last_yield")
+
+
+async def stub_decoder(token_gen):
+    async for _ in token_gen:
+        last_yield.get()[0] = time.perf_counter()
+        yield b"\0" * 4096
+
+
+def run(implementation, concurrency, calls, chunks, token_delay):
+    overheads = []
+    tails = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def worker():
+        latest = [0.0]
+        last_yield.set(latest)
+
+        def tokens():
+            for index in range(chunks):
+                if token_delay:
+                    time.sleep(token_delay)
+                yield np.arange(7 * index, 7 * index + 7)
+
+        async def async_tokens():
+            for index in range(chunks):
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+                yield np.arange(7 * index, 7 * index + 7)
+
+        barrier.wait()
+        for _ in range(calls):
+            start = time.perf_counter()
+            audio = implementation(tokens, async_tokens, stub_decoder)
+            end = time.perf_counter()
+            assert len(audio) == chunks
+            with lock:
+                overheads.append((end - start - chunks * token_delay) * 1000)
+                tails.append((end - latest[0]) * 1000)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(overheads), np.array(tails)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call thread + event loop versus long-lived pipeline workers")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrent callers")
+    parser.add_argument("--calls", type=int, default=50, help="Calls per caller")
+    parser.add_argument("--chunks", type=int, default=20, help="Token chunks per call")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between token chunks")
+    args = parser.parse_args()
+
+    # The stub decoder is far faster than real time; keep the per-call summary quiet
+    inference.logger.setLevel("ERROR")
+    original = inference._DECODERS["offline"]
+    inference._DECODERS["offline"] = stub_decoder
+    try:
+        print(f"{'callers':>7} {'implementation':>15} {'overhead p50':>13} {'p99':>7} {'tail p50':>9} {'p99':>7}  (ms)")
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            for label, implementation in (("per-call thread", per_call_tokens_decoder_sync),
+                                          ("pipeline", pipeline_tokens_decoder_sync)):
+                overheads, tails = run(implementation, concurrency, args.calls, args.chunks, args.token_delay)
+                print(f"{concurrency:>7} {label:>15} {np.percentile(overheads, 50):13.3f} "
+                      f"{np.percentile(overheads, 99):7.3f} {np.percentile(tails, 50):9.3f} "
+                      f"{np.percentile(tails, 99):7.3f}")
+    finally:
+        inference._DECODERS["offline"] = original
+
+
+if __name__ == "__main__":
+    main()
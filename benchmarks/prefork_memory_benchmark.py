@@ -0,0 +1,149 @@
+"""
+Per-worker memory of the server under `uvicorn --workers N` (every worker
+loads its own SNAC model) and under `python -m tts_engine.prefork` (the model
+is loaded once and the workers are forked from that process).
+
+Each server runs against a mock LLM backend. Once every worker has its
+decoder warmed up (or has inherited a warm one), the benchmark sends
+--requests speech requests, so the numbers include serving traffic. It then
+reads RSS and PSS from /proc/<pid>/smaps_rollup for each worker and for the
+supervising parent. PSS divides each shared page among the processes that
+map it, so the PSS total is the memory the server actually uses. Linux only.
+
+The servers run in a scratch directory so app.py's .env handling does not
+touch the checkout.
+
+Usage:
+    python benchmarks/prefork_memory_benchmark.py --workers 4 --requests 8
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import free_port, spawn_server_process
+
+# Log line each worker writes once its decoder is ready to serve
+READY_MARKERS = {
+    "uvicorn": re.compile(r"Decoder warm-up finished"),
+    "prefork": re.compile(r"Decoder already warmed up"),
+}
+
+
+def memory(pid):
+    """{"Rss": MB, "Pss": MB, ...} from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            match = re.match(r"(\w+):\s+(\d+) kB", line)
+            if match:
+                values[match.group(1)] = int(match.group(2)) / 1024
+    return values
+
+
+def children(pid):
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+
+def worker_pids(pid, mode):
+    pids = children(pid)
+    if mode == "uvicorn":
+        # uvicorn's workers are spawned interpreters; skip multiprocessing's resource tracker
+        pids = [child for child in pids if b"spawn_main" in open(f"/proc/{child}/cmdline", "rb").read()]
+    return pids
+
+
+def run_server(mode, workers, requests_count, backend_url, timeout):
+    port = free_port()
+    command = {
+        "uvicorn": [sys.executable, "-m", "uvicorn", "app:app", "--workers", str(workers)],
+        "prefork": [sys.executable, "-m", "tts_engine.prefork", "app:app", "--workers", str(workers)],
+    }[mode] + ["--host", "127.0.0.1", "--port", str(port)]
+    env = dict(os.environ, ORPHEUS_API_URL=backend_url, ORPHEUS_API_KEY="benchmark",
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as scratch:
+        server = subprocess.Popen(command, cwd=scratch, env=env, stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT, text=True)
+        ready = []
+        log = []
+
+        def read_log():
+            for line in server.stdout:
+                log.append(line)
+                if READY_MARKERS[mode].search(line):
+                    ready.append(line)
+
+        threading.Thread(target=read_log, daemon=True).start()
+        start = time.perf_counter()
+        try:
+            while len(ready) < workers:
+                if server.poll() is not None or time.perf_counter() - start > timeout:
+                    sys.stdout.write("".join(log[-20:]))
+                    raise RuntimeError(f"{mode}: {len(ready)}/{workers} workers ready")
+                time.sleep(0.2)
+            startup = time.perf_counter() - start
+
+            def speak(index):
+                response = requests.post(f"http://127.0.0.1:{port}/v1/audio/speech", timeout=timeout,
+                                         json={"input": f"Memory benchmark request {index}.", "voice": "tara"})
+                response.raise_for_status()
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(speak, range(requests_count)))
+
+            parent = memory(server.pid)
+            per_worker = [memory(pid) for pid in worker_pids(server.pid, mode)]
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+    return startup, parent, per_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker RSS/PSS: uvicorn --workers vs preload-then-fork")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    parser.add_argument("--requests", type=int, default=8, help="Speech requests sent before measuring")
+    parser.add_argument("--tokens", type=int, default=280, help="Tokens the mock backend generates per request")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the workers")
+    args = parser.parse_args()
+
+    backend_port = free_port()
+    backend = spawn_server_process(backend_port, "--tokens", args.tokens)
+    backend_url = f"http://127.0.0.1:{backend_port}/v1/completions"
+    try:
+        results = {mode: run_server(mode, args.workers, args.requests, backend_url, args.timeout)
+                   for mode in ("uvicorn", "prefork")}
+    finally:
+        backend.terminate()
+
+    print(f"{args.workers} workers, {args.requests} requests served before measuring (MB)")
+    print(f"{'mode':>8} {'process':>8} {'RSS':>8} {'PSS':>8} {'private':>8}")
+    for mode, (startup, parent, per_worker) in results.items():
+        rows = [("parent", parent)] + [(f"worker {i}", usage) for i, usage in enumerate(per_worker)]
+        for name, usage in rows:
+            private = usage["Private_Clean"] + usage["Private_Dirty"]
+            print(f"{mode:>8} {name:>8} {usage['Rss']:8.0f} {usage['Pss']:8.0f} {private:8.0f}")
+        total_pss = sum(usage["Pss"] for _, usage in rows)
+        print(f"{mode:>8} {'total':>8} {'':>8} {total_pss:8.0f}    (ready in {startup:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
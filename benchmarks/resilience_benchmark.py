@@ -0,0 +1,88 @@
+"""
+How fast requests fail against a dead backend, with and without the circuit breaker.
+
+Points the engine at a port where nothing listens and sends --requests
+generations one after another. Without a breaker every request pays for its
+full retry sequence (three connection attempts plus backoff). With the breaker
+the first few requests open the circuit and the rest fail with
+BackendUnavailableError (HTTP 503 in the API) in well under a millisecond.
+A mock backend is then started on that port to show that the half-open probe
+closes the circuit again after ORPHEUS_BREAKER_RESET.
+
+Usage:
+    python benchmarks/resilience_benchmark.py --requests 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import free_port, spawn_server_process
+
+
+def time_requests(inference, count):
+    from tts_engine.resilience import BackendUnavailableError
+    durations, failures = [], 0
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            tokens = sum(chunk.size for chunk in inference.generate_tokens_from_api("Hello there."))
+            failures += tokens == 0
+        except BackendUnavailableError:
+            failures += 1
+        durations.append(time.perf_counter() - start)
+    return durations, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Failure latency with and without circuit breakers")
+    parser.add_argument("--requests", type=int, default=20, help="Sequential requests per run")
+    parser.add_argument("--reset", type=float, default=2.0, help="ORPHEUS_BREAKER_RESET for the run (s)")
+    args = parser.parse_args()
+
+    port = free_port()
+    os.environ["ORPHEUS_API_URL"] = f"http://127.0.0.1:{port}/v1/completions"
+    os.environ["ORPHEUS_BREAKER_RESET"] = str(args.reset)
+    os.environ.setdefault("ORPHEUS_LOG_LEVEL", "CRITICAL")
+
+    from tts_engine import backends, http_client, inference
+    from tts_engine.resilience import CircuitBreaker
+
+    def set_breaker(threshold):
+        async def _set():
+            for backend in backends.get_pool().backends:
+                backend.breaker = CircuitBreaker(failure_threshold=threshold, reset_timeout=args.reset)
+        http_client.run_coroutine(_set())
+
+    try:
+        print(f"Dead backend at {os.environ['ORPHEUS_API_URL']}, {args.requests} sequential requests")
+        for label, threshold in (("breaker disabled", 0), ("breaker enabled ", 5)):
+            set_breaker(threshold)
+            durations, failures = time_requests(inference, args.requests)
+            fast = [d for d in durations if d < 0.01]
+            print(f"{label}: total {sum(durations):6.2f}s  first {durations[0] * 1000:8.1f} ms  "
+                  f"last {durations[-1] * 1000:8.3f} ms  failed {failures}/{args.requests}  "
+                  f"fast-failed (<10 ms) {len(fast)}")
+
+        server = spawn_server_process(port, "--tokens", 70)
+        try:
+            start = time.perf_counter()
+            while True:
+                durations, failures = time_requests(inference, 1)
+                if not failures:
+                    break
+                time.sleep(0.1)
+            print(f"Backend restarted: circuit closed again after {time.perf_counter() - start:.2f}s "
+                  f"(reset timeout {args.reset:g}s)")
+        finally:
+            server.terminate()
+    finally:
+        http_client.close_client()
+
+
+if __name__ == "__main__":
+    main()
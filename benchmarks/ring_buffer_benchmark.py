@@ -0,0 +1,160 @@
+"""
+Token history for the sliding-window decoders: growing list versus TokenRingBuffer.
+
+Feeds --tokens token numbers (default ~10 minutes of audio at ~82 tokens/s)
+through speechpipe.tokens_decoder with convert_to_audio replaced by a stub
+that builds the input tensor as convert_to_audio does and checksums it, so
+the numbers cover everything before the SNAC decode. The previous list-based decoder loop is kept here for
+comparison. Both run once with one-token chunks (SSE streaming) and once with
+64-token chunks, and must hand identical windows to convert_to_audio.
+
+Reports tracemalloc peak (Python-side memory held by the decoder) and
+throughput, plus the cost of turning one 49-token window into a tensor from a
+list slice versus from a ring view.
+
+Usage:
+    python benchmarks/ring_buffer_benchmark.py --tokens 49200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+import zlib
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_token_text
+from tts_engine import speechpipe
+
+
+class WindowRecorder:
+    """Stand-in for convert_to_audio: builds the input tensor the same way, then checksums it."""
+    def __init__(self):
+        self.windows = 0
+        self.crc = 0
+
+    def __call__(self, multiframe, count):
+        if isinstance(multiframe, np.ndarray):
+            frame_tensor = torch.from_numpy(multiframe).to(dtype=torch.int32)
+        else:
+            frame_tensor = torch.tensor(multiframe, dtype=torch.int32)
+        self.windows += 1
+        self.crc = zlib.crc32(frame_tensor.numpy().tobytes(), self.crc)
+        return b"\0\0"
+
+
+async def legacy_tokens_decoder(token_gen, convert):
+    # The previous list-based loop from speechpipe.tokens_decoder, logging removed
+    buffer = []
+    count = 0
+    first_chunk_processed = False
+    async for chunk in token_gen:
+        token_ids = speechpipe.token_ids_from_chunk(chunk, count)
+        if token_ids.size == 0:
+            continue
+        previous_count = count
+        buffer.extend(token_ids.tolist())
+        count += token_ids.size
+        for boundary in range(previous_count - previous_count % 7 + 7, count + 1, 7):
+            if not first_chunk_processed:
+                audio = convert(buffer[boundary - 7:boundary], boundary)
+                if audio is not None:
+                    first_chunk_processed = True
+                    yield audio
+            else:
+                if boundary >= 49:
+                    window = buffer[boundary - 49:boundary]
+                elif boundary >= 28:
+                    window = buffer[boundary - 28:boundary]
+                else:
+                    continue
+                audio = convert(window, boundary)
+                if audio is not None:
+                    yield audio
+    if len(buffer) >= 49:
+        audio = convert(buffer[-49:], count)
+    elif len(buffer) >= 28:
+        audio = convert(buffer[-28:], count)
+    elif len(buffer) >= 7:
+        audio = convert(buffer + [buffer[-1]] * (28 - len(buffer)), count)
+    else:
+        audio = None
+    if audio is not None:
+        yield audio
+
+
+def current_tokens_decoder(token_gen, convert):
+    speechpipe.convert_to_audio = convert
+    return speechpipe.tokens_decoder(token_gen)
+
+
+async def drain(decoder, chunks, convert):
+    async def gen():
+        for chunk in chunks:
+            yield chunk
+    async for _ in decoder(gen(), convert):
+        pass
+
+
+def run(decoder, chunks, trace=False):
+    recorder = WindowRecorder()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    asyncio.run(drain(decoder, chunks, recorder))
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return recorder, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List versus ring buffer token history")
+    parser.add_argument("--tokens", type=int, default=49200, help="Tokens per run (49200 ~ 10 minutes)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per variant (best is kept)")
+    args = parser.parse_args()
+
+    numbers = speechpipe.parse_custom_token_numbers("".join(make_token_text(args.tokens)))
+    original_convert = speechpipe.convert_to_audio
+    print(f"{numbers.size} tokens (~{numbers.size / 82 / 60:.1f} minutes of audio)")
+    try:
+        for chunk_size in (1, 64):
+            chunks = [numbers[i:i + chunk_size] for i in range(0, numbers.size, chunk_size)]
+            results = {}
+            for label, decoder in (("list", legacy_tokens_decoder), ("ring", current_tokens_decoder)):
+                # Timed runs without tracemalloc, which slows allocation-heavy code
+                runs = [run(decoder, chunks) for _ in range(args.repeat)]
+                recorder, _, peak = run(decoder, chunks, trace=True)
+                results[label] = (recorder, min(r[1] for r in runs), peak)
+            (old, old_time, old_peak), (new, new_time, new_peak) = results["list"], results["ring"]
+            assert (old.windows, old.crc) == (new.windows, new.crc), "decoders produced different windows"
+            print(f"{chunk_size}-token chunks, {new.windows} windows (identical):")
+            print(f"  list buffer: {numbers.size / old_time / 1000:7.0f}k tokens/s  peak {old_peak / 1024:8.1f} KiB")
+            print(f"  ring buffer: {numbers.size / new_time / 1000:7.0f}k tokens/s  peak {new_peak / 1024:8.1f} KiB")
+    finally:
+        speechpipe.convert_to_audio = original_convert
+
+    # Window -> tensor, the first step of convert_to_audio
+    sample = np.resize(numbers, 100)
+    ring = speechpipe.TokenRingBuffer(49)
+    ring.extend(sample)
+    window_list = sample.tolist()[-49:]
+    from_list = min(timeit.repeat(lambda: torch.tensor(window_list, dtype=torch.int32), number=10000, repeat=5))
+    from_view = min(timeit.repeat(lambda: torch.from_numpy(ring.window(49)), number=10000, repeat=5))
+    print("49-token window to tensor:")
+    print(f"  torch.tensor(list slice):  {from_list / 10000 * 1e6:6.2f} us")
+    print(f"  torch.from_numpy(view):    {from_view / 10000 * 1e6:6.2f} us")
+
+
+if __name__ == "__main__":
+    main()
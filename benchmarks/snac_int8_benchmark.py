@@ -0,0 +1,116 @@
+"""
+Quality and speed of the int8 SNAC decoder (ORPHEUS_SNAC_PRECISION=int8)
+against the float32 model.
+
+Exports the float and int8 ONNX graphs into a temporary directory, with
+SNAC's noise blocks bypassed so the comparison measures quantization error
+only. It then decodes each token stream in one pass with the PyTorch
+float32 model and with the int8 graph and reports:
+
+- SNR of the int8 audio against float32, in dB (higher is better);
+- log-spectral distance (LSD) over a 1024-point STFT, in dB (lower is better;
+  below ~1 dB is generally inaudible).
+
+Pass --tokens-file once per recorded stream (captured LLM output containing
+<custom_token_N>) to measure on real speech. Without any, a fixed set of
+deterministic synthetic streams is used. These exercise the numerics but not
+perceptual quality. The script exits with status 1 if any stream falls
+below --min-snr.
+
+Finally it times one decode call of 4, 7 and 28 frames with PyTorch float32,
+ONNX float32 and ONNX int8.
+
+Usage:
+    python benchmarks/snac_int8_benchmark.py --tokens-file a.txt --tokens-file b.txt
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_token_text
+from snac_onnx_benchmark import per_call, random_batch, torch_decode
+from tts_engine import snac_onnx, speechpipe
+
+
+def log_spectral_distance(reference, test, n_fft=1024):
+    window = torch.hann_window(n_fft, dtype=torch.float64)
+    spectra = [torch.stft(torch.from_numpy(x.astype(np.float64)), n_fft, hop_length=n_fft // 4, window=window,
+                          return_complex=True).abs().pow(2) for x in (reference, test)]
+    floor = 1e-10 * spectra[0].max()
+    difference = 10 * torch.log10(spectra[0] + floor) - 10 * torch.log10(spectra[1] + floor)
+    return float(difference.pow(2).mean(dim=0).sqrt().mean())
+
+
+def snr_db(reference, test):
+    noise = np.sum((reference - test) ** 2)
+    return float("inf") if noise == 0 else 10 * np.log10(np.sum(reference ** 2) / noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="int8 vs float32 SNAC decoder")
+    parser.add_argument("--tokens-file", action="append", default=[], help="Recorded token stream (repeatable)")
+    parser.add_argument("--tokens", type=int, default=700, help="Length of each synthetic stream")
+    parser.add_argument("--streams", type=int, default=3, help="Synthetic streams when no --tokens-file is given")
+    parser.add_argument("--min-snr", type=float, default=25.0, help="Fail below this SNR (dB) on any stream")
+    args = parser.parse_args()
+
+    streams = []
+    for path in args.tokens_file:
+        with open(path) as f:
+            streams.append((os.path.basename(path), f.read()))
+    if not streams:
+        streams = [(f"synthetic seed {seed}", "".join(make_token_text(args.tokens, seed=seed)))
+                   for seed in range(args.streams)]
+
+    from snac.layers import NoiseBlock
+    for module in speechpipe.model.modules():
+        if isinstance(module, NoiseBlock):
+            module.forward = lambda x: x
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        float_path = os.path.join(cache_dir, "float.onnx")
+        int8_path = os.path.join(cache_dir, "int8.onnx")
+        snac_onnx.export_decoder(speechpipe.model, float_path)
+        snac_onnx.export_decoder(speechpipe.model, int8_path, int8=True)
+        float_onnx = snac_onnx.OnnxSnacDecoder(float_path)
+        int8_onnx = snac_onnx.OnnxSnacDecoder(int8_path)
+        print(f"Graph size: float32 {os.path.getsize(float_path) / 2**20:.1f} MiB, "
+              f"int8 {os.path.getsize(int8_path) / 2**20:.1f} MiB")
+
+        print(f"{'stream':24s} {'frames':>6s} {'SNR dB':>7s} {'LSD dB':>7s}")
+        failed = False
+        for label, text in streams:
+            token_ids = speechpipe.token_numbers_to_ids(speechpipe.parse_custom_token_numbers(text), 0)
+            codes, frames = speechpipe.deinterleave_codes(token_ids.astype(np.int32))
+            reference = torch_decode(codes[np.newaxis], frames)[0]
+            quantized = int8_onnx.decode(codes[np.newaxis], frames)[0]
+            snr = snr_db(reference, quantized)
+            failed |= snr < args.min_snr
+            print(f"{label:24s} {frames:6d} {snr:7.1f} {log_spectral_distance(reference, quantized):7.2f}")
+
+        rng = np.random.default_rng(0)
+        print(f"{'window':>8} {'torch fp32':>11} {'onnx fp32':>10} {'onnx int8':>10}")
+        for window_frames in (4, 7, 28):
+            batch = random_batch(rng, window_frames, 1)
+            times = [per_call(lambda: torch_decode(batch, window_frames)),
+                     per_call(lambda: float_onnx.decode(batch, window_frames)),
+                     per_call(lambda: int8_onnx.decode(batch, window_frames))]
+            print(f"{window_frames:5d} fr " + " ".join(f"{t * 1e3:7.1f} ms" for t in times))
+
+    if failed:
+        print(f"FAIL: int8 output below {args.min_snr:g} dB SNR on at least one stream")
+        sys.exit(1)
+    print(f"OK: int8 output at least {args.min_snr:g} dB SNR on every stream")
+
+
+if __name__ == "__main__":
+    main()
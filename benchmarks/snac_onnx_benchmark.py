@@ -0,0 +1,103 @@
+"""
+Equivalence and speed of the ONNX Runtime SNAC decoder against PyTorch.
+
+Exports the decoder (snac_onnx.export_decoder) into a temporary directory,
+so the real cache is not touched. The check then bypasses SNAC's noise
+blocks in both graphs, decodes random windows at the sizes the decoders use
+(1, 4, 7, 28 and 72 frames, batch 1 and 8) and requires every sample to match
+PyTorch within --tolerance. The script exits with status 1 otherwise.
+
+It then times both backends per call, with the noise blocks in place as in
+production, for each window size and for each --threads setting of ONNX
+Runtime's intra-op pool.
+
+Usage:
+    python benchmarks/snac_onnx_benchmark.py --threads 1,2,4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_engine import snac_onnx, speechpipe
+
+
+def torch_decode(batch, window_frames):
+    codes_tensor = torch.from_numpy(batch)
+    codes = [codes_tensor[:, :window_frames], codes_tensor[:, window_frames:3 * window_frames],
+             codes_tensor[:, 3 * window_frames:]]
+    with torch.inference_mode():
+        return speechpipe.model.decode(codes)[:, 0].numpy()
+
+
+def random_batch(rng, window_frames, batch_size):
+    return np.stack([speechpipe.deinterleave_codes(rng.integers(0, 4096, window_frames * 7).astype(np.int32))[0]
+                     for _ in range(batch_size)])
+
+
+def per_call(fn, seconds=2.0):
+    fn()
+    number = max(1, int(seconds / min(timeit.repeat(fn, number=1, repeat=2))))
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime vs PyTorch SNAC decoder")
+    parser.add_argument("--threads", default="0", help="Comma-separated intra-op thread counts (0 = ONNX Runtime default)")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Largest allowed absolute sample difference")
+    parser.add_argument("--frames", default="4,7,28", help="Comma-separated window sizes to time")
+    args = parser.parse_args()
+
+    from snac.layers import NoiseBlock
+    noise_blocks = [module for module in speechpipe.model.modules() if isinstance(module, NoiseBlock)]
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Equivalence: both graphs without noise
+        for module in noise_blocks:
+            module.forward = lambda x: x
+        exact_path = os.path.join(cache_dir, "exact.onnx")
+        snac_onnx.export_decoder(speechpipe.model, exact_path)
+        exact = snac_onnx.OnnxSnacDecoder(exact_path)
+        worst = 0.0
+        for window_frames in (1, 4, 7, 28, 72):
+            for batch_size in (1, 8):
+                batch = random_batch(rng, window_frames, batch_size)
+                diff = np.abs(exact.decode(batch, window_frames) - torch_decode(batch, window_frames)).max()
+                worst = max(worst, float(diff))
+                print(f"  {window_frames:3d} frames x {batch_size}: max abs difference {diff:.2e}")
+        if worst > args.tolerance:
+            print(f"FAIL: ONNX output differs from PyTorch by {worst:.2e} (tolerance {args.tolerance:g})")
+            sys.exit(1)
+        print(f"OK: ONNX output matches PyTorch within {worst:.2e}")
+
+        # Speed: the production graph, noise included
+        for module in noise_blocks:
+            del module.forward
+        path = os.path.join(cache_dir, "decoder.onnx")
+        snac_onnx.export_decoder(speechpipe.model, path)
+        thread_counts = [int(t) for t in args.threads.split(",")]
+        sessions = {threads: snac_onnx.OnnxSnacDecoder(path, intra_op_threads=threads) for threads in thread_counts}
+
+        print(f"PyTorch uses {torch.get_num_threads()} threads")
+        labels = [f"onnx {threads or 'auto'} thr" for threads in thread_counts]
+        print(f"{'window':>8} {'torch':>10}" + "".join(f"{label:>19}" for label in labels))
+        for window_frames in (int(f) for f in args.frames.split(",")):
+            batch = random_batch(rng, window_frames, 1)
+            reference = per_call(lambda: torch_decode(batch, window_frames))
+            row = ""
+            for session in sessions.values():
+                elapsed = per_call(lambda: session.decode(batch, window_frames))
+                row += f"{elapsed * 1e3:10.1f} ms ({reference / elapsed:.2f}x)"
+            print(f"{window_frames:5d} fr {reference * 1e3:7.1f} ms{row}")
+
+
+if __name__ == "__main__":
+    main()
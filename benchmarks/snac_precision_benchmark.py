@@ -0,0 +1,75 @@
+"""
+Per-window SNAC decode latency for each PyTorch precision (ORPHEUS_SNAC_PRECISION).
+
+For float32, bfloat16 and float16 on the current device, reports whether the
+device has native support, the startup self-test SNR against float32
+(speechpipe.precision_self_test) and the latency of one decode call at the
+window sizes the decoders use: 4 frames (sliding window), 7 frames, 8 frames
+(incremental 4:2 plus lookahead) and 32 frames (offline segment). Each call
+includes the float32 int16 conversion. Precisions the device lacks are
+still measured when --all is given. Expect them to be slow, since they run
+emulated kernels.
+
+Usage:
+    python benchmarks/snac_precision_benchmark.py --frames 4,8,32 --batch 1
+"""
+
+import argparse
+import copy
+import os
+import sys
+import timeit
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_engine import speechpipe
+
+
+def per_call(fn, seconds=2.0):
+    fn()
+    number = max(1, int(seconds / min(timeit.repeat(fn, number=1, repeat=2))))
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNAC decode latency per precision")
+    parser.add_argument("--frames", default="4,7,8,32", help="Comma-separated window sizes")
+    parser.add_argument("--batch", type=int, default=1, help="Windows per decode call")
+    parser.add_argument("--all", action="store_true", help="Also time precisions without native support")
+    args = parser.parse_args()
+
+    float_model = speechpipe.model
+    if speechpipe.SNAC_DTYPE != torch.float32:
+        sys.exit("Run with ORPHEUS_SNAC_PRECISION=float32 so the float32 reference model is loaded")
+    rng = np.random.default_rng(0)
+    sizes = [int(f) for f in args.frames.split(",")]
+    windows = {frames: [speechpipe.deinterleave_codes(rng.integers(0, 4096, frames * 7).astype(np.int32))[0]
+                        for _ in range(args.batch)] for frames in sizes}
+
+    print(f"device {speechpipe.snac_device}, batch {args.batch}, torch threads {torch.get_num_threads()}")
+    print(f"{'precision':>10} {'native':>6} {'SNR dB':>7}" + "".join(f"{f'{f} fr':>11}" for f in sizes))
+    try:
+        for name in ("float32", "bfloat16", "float16"):
+            dtype = getattr(torch, name)
+            native = dtype == torch.float32 or speechpipe.precision_supported(dtype)
+            if not native and not args.all:
+                print(f"{name:>10} {'no':>6}   (skipped; --all to time it)")
+                continue
+            candidate = float_model if dtype == torch.float32 else copy.deepcopy(float_model).to(dtype)
+            snr = speechpipe.precision_self_test(candidate, float_model)
+            speechpipe.model = candidate
+            row = ""
+            for frames in sizes:
+                keep = [(0, frames)] * args.batch
+                elapsed = per_call(lambda: speechpipe.decode_code_windows(windows[frames], frames, keep))
+                row += f"{elapsed * 1e3:8.1f} ms"
+            print(f"{name:>10} {'yes' if native else 'no':>6} {snr:7.1f}{row}")
+    finally:
+        speechpipe.model = float_model
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Microbenchmark: custom token -> SNAC code conversion.
+
+String inputs (one "<custom_token_N>" per call, as from a token-by-token
+generator): the previous turn_token_into_id with its (token, index % 7) dict
+cache, capped at 10000 entries, versus the current table-offset version. The
+token stream is random SNAC codes, so the old cache fills up and then stops
+caching, which is what happens on a long-running server.
+
+Integer inputs (raw token numbers, as parsed from the backend): a per-token
+Python loop versus token_numbers_to_ids on whole arrays, and one-token arrays
+through token_ids_from_chunk (the SSE streaming case).
+
+Finally the conversion runs from several threads at once and the results are
+checked against a single-threaded run.
+
+Usage:
+    python benchmarks/token_id_benchmark.py --tokens 70000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_token_text
+from tts_engine import speechpipe
+
+CUSTOM_TOKEN_PREFIX = "<custom_token_"
+legacy_cache = {}
+LEGACY_MAX_CACHE_SIZE = 10000
+
+
+def legacy_turn_token_into_id(token_string, index):
+    # The previous implementation, kept here for comparison
+    cache_key = (token_string, index % 7)
+    if cache_key in legacy_cache:
+        return legacy_cache[cache_key]
+    if CUSTOM_TOKEN_PREFIX not in token_string:
+        return None
+    token_string = token_string.strip()
+    last_token_start = token_string.rfind(CUSTOM_TOKEN_PREFIX)
+    if last_token_start == -1:
+        return None
+    last_token = token_string[last_token_start:]
+    if not (last_token.startswith(CUSTOM_TOKEN_PREFIX) and last_token.endswith(">")):
+        return None
+    try:
+        token_id = int(last_token[14:-1]) - 10 - ((index % 7) * 4096)
+        if len(legacy_cache) < LEGACY_MAX_CACHE_SIZE:
+            legacy_cache[cache_key] = token_id
+        return token_id
+    except (ValueError, IndexError):
+        return None
+
+
+def convert_strings(convert, tokens):
+    return [convert(token, index) for index, token in enumerate(tokens)]
+
+
+def convert_ints_loop(numbers):
+    return [n - 10 - (index % 7) * 4096 for index, n in enumerate(numbers)]
+
+
+def convert_one_token_chunks(chunks):
+    count = 0
+    for chunk in chunks:
+        count += speechpipe.token_ids_from_chunk(chunk, count).size
+    return count
+
+
+def best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token string/int to SNAC code conversion")
+    parser.add_argument("--tokens", type=int, default=70000, help="Tokens per run (~14 minutes of audio)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per variant")
+    parser.add_argument("--threads", type=int, default=8, help="Threads for the concurrency check")
+    args = parser.parse_args()
+
+    tokens = make_token_text(args.tokens)
+    numbers = speechpipe.parse_custom_token_numbers("".join(tokens))
+    expected = convert_strings(legacy_turn_token_into_id, tokens)
+    assert convert_strings(speechpipe.turn_token_into_id, tokens) == expected
+    assert speechpipe.token_numbers_to_ids(numbers, 0).tolist() == expected
+    print(f"{len(tokens)} tokens, legacy cache holds {len(legacy_cache)} entries after warm-up")
+
+    n = len(tokens)
+    legacy = best(lambda: convert_strings(legacy_turn_token_into_id, tokens), args.repeat)
+    current = best(lambda: convert_strings(speechpipe.turn_token_into_id, tokens), args.repeat)
+    print("String tokens, one call per token:")
+    print(f"  legacy dict cache:  {legacy / n * 1e9:7.1f} ns/token")
+    print(f"  offset table:       {current / n * 1e9:7.1f} ns/token ({legacy / current:.2f}x)")
+
+    numbers_list = numbers.tolist()
+    loop = best(lambda: convert_ints_loop(numbers_list), args.repeat)
+    bulk = best(lambda: speechpipe.token_numbers_to_ids(numbers, 0), args.repeat)
+    singles = [numbers[i:i + 1] for i in range(n)]
+    one = best(lambda: convert_one_token_chunks(singles), args.repeat)
+    print("Integer tokens:")
+    print(f"  Python loop:                   {loop / n * 1e9:7.1f} ns/token")
+    print(f"  token_numbers_to_ids (bulk):   {bulk / n * 1e9:7.1f} ns/token ({loop / bulk:.1f}x)")
+    print(f"  one-token chunks (streaming):  {one / n * 1e9:7.1f} ns/token")
+
+    # Thread safety: no shared mutable state, so concurrent runs must agree exactly
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        string_results = list(pool.map(lambda _: convert_strings(speechpipe.turn_token_into_id, tokens),
+                                       range(args.threads)))
+        array_results = list(pool.map(lambda start: speechpipe.token_numbers_to_ids(numbers, start).tolist(),
+                                      range(args.threads)))
+    assert all(result == expected for result in string_results)
+    assert all(result == speechpipe.token_numbers_to_ids(numbers, start).tolist()
+               for start, result in enumerate(array_results))
+    print(f"Concurrent conversion in {args.threads} threads matches the single-threaded result")
+
+
+if __name__ == "__main__":
+    main()
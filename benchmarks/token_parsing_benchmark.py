@@ -0,0 +1,86 @@
+"""
+Microbenchmark: turning an 8192-token generated_text response into SNAC codes.
+
+Compares the previous per-token path (re.findall, one yield and one
+turn_token_into_id call per token) with the bulk NumPy path
+(parse_custom_token_numbers + token_numbers_to_ids).
+
+Usage:
+    python benchmarks/token_parsing_benchmark.py
+    python benchmarks/token_parsing_benchmark.py --response recorded_response.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import make_token_text
+from tts_engine import speechpipe
+
+
+def load_generated_text(path, num_tokens):
+    if path:
+        with open(path) as f:
+            data = json.load(f)
+        return "".join(item["output"]["generated_text"] for item in data["output"])
+    return "".join(make_token_text(num_tokens))
+
+
+def per_token_path(generated_text, with_prints=False):
+    # Mirrors the previous generate_tokens_from_api + tokens_decoder loop
+    speechpipe_cache = {}
+    ids = []
+    count = 0
+    tokens = re.findall(r'<custom_token_\d+>', generated_text)
+    for token_counter, token_text in enumerate(tokens, 1):
+        if with_prints:
+            print(f"TTS_WORKER_DEBUG --- Yielding token {token_counter}: {token_text}")
+        cache_key = (token_text, count % 7)
+        token = speechpipe_cache.get(cache_key)
+        if token is None:
+            token = speechpipe.turn_token_into_id(token_text, count)
+            speechpipe_cache[cache_key] = token
+        if token is not None and token > 0:
+            ids.append(token)
+            count += 1
+    return ids
+
+
+def bulk_path(generated_text):
+    numbers = speechpipe.parse_custom_token_numbers(generated_text)
+    return speechpipe.token_numbers_to_ids(numbers, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk vs per-token parsing of generated_text")
+    parser.add_argument("--response", type=str, default=None, help="Recorded RunPod-style JSON response")
+    parser.add_argument("--tokens", type=int, default=8192, help="Synthetic response size if no recording")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per path")
+    args = parser.parse_args()
+
+    text = load_generated_text(args.response, args.tokens)
+    expected = per_token_path(text)
+    result = bulk_path(text)
+    assert result.tolist() == expected, "bulk path disagrees with per-token path"
+    print(f"Response: {len(text)} characters, {len(expected)} tokens")
+
+    per_token = min(timeit.repeat(lambda: per_token_path(text), number=1, repeat=args.repeat))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with_prints = min(timeit.repeat(lambda: per_token_path(text, True), number=1, repeat=args.repeat))
+    bulk = min(timeit.repeat(lambda: bulk_path(text), number=1, repeat=args.repeat))
+
+    print(f"Per-token path (with per-token print to /dev/null): {with_prints * 1000:8.2f} ms")
+    print(f"Per-token path (no prints):                         {per_token * 1000:8.2f} ms")
+    print(f"Bulk NumPy path:                                    {bulk * 1000:8.2f} ms "
+          f"({per_token / bulk:.1f}x vs no prints, {with_prints / bulk:.1f}x vs prints)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import os
 import time
 import logging
 import base64
+import atexit
+import asyncio
 from datetime import datetime
 import sys # Added for print flushing
 import uuid # For unique filenames
@@ -15,10 +17,11 @@ from dotenv import load_dotenv
 load_dotenv(override=True) # override=True ensures OS vars can override .env vars if both exist
 print("---HANDLER.PY: load_dotenv() called.---", flush=True)
 
-# --- Setup logging (retained for good practice, but we'll add prints) ---
-logging.basicConfig(level=logging.INFO) # Configure logging early
+# --- Setup logging ---
+# The request-id aware log format lives in tts_engine.logging_utils, and importing it
+# pulls in the engine, so logging is configured at the top of the import block below.
+# Until then startup progress is reported with flushed prints.
 logger = logging.getLogger(__name__)
-print("---HANDLER.PY: Basic logging configured.---", flush=True)
 
 # --- CRITICAL IMPORTS AND INITIALIZATION WITH DETAILED ERROR LOGGING ---
 print("---HANDLER.PY: Attempting critical imports and TTS Engine initialization...---", flush=True)
@@ -27,18 +30,21 @@ supabase_client_instance: Optional["SupabaseStorageClient"] = None # Declare for
 
 try:
     # Assuming tts_engine and its components are in the PYTHONPATH
+    from tts_engine.logging_utils import configure_logging, request_context
+    configure_logging()
+    logger.info("---HANDLER.PY: Logging configured.---")
     from tts_engine import generate_speech_from_api, AVAILABLE_VOICES, DEFAULT_VOICE
-    print("---HANDLER.PY: Successfully imported from tts_engine.---", flush=True)
+    from tts_engine import open_client, close_client, start_health_checks, BackendUnavailableError
+    from tts_engine import initialize_engine, stop_decode_workers, warm_up, wait_until_ready
+    logger.info("---HANDLER.PY: Successfully imported from tts_engine.---")
     
     # Import Supabase client
     from tts_engine.supabase_client import SupabaseStorageClient
-    print("---HANDLER.PY: Successfully imported SupabaseStorageClient.---", flush=True)
+    logger.info("---HANDLER.PY: Successfully imported SupabaseStorageClient.---")
 
-    # The SNAC model is loaded by speechpipe.py when it's imported.
-    # We just need to ensure tts_engine.speechpipe is imported.
-    import tts_engine.speechpipe # This should trigger the model load
-    logger.info("TTS Engine initialized (SNAC model should be loaded/downloaded).")
-    print("---HANDLER.PY: TTS Engine initialized (SNAC model should be loaded/downloaded via speechpipe import).---", flush=True)
+    # Importing tts_engine loads no model; torch and SNAC are loaded by
+    # initialize_engine() in the __main__ startup block below.
+    logger.info("---HANDLER.PY: TTS Engine imported (SNAC model is loaded by initialize_engine() at startup).---")
 
 except Exception as e:
     import traceback
@@ -81,8 +87,17 @@ async def get_supabase_client() -> SupabaseStorageClient:
 
 async def tts_handler(job: Dict[str, Any]) -> Dict[str, Any]:
     """Handles TTS requests, generates speech, optionally uploads to Supabase, and returns audio."""
+    # Tag every log record emitted while serving this job (engine included) with its id
+    with request_context(job.get('id')):
+        return await _handle_tts_job(job)
+
+async def _handle_tts_job(job: Dict[str, Any]) -> Dict[str, Any]:
     job_id = job.get('id', 'unknown_job')
     logger.info(f"---TTS_HANDLER [{job_id}]: Received job.---")
+    if not wait_until_ready(0):
+        # Only reachable if the handler is started without the warm-up above
+        logger.info(f"---TTS_HANDLER [{job_id}]: Waiting for decoder warm-up.---")
+        await asyncio.to_thread(wait_until_ready)
     logger.debug(f"---TTS_HANDLER [{job_id}]: Full job object: {job}---")
 
     job_input = job.get('input')
@@ -96,6 +111,7 @@ async def tts_handler(job: Dict[str, Any]) -> Dict[str, Any]:
     voice = job_input.get("voice", DEFAULT_VOICE)
     store_in_supabase = job_input.get("store_in_supabase", False)
     output_format = job_input.get("output_format", "wav") # Default to wav
+    decode_mode = job_input.get("decode_mode") # "sliding" / "incremental" / "offline"; None uses ORPHEUS_FILE_DECODE_MODE
     # further params like sample_rate, model can be extracted if tts_engine supports them
 
     if not text_to_speak:
@@ -129,7 +145,8 @@ async def tts_handler(job: Dict[str, Any]) -> Dict[str, Any]:
             prompt=text_to_speak,
             voice=voice,
             output_file=temp_output_path,
-            output_format=output_format # Pass output_format to the engine
+            output_format=output_format, # Pass output_format to the engine
+            decode_mode=decode_mode
             # Add other parameters like model, sample_rate if needed
         )
         generation_time = time.time() - start_time
@@ -198,6 +215,10 @@ async def tts_handler(job: Dict[str, Any]) -> Dict[str, Any]:
 
         return response_payload
 
+    except BackendUnavailableError as e:
+        # Fails fast (no backend reachable / circuit open); safe for the caller to retry later
+        logger.error(f"---TTS_HANDLER [{job_id}]: LLM backend unavailable: {e}---")
+        return {"error": f"LLM backend unavailable: {str(e)}", "status": "FAILED", "retryable": True}
     except Exception as e:
         logger.error(f"---TTS_HANDLER [{job_id}]: Unhandled exception in tts_handler: {e}---", exc_info=True)
         return {"error": f"An unexpected error occurred: {str(e)}", "status": "FAILED"}
@@ -219,8 +240,21 @@ async def tts_handler(job: Dict[str, Any]) -> Dict[str, Any]:
         # We will rely on the get_supabase_client to manage the instance lifecycle for now.
 
 
-# Start the RunPod serverless handler
-logger.info("---HANDLER.PY: Attempting to start RunPod serverless handler...---")
-print("---HANDLER.PY: Attempting to start RunPod serverless handler...---", flush=True) # Added flush
-runpod.serverless.start({"handler": tts_handler})
-print("---HANDLER.PY: runpod.serverless.start call completed (this line might not be reached if it blocks).---", flush=True) 
\ No newline at end of file
+# Decode worker processes are spawned and re-import this file as __mp_main__;
+# only the real entry point may start the handler
+if __name__ == "__main__":
+    # Open the shared LLM connection pool once per worker; it is reused by every job
+    open_client()
+    start_health_checks()
+    atexit.register(close_client)
+    # Load torch, SNAC and any decode worker processes (ORPHEUS_DECODE_WORKERS), and
+    # warm up the decoder, before the worker asks RunPod for jobs, so a
+    # scale-from-zero start does not make the first job pay for it
+    initialize_engine()
+    atexit.register(stop_decode_workers)
+    warm_up()
+
+    # Start the RunPod serverless handler
+    logger.info("---HANDLER.PY: Attempting to start RunPod serverless handler...---")
+    runpod.serverless.start({"handler": tts_handler})
+    logger.info("---HANDLER.PY: runpod.serverless.start call completed (this line might not be reached if it blocks).---")
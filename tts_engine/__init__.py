@@ -4,14 +4,40 @@ TTS Engine package for Orpheus text-to-speech system.
 This package contains the core components for audio generation:
 - inference.py: Token generation and API handling
 - speechpipe.py: Audio conversion pipeline
+- http_client.py: Shared connection pool for the LLM backend
+- backends.py: Routing and health checks across LLM backend replicas
+- resilience.py: Deadlines, retry backoff and circuit breakers for backend calls
+- decode_scheduler.py: Optional cross-request batching of SNAC decodes
+- snac_onnx.py: Optional ONNX Runtime backend for the SNAC decoder
+- governor.py: Torch thread budget and concurrent decode slots
+- decode_workers.py: Optional multi-process SNAC decode workers
+- pipeline.py: Long-lived workers running each request's token-to-audio pipeline
+- prefork.py: Launcher that forks server workers after loading the decoder
+- artifacts.py: Versioned local store for the SNAC model, loaded memory-mapped
+- logging_utils.py: Log configuration and per-request ids
+
+Importing the package is cheap: torch, SNAC and the hardware probes are only
+loaded by initialize_engine() (or by the first generation).
 """
 
 # Make key components available at package level
 from .inference import (
     generate_speech_from_api,
+    synthesize,
     AVAILABLE_VOICES,
     DEFAULT_VOICE,
     VOICE_TO_LANGUAGE,
     AVAILABLE_LANGUAGES,
-    list_available_voices
+    DECODE_MODES,
+    list_available_voices,
+    resolve_decode_mode,
+    initialize_engine
 )
+from .http_client import open_client, close_client
+from .backends import start_health_checks, backend_stats
+from .resilience import BackendUnavailableError, StreamInterruptedError
+from .decode_scheduler import decode_stats
+from .governor import decode_slot_stats
+from .pipeline import pipeline_stats
+from .decode_workers import start_decode_workers, stop_decode_workers, decode_worker_stats
+from .speechpipe import warm_up, is_ready, wait_until_ready
@@ -0,0 +1,255 @@
+"""
+Local, versioned store for the SNAC model (ORPHEUS_ARTIFACT_DIR).
+
+SNAC.from_pretrained() resolves the weights through the Hugging Face hub on
+every start. That fails on air-gapped nodes and slows serverless cold starts.
+`python -m tts_engine.artifacts stage` fetches them once, from the hub or from
+a local copy, converts them to safetensors and writes a versioned directory:
+
+    <ORPHEUS_ARTIFACT_DIR>/hubertsiuzdak--snac_24khz/
+        CURRENT                  version the server loads
+        <version>/               first 16 hex digits of model.safetensors' sha256
+            config.json
+            model.safetensors
+            snac_decoder_*.onnx  exported ONNX graphs (--onnx, --int8)
+            manifest.json        source, revision and sha256 of every file
+
+At startup load_snac() memory-maps the staged model.safetensors, and the
+model takes the mapped tensors as its parameters. The weights are not copied,
+and processes on the same host share the pages through the page cache. Staged ONNX graphs are used before ORPHEUS_ONNX_CACHE_DIR. None of
+this touches the network. If nothing is staged, the model is downloaded from
+the hub as before, unless ORPHEUS_OFFLINE is set, in which case startup fails.
+
+Usage:
+    python -m tts_engine.artifacts stage --onnx        # from the hub
+    python -m tts_engine.artifacts stage --source DIR  # from config.json + pytorch_model.bin in DIR
+    python -m tts_engine.artifacts list
+    python -m tts_engine.artifacts verify
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAC_REPO_ID = "hubertsiuzdak/snac_24khz"
+
+ARTIFACT_DIR = os.path.expanduser(os.environ.get("ORPHEUS_ARTIFACT_DIR", "~/.cache/orpheus/artifacts"))
+
+# Fail at startup instead of downloading when no model is staged
+OFFLINE = os.environ.get("ORPHEUS_OFFLINE", "false").strip().lower() in ("1", "true", "yes", "on")
+
+CONFIG_FILE = "config.json"
+WEIGHTS_FILE = "model.safetensors"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+def repo_dir(repo_id: str = SNAC_REPO_ID, artifact_dir: str = ARTIFACT_DIR) -> str:
+    """Directory holding the staged versions of repo_id."""
+    return os.path.join(artifact_dir, repo_id.replace("/", "--"))
+
+def staged_path(repo_id: str = SNAC_REPO_ID, artifact_dir: str = ARTIFACT_DIR) -> Optional[str]:
+    """Directory of the current staged version of repo_id, or None if nothing is staged."""
+    root = repo_dir(repo_id, artifact_dir)
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(root, version)
+    return path if version and os.path.isfile(os.path.join(path, MANIFEST_FILE)) else None
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _source_files(repo_id: str, source: Optional[str], revision: Optional[str]) -> Tuple[str, str, Optional[str]]:
+    """(config path, weights path, hub revision) from a local directory or the hub."""
+    if source is not None:
+        for name in (WEIGHTS_FILE, "pytorch_model.bin"):
+            if os.path.isfile(os.path.join(source, name)):
+                return os.path.join(source, CONFIG_FILE), os.path.join(source, name), None
+        raise FileNotFoundError(f"{source} has no {WEIGHTS_FILE} or pytorch_model.bin")
+    from huggingface_hub import hf_hub_download
+    config_path = hf_hub_download(repo_id=repo_id, filename=CONFIG_FILE, revision=revision)
+    weights_path = hf_hub_download(repo_id=repo_id, filename="pytorch_model.bin", revision=revision)
+    # The hub cache keeps files under snapshots/<commit>/
+    return config_path, weights_path, os.path.basename(os.path.dirname(weights_path))
+
+def stage(repo_id: str = SNAC_REPO_ID, source: Optional[str] = None, revision: Optional[str] = None,
+          artifact_dir: str = ARTIFACT_DIR, onnx: bool = False, int8: bool = False) -> str:
+    """
+    Stage repo_id's SNAC model (from the hub, or from source if given) and
+    the requested ONNX graphs, and make it the current version. Staging the
+    same weights again reuses their version and adds missing graphs.
+    Returns the version directory.
+    """
+    import torch
+    from snac import SNAC
+    from safetensors.torch import save_file
+
+    config_path, weights_path, revision = _source_files(repo_id, source, revision)
+    if weights_path.endswith(".safetensors"):
+        from safetensors.torch import load_file
+        state_dict = load_file(weights_path)
+    else:
+        state_dict = torch.load(weights_path, map_location="cpu", weights_only=True)
+    # Loading strictly checks that the weights fit the config before anything is written
+    model = SNAC.from_config(config_path)
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    root = repo_dir(repo_id, artifact_dir)
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=root)
+    # mkdtemp creates it private to the user; the server may run as another one
+    os.chmod(staging, 0o755)
+    try:
+        shutil.copyfile(config_path, os.path.join(staging, CONFIG_FILE))
+        save_file({name: tensor.contiguous() for name, tensor in state_dict.items()},
+                  os.path.join(staging, WEIGHTS_FILE))
+        os.chmod(os.path.join(staging, WEIGHTS_FILE), 0o644)
+        version = _sha256(os.path.join(staging, WEIGHTS_FILE))[:16]
+        path = os.path.join(root, version)
+        if os.path.isdir(path):
+            logger.info(f"{repo_id} version {version} is already staged")
+        else:
+            os.replace(staging, path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if onnx or int8:
+        from . import snac_onnx
+        for quantized in ([False] if onnx else []) + ([True] if int8 else []):
+            graph_path = snac_onnx.decoder_path(model, path, quantized)
+            if not os.path.exists(graph_path):
+                logger.info(f"Exporting {'int8-quantized ' if quantized else ''}SNAC decoder to {graph_path}")
+                snac_onnx.export_decoder(model, graph_path, quantized)
+
+    manifest = {
+        "repo_id": repo_id,
+        "version": version,
+        "source": os.path.abspath(source) if source is not None else "huggingface",
+        "revision": revision,
+        "staged_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "torch": torch.__version__,
+        "files": {name: _sha256(os.path.join(path, name)) for name in sorted(os.listdir(path))
+                  if name != MANIFEST_FILE},
+    }
+    _write_atomic(os.path.join(path, MANIFEST_FILE), json.dumps(manifest, indent=2) + "\n")
+    _write_atomic(os.path.join(root, CURRENT_FILE), version + "\n")
+    logger.info(f"Staged {repo_id} version {version} at {path} ({', '.join(manifest['files'])})")
+    return path
+
+def staged_versions(repo_id: str = SNAC_REPO_ID, artifact_dir: str = ARTIFACT_DIR) -> List[Dict]:
+    """Manifests of the staged versions of repo_id, oldest first."""
+    root = repo_dir(repo_id, artifact_dir)
+    manifests = []
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        try:
+            with open(os.path.join(root, name, MANIFEST_FILE)) as f:
+                manifests.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(manifests, key=lambda manifest: manifest["staged_at"])
+
+def verify(path: str) -> List[str]:
+    """Files in a staged version that are missing or differ from its manifest."""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        files = json.load(f)["files"]
+    return [name for name, digest in files.items()
+            if not os.path.isfile(os.path.join(path, name)) or _sha256(os.path.join(path, name)) != digest]
+
+def load_snac(phases: Optional[Dict[str, float]] = None, repo_id: str = SNAC_REPO_ID,
+              artifact_dir: str = ARTIFACT_DIR):
+    """
+    The SNAC model in eval mode on CPU, and the staged version directory it
+    came from (None if it was downloaded). Seconds spent in each phase are
+    added to phases.
+    """
+    from snac import SNAC
+    phases = phases if phases is not None else {}
+    start = time.perf_counter()
+    path = staged_path(repo_id, artifact_dir)
+    phases["resolve"] = time.perf_counter() - start
+    if path is None:
+        if OFFLINE:
+            raise RuntimeError(f"No staged {repo_id} in {artifact_dir} and ORPHEUS_OFFLINE is set; "
+                               f"run `python -m tts_engine.artifacts stage` first")
+        logger.warning(f"No staged {repo_id} in {artifact_dir}; loading it through the Hugging Face hub. "
+                       f"Run `python -m tts_engine.artifacts stage` to load it locally")
+        start = time.perf_counter()
+        model = SNAC.from_pretrained(repo_id).eval()
+        phases["download"] = time.perf_counter() - start
+        return model, None
+
+    from safetensors.torch import load_file
+    start = time.perf_counter()
+    # The initial parameters are freed when the mapped tensors replace them. Building
+    # on the meta device would skip allocating them, but its setup costs more (~2 s)
+    model = SNAC.from_config(os.path.join(path, CONFIG_FILE))
+    phases["build"] = time.perf_counter() - start
+    start = time.perf_counter()
+    model.load_state_dict(load_file(os.path.join(path, WEIGHTS_FILE)), assign=True)
+    phases["weights"] = time.perf_counter() - start
+    logger.info(f"Loaded SNAC from {path} (memory-mapped)")
+    return model.eval(), path
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage the SNAC model for loading without network access")
+    parser.add_argument("--artifact-dir", default=ARTIFACT_DIR, help="Artifact store (default: ORPHEUS_ARTIFACT_DIR)")
+    parser.add_argument("--repo-id", default=SNAC_REPO_ID, help="Model to stage or inspect")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stage_parser = commands.add_parser("stage", help="Fetch, convert and stage the model, and make it current")
+    stage_parser.add_argument("--source", help="Local directory with config.json and pytorch_model.bin "
+                                               "or model.safetensors, instead of the hub")
+    stage_parser.add_argument("--revision", help="Hub revision (branch, tag or commit)")
+    stage_parser.add_argument("--onnx", action="store_true", help="Also export the float ONNX decoder graph")
+    stage_parser.add_argument("--int8", action="store_true", help="Also export the int8-quantized ONNX graph")
+    commands.add_parser("list", help="List staged versions")
+    commands.add_parser("verify", help="Check the current version's files against its manifest")
+    args = parser.parse_args()
+
+    if args.command == "stage":
+        stage(args.repo_id, args.source, args.revision, args.artifact_dir, args.onnx, args.int8)
+    elif args.command == "list":
+        current = staged_path(args.repo_id, args.artifact_dir)
+        current = os.path.basename(current) if current else None
+        manifests = staged_versions(args.repo_id, args.artifact_dir)
+        if not manifests:
+            print(f"No staged versions of {args.repo_id} in {args.artifact_dir}")
+        for manifest in manifests:
+            marker = "*" if manifest["version"] == current else " "
+            print(f"{marker} {manifest['version']}  {manifest['staged_at']}  {manifest['source']}"
+                  f"{' @ ' + manifest['revision'] if manifest.get('revision') else ''}  {', '.join(manifest['files'])}")
+    else:
+        path = staged_path(args.repo_id, args.artifact_dir)
+        if path is None:
+            print(f"No staged version of {args.repo_id} in {args.artifact_dir}")
+            sys.exit(1)
+        bad = verify(path)
+        if bad:
+            print(f"{path}: {', '.join(bad)} missing or modified")
+            sys.exit(1)
+        print(f"{path}: OK")
+
+if __name__ == "__main__":
+    main()
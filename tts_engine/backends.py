@@ -0,0 +1,391 @@
+"""
+Pool of LLM backends with load-aware routing.
+
+ORPHEUS_API_URLS lists several llama.cpp / vLLM / LM Studio replicas
+(comma-separated; ORPHEUS_API_URL is used when it is not set). Each generation
+leases one backend for its whole duration:
+
+- least_requests: fewest generations in flight
+- least_tokens: fewest estimated tokens still to be generated; the estimate
+  comes from the text length and shrinks as tokens arrive
+- round_robin: plain rotation (what an external load balancer would do)
+
+A backend can be capped with "url|N" (at most N generations in flight) or
+globally with ORPHEUS_BACKEND_MAX_CONCURRENCY. When every healthy backend is
+at its cap, new generations wait for a slot.
+
+With more than one backend, a background task on the engine loop polls each
+replica's health endpoint and takes dead ones out of rotation; a connection
+failure during a request does the same immediately. Requests never wait on a
+health check. If no backend is healthy, all of them are tried anyway.
+Backends whose circuit breaker is open (see resilience.py) get no traffic at
+all; when every circuit is open a lease fails at once with
+BackendUnavailableError instead of queueing.
+
+Optional hedging (ORPHEUS_HEDGE) cuts tail latency from a stalled replica:
+when the first chunk of a generation takes longer than a percentile of recent
+time-to-first-token, the same request is also sent to another backend and
+whichever answers first is kept. Hedges draw on a budget that caps the extra
+load at ORPHEUS_HEDGE_BUDGET_PERCENT of all generations.
+"""
+
+import os
+import asyncio
+import logging
+import contextlib
+from collections import deque
+from urllib.parse import urlsplit
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from . import http_client
+from .resilience import BackendUnavailableError, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+ROUTING_MODES = ("least_requests", "least_tokens", "round_robin")
+
+ROUTING = os.environ.get("ORPHEUS_ROUTING", "least_requests").strip().lower()
+if ROUTING not in ROUTING_MODES:
+    logger.warning("Invalid ORPHEUS_ROUTING value, using least_requests as fallback")
+    ROUTING = "least_requests"
+
+try:
+    MAX_CONCURRENCY = int(os.environ.get("ORPHEUS_BACKEND_MAX_CONCURRENCY", "0"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_BACKEND_MAX_CONCURRENCY value, using 0 (unlimited) as fallback")
+    MAX_CONCURRENCY = 0
+
+try:
+    HEALTH_CHECK_INTERVAL = float(os.environ.get("ORPHEUS_HEALTH_CHECK_INTERVAL", "5"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_HEALTH_CHECK_INTERVAL value, using 5 seconds as fallback")
+    HEALTH_CHECK_INTERVAL = 5.0
+
+try:
+    HEALTH_CHECK_TIMEOUT = float(os.environ.get("ORPHEUS_HEALTH_CHECK_TIMEOUT", "2"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_HEALTH_CHECK_TIMEOUT value, using 2 seconds as fallback")
+    HEALTH_CHECK_TIMEOUT = 2.0
+
+# Path polled on each backend's host (llama.cpp and vLLM both serve /health)
+HEALTH_CHECK_PATH = os.environ.get("ORPHEUS_HEALTH_CHECK_PATH", "/health")
+
+# Hedged requests
+HEDGE_ENABLED = os.environ.get("ORPHEUS_HEDGE", "false").strip().lower() in ("1", "true", "yes", "on")
+
+try:
+    HEDGE_PERCENTILE = float(os.environ.get("ORPHEUS_HEDGE_PERCENTILE", "95"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_HEDGE_PERCENTILE value, using 95 as fallback")
+    HEDGE_PERCENTILE = 95.0
+
+try:
+    HEDGE_BUDGET_PERCENT = float(os.environ.get("ORPHEUS_HEDGE_BUDGET_PERCENT", "5"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_HEDGE_BUDGET_PERCENT value, using 5 as fallback")
+    HEDGE_BUDGET_PERCENT = 5.0
+
+try:
+    HEDGE_MIN_DELAY = float(os.environ.get("ORPHEUS_HEDGE_MIN_DELAY", "0.05"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_HEDGE_MIN_DELAY value, using 0.05 seconds as fallback")
+    HEDGE_MIN_DELAY = 0.05
+
+# Orpheus emits roughly 6 audio tokens per character of input text
+# (~14 characters/s of speech at ~83 tokens/s)
+TOKENS_PER_CHAR = 6
+
+def estimate_tokens(text: str, max_tokens: int) -> int:
+    """Rough number of tokens a generation for text will produce."""
+    return max(1, min(max_tokens, len(text) * TOKENS_PER_CHAR))
+
+class Backend:
+    """One LLM replica and its current load."""
+    def __init__(self, url: str, max_concurrency: int = 0):
+        self.url = url
+        self.max_concurrency = max_concurrency  # 0 = unlimited
+        parts = urlsplit(url)
+        self.health_url = f"{parts.scheme}://{parts.netloc}{HEALTH_CHECK_PATH}"
+        self.healthy = True
+        self.outstanding = 0
+        self.outstanding_tokens = 0
+        self.total_requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.breaker = CircuitBreaker()
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.max_concurrency <= 0 or self.outstanding < self.max_concurrency
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "outstanding_tokens": self.outstanding_tokens,
+            "total_requests": self.total_requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "circuit": self.breaker.stats(),
+        }
+
+class Lease:
+    """A backend held by one generation; report progress so token routing stays accurate."""
+    def __init__(self, backend: Backend, estimated_tokens: int):
+        self.backend = backend
+        self.remaining_tokens = estimated_tokens
+
+    @property
+    def url(self) -> str:
+        return self.backend.url
+
+    def progress(self, tokens: int) -> None:
+        used = min(tokens, self.remaining_tokens)
+        self.remaining_tokens -= used
+        self.backend.outstanding_tokens -= used
+
+class HedgePolicy:
+    """Decides when to hedge and keeps the hedging counters.
+
+    The delay is a percentile of the last `window` times-to-first-chunk; no
+    hedge is sent until `min_samples` have been seen. The budget is a token
+    bucket: each generation adds budget_percent/100 of a hedge, each hedge
+    spends one, so hedges stay below that share of traffic over time while
+    still allowing a short burst (up to `burst`) when a replica stalls.
+    """
+    def __init__(self, enabled: bool = HEDGE_ENABLED, percentile: float = HEDGE_PERCENTILE,
+                 budget_percent: float = HEDGE_BUDGET_PERCENT, min_delay: float = HEDGE_MIN_DELAY,
+                 window: int = 200, min_samples: int = 20, burst: float = 10.0):
+        self.enabled = enabled
+        self.percentile = min(max(percentile, 0.0), 100.0)
+        self.budget_ratio = max(budget_percent, 0.0) / 100.0
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.burst = burst
+        self._samples = deque(maxlen=window)
+        self._budget = 0.0
+        self.generations = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.hedges_skipped_budget = 0
+
+    def record_first_chunk(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait for a first chunk before hedging, or None to not hedge.
+
+        Called once per generation; also refills the budget.
+        """
+        self.generations += 1
+        self._budget = min(self.burst, self._budget + self.budget_ratio)
+        if not self.enabled or len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return max(self.min_delay, ordered[index])
+
+    def try_hedge(self) -> bool:
+        """Spend budget on one hedge; False if the budget is exhausted."""
+        if self._budget < 1.0:
+            self.hedges_skipped_budget += 1
+            return False
+        self._budget -= 1.0
+        self.hedges_sent += 1
+        return True
+
+    def stats(self) -> Dict:
+        ordered = sorted(self._samples)
+        return {
+            "enabled": self.enabled,
+            "generations": self.generations,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "hedges_skipped_budget": self.hedges_skipped_budget,
+            "hedge_rate": self.hedges_sent / self.generations if self.generations else 0.0,
+            "first_chunk_p50": ordered[len(ordered) // 2] if ordered else None,
+            "first_chunk_samples": len(ordered),
+        }
+
+class BackendPool:
+    """Routes generations across backends. Created and used on the engine loop."""
+    def __init__(self, backends: List[Backend], routing: str = ROUTING):
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = backends
+        self.routing = routing
+        self._next = 0
+        self.loop = asyncio.get_running_loop()
+        self._slot_freed = asyncio.Condition()
+        self._health_task: Optional[asyncio.Task] = None
+        self.hedging = HedgePolicy()
+
+    def _pick(self, exclude: Optional[Backend] = None) -> Optional[Backend]:
+        available = [b for b in self.backends if b.breaker.available()]
+        if not available:
+            retry_after = min(b.breaker.retry_after() for b in self.backends)
+            raise BackendUnavailableError("All LLM backends are failing (circuit open)", retry_after)
+        candidates = ([b for b in available if b.healthy and b is not exclude]
+                      or [b for b in available if b.healthy]
+                      # Better to try a backend that failed its last check than to refuse outright
+                      or available)
+        candidates = [b for b in candidates if b.has_capacity]
+        if not candidates:
+            return None
+
+        n = len(self.backends)
+        start = self._next
+        def rotation(backend: Backend) -> int:
+            return (self.backends.index(backend) - start) % n
+
+        if self.routing == "least_tokens":
+            chosen = min(candidates, key=lambda b: (b.outstanding_tokens, b.outstanding, rotation(b)))
+        elif self.routing == "least_requests":
+            chosen = min(candidates, key=lambda b: (b.outstanding, rotation(b)))
+        else:
+            chosen = min(candidates, key=rotation)
+        self._next = (self.backends.index(chosen) + 1) % n
+        return chosen
+
+    @contextlib.asynccontextmanager
+    async def lease(self, estimated_tokens: int = 0, exclude: Optional[Backend] = None) -> AsyncIterator[Lease]:
+        """Hold the least loaded backend for the duration of the block.
+
+        exclude skips one backend when another is available (used when
+        retrying after that backend failed). Raises BackendUnavailableError
+        if every backend's circuit is open.
+        """
+        async with self._slot_freed:
+            while True:
+                backend = self._pick(exclude)
+                if backend is not None:
+                    break
+                await self._slot_freed.wait()
+            backend.outstanding += 1
+            backend.outstanding_tokens += estimated_tokens
+            backend.total_requests += 1
+            backend.breaker.on_dispatch()
+        lease = Lease(backend, estimated_tokens)
+        try:
+            yield lease
+        finally:
+            backend.breaker.on_release()
+            backend.outstanding -= 1
+            backend.outstanding_tokens -= lease.remaining_tokens
+            async with self._slot_freed:
+                self._slot_freed.notify_all()
+
+    def record_success(self, backend: Backend) -> None:
+        backend.breaker.record_success()
+
+    def record_failure(self, backend: Backend, error: BaseException) -> None:
+        """Count a failed request against the backend's circuit breaker."""
+        backend.failures += 1
+        backend.last_error = f"{type(error).__name__}: {error}"
+        if backend.breaker.record_failure():
+            logger.warning(f"Circuit opened for {backend.url} after repeated failures; "
+                           f"no traffic for {backend.breaker.reset_timeout:g}s")
+
+    def mark_failed(self, backend: Backend, error: BaseException) -> None:
+        """Record a failure and take the backend out of rotation until its next successful health check."""
+        self.record_failure(backend, error)
+        # Only health checks bring a backend back, so without them it stays in rotation
+        if self._health_task is not None and backend.healthy:
+            logger.warning(f"Backend {backend.url} failed ({backend.last_error}); removed from rotation")
+            backend.healthy = False
+
+    async def _check(self, backend: Backend) -> None:
+        client = http_client.get_client()
+        try:
+            response = await client.get(backend.health_url, timeout=HEALTH_CHECK_TIMEOUT)
+            # 404/401 still prove the server is up; 5xx means loading or broken
+            healthy = response.status_code < 500
+            error = None if healthy else f"health check returned {response.status_code}"
+        except httpx.HTTPError as e:
+            healthy, error = False, f"{type(e).__name__}: {e}"
+        if healthy != backend.healthy:
+            if healthy:
+                logger.info(f"Backend {backend.url} is healthy; returned to rotation")
+            else:
+                logger.warning(f"Backend {backend.url} failed health check ({error}); removed from rotation")
+        backend.healthy = healthy
+        if error:
+            backend.last_error = error
+        if healthy:
+            async with self._slot_freed:
+                self._slot_freed.notify_all()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check(b) for b in self.backends))
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+    def start_health_checks(self) -> None:
+        # A single backend has nowhere else to route, so polling it buys nothing
+        if len(self.backends) < 2 or HEALTH_CHECK_INTERVAL <= 0:
+            return
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    def stats(self) -> Dict:
+        return {"routing": self.routing,
+                "backends": [b.stats() for b in self.backends],
+                "hedging": self.hedging.stats()}
+
+def parse_backend_urls(value: str) -> List[Backend]:
+    """Parse "url[|max_concurrency], ..." into backends."""
+    backends = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, cap = item.partition("|")
+        try:
+            max_concurrency = int(cap) if cap else MAX_CONCURRENCY
+        except ValueError:
+            logger.warning(f"Invalid concurrency cap in ORPHEUS_API_URLS entry '{item}', using {MAX_CONCURRENCY}")
+            max_concurrency = MAX_CONCURRENCY
+        backends.append(Backend(url.strip(), max_concurrency))
+    return backends
+
+def configured_backends() -> List[Backend]:
+    return parse_backend_urls(os.environ.get("ORPHEUS_API_URLS") or os.environ.get("ORPHEUS_API_URL") or "")
+
+_pool: Optional[BackendPool] = None
+
+def get_pool() -> BackendPool:
+    """Return the process-wide pool. Must be called from the engine loop."""
+    global _pool
+    # The engine loop is recreated after close_client(); asyncio primitives can't move loops
+    if _pool is None or _pool.loop is not asyncio.get_running_loop():
+        backends = configured_backends()
+        if not backends:
+            raise RuntimeError("No LLM backend configured. Set ORPHEUS_API_URL or ORPHEUS_API_URLS.")
+        _pool = BackendPool(backends)
+        if len(backends) > 1:
+            logger.info(f"Routing across {len(backends)} backends ({_pool.routing}): "
+                        f"{', '.join(b.url for b in backends)}")
+            if _pool.hedging.enabled:
+                logger.info(f"Hedging after p{HEDGE_PERCENTILE:g} time-to-first-chunk, "
+                            f"budget {HEDGE_BUDGET_PERCENT:g}% extra requests")
+    _pool.start_health_checks()
+    return _pool
+
+async def _start() -> None:
+    get_pool()
+
+def start_health_checks() -> None:
+    """Create the pool and begin background health checks (call at app startup)."""
+    try:
+        http_client.run_coroutine(_start())
+    except RuntimeError as e:
+        logger.warning(str(e))
+
+def backend_stats() -> Dict:
+    """Snapshot of per-backend load and health, plus hedging counters."""
+    async def _stats():
+        return get_pool().stats()
+    return http_client.run_coroutine(_stats())
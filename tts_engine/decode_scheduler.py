@@ -0,0 +1,268 @@
+"""
+Cross-request batching of SNAC decodes.
+
+Every generation decodes its windows through a DecodeStream. With batching off
+(the default) a stream decodes each window inline, exactly as before. With
+ORPHEUS_DECODE_BATCHING on, streams hand their windows to one DecodeScheduler
+thread, which runs windows of the same length from different requests as a
+single batched model.decode and returns each request's slice:
+
+- a batch is sent as soon as it holds ORPHEUS_DECODE_MAX_BATCH windows, or
+  every open stream has a window queued, or ORPHEUS_DECODE_MAX_WAIT_MS has
+  passed since the oldest window arrived (or since the previous batch
+  finished, if it arrived during that decode);
+- one stream contributes at most ORPHEUS_DECODE_MAX_PER_STREAM windows to a
+  batch, so a request that delivers many windows at once (non-streaming
+  backends) cannot crowd out the others;
+- decode_stats() reports batch sizes, why batches were sent and queue waits.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import collections
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .speechpipe import deinterleave_codes, decode_code_windows
+
+logger = logging.getLogger(__name__)
+
+DECODE_BATCHING = os.environ.get("ORPHEUS_DECODE_BATCHING", "false").strip().lower() in ("1", "true", "yes", "on")
+
+try:
+    MAX_BATCH = max(1, int(os.environ.get("ORPHEUS_DECODE_MAX_BATCH", "8")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_MAX_BATCH value, using 8 as fallback")
+    MAX_BATCH = 8
+
+try:
+    MAX_WAIT_MS = max(0.0, float(os.environ.get("ORPHEUS_DECODE_MAX_WAIT_MS", "5")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_MAX_WAIT_MS value, using 5 ms as fallback")
+    MAX_WAIT_MS = 5.0
+
+try:
+    MAX_PER_STREAM = max(1, int(os.environ.get("ORPHEUS_DECODE_MAX_PER_STREAM", "2")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_MAX_PER_STREAM value, using 2 as fallback")
+    MAX_PER_STREAM = 2
+
+class _QueuedWindow:
+    __slots__ = ("stream", "codes", "window_frames", "keep", "future", "enqueued")
+
+    def __init__(self, stream, codes, window_frames, keep):
+        self.stream = stream
+        self.codes = codes
+        self.window_frames = window_frames
+        self.keep = keep
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class DecodeStream:
+    """One generation's decode queue: submit windows in order, read audio back in the same order."""
+    def __init__(self, scheduler: Optional["DecodeScheduler"] = None, max_in_flight: int = 0):
+        self._scheduler = scheduler
+        self.max_in_flight = max_in_flight
+        self._pending = collections.deque()
+
+    def submit(self, multiframe, first_frame: int, num_frames: int) -> None:
+        """Queue a window (see speechpipe.decode_frames). The codes are copied, so ring views may be reused."""
+        future = Future()
+        deinterleaved = deinterleave_codes(multiframe)
+        if deinterleaved is None:
+            future.set_result(None)
+        elif self._scheduler is None:
+            host_codes, window_frames = deinterleaved
+            future.set_result(decode_code_windows([host_codes], window_frames, [(first_frame, num_frames)])[0])
+        else:
+            host_codes, window_frames = deinterleaved
+            future = self._scheduler._enqueue(self, host_codes, window_frames, (first_frame, num_frames))
+        self._pending.append(future)
+
+    async def results(self, flush: bool = False) -> AsyncIterator[Optional[bytes]]:
+        """Yield finished audio (None for invalid windows) until at most max_in_flight remain, or none if flush.
+
+        Windows decoded inline are already done. Batched windows are awaited,
+        so the other pipelines on the caller's event loop keep running (and
+        submitting windows) while this one waits for its batch.
+        """
+        limit = 0 if flush else self.max_in_flight
+        while len(self._pending) > limit:
+            future = self._pending[0]
+            if not future.done():
+                await asyncio.wrap_future(future)
+            yield self._pending.popleft().result()
+
+    def close(self) -> None:
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        if self._scheduler is not None:
+            self._scheduler._stream_closed()
+            self._scheduler = None
+
+class DecodeScheduler:
+    """Collects windows from all open streams and decodes them in batches on one thread."""
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS,
+                 max_per_stream: int = MAX_PER_STREAM):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_per_stream = max_per_stream
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._open_streams = 0
+        self._closed = False
+        self._idle_since = time.perf_counter()
+        # Counters
+        self.batches = 0
+        self.windows = 0
+        self.batch_sizes = collections.Counter()
+        self.dispatch_reasons = collections.Counter()
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.decode_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="DecodeScheduler", daemon=True)
+        self._thread.start()
+
+    def open_stream(self) -> DecodeStream:
+        with self._cond:
+            self._open_streams += 1
+        return DecodeStream(self, self.max_per_stream)
+
+    def _stream_closed(self) -> None:
+        with self._cond:
+            self._open_streams -= 1
+            # The remaining streams may now all be waiting
+            self._cond.notify()
+
+    def _enqueue(self, stream, codes, window_frames, keep) -> Future:
+        item = _QueuedWindow(stream, codes, window_frames, keep)
+        with self._cond:
+            self._queue.append(item)
+            self._cond.notify()
+        return item.future
+
+    def _select(self) -> Tuple[List[_QueuedWindow], bool]:
+        """Oldest-first windows matching the oldest window's length, within the per-stream cap."""
+        window_frames = self._queue[0].window_frames
+        batch, per_stream, waiting = [], {}, set()
+        for item in self._queue:
+            waiting.add(item.stream)
+            if len(batch) >= self.max_batch or item.window_frames != window_frames:
+                continue
+            taken = per_stream.get(item.stream, 0)
+            if taken < self.max_per_stream:
+                per_stream[item.stream] = taken + 1
+                batch.append(item)
+        return batch, len(waiting) >= self._open_streams
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                # The wait budget starts when the worker is free: windows queued during
+                # the previous decode get a chance to batch with streams that resubmit
+                deadline = max(self._queue[0].enqueued, self._idle_since) + self.max_wait
+                while True:
+                    batch, all_waiting = self._select()
+                    if len(batch) >= self.max_batch:
+                        reason = "full"
+                        break
+                    if all_waiting:
+                        reason = "all_streams_waiting"
+                        break
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        reason = "max_wait"
+                        break
+                    self._cond.wait(remaining)
+                for item in batch:
+                    self._queue.remove(item)
+            # Windows of streams that were closed meanwhile are dropped
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if batch:
+                self._dispatch(batch, reason)
+                self._idle_since = time.perf_counter()
+
+    def _dispatch(self, batch: List[_QueuedWindow], reason: str) -> None:
+        start = time.perf_counter()
+        try:
+            results = decode_code_windows([item.codes for item in batch], batch[0].window_frames,
+                                          [item.keep for item in batch])
+        except Exception as e:
+            logger.exception(f"Batched decode of {len(batch)} windows failed")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        for item, audio in zip(batch, results):
+            item.future.set_result(audio)
+        waits = [start - item.enqueued for item in batch]
+        with self._cond:
+            self.batches += 1
+            self.windows += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            self.dispatch_reasons[reason] += 1
+            self.total_wait += sum(waits)
+            self.max_wait_seen = max(self.max_wait_seen, max(waits))
+            self.decode_seconds += elapsed
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Decoded batch of {len(batch)} x {batch[0].window_frames} frames in "
+                         f"{elapsed * 1000:.1f} ms ({reason}, oldest waited {max(waits) * 1000:.1f} ms)")
+
+    def close(self) -> None:
+        """Stop the worker once the queue is empty."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "enabled": True,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_per_stream": self.max_per_stream,
+                "open_streams": self._open_streams,
+                "queued": len(self._queue),
+                "batches": self.batches,
+                "windows": self.windows,
+                "mean_batch_size": self.windows / self.batches if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "dispatch_reasons": dict(self.dispatch_reasons),
+                "mean_wait_ms": self.total_wait / self.windows * 1000 if self.windows else 0.0,
+                "max_wait_ms_seen": self.max_wait_seen * 1000,
+                "decode_seconds": self.decode_seconds,
+            }
+
+_scheduler: Optional[DecodeScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> DecodeScheduler:
+    """The process-wide scheduler, started on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = DecodeScheduler()
+            logger.info(f"Decode batching enabled (max batch {_scheduler.max_batch}, "
+                        f"max wait {MAX_WAIT_MS:g} ms, {_scheduler.max_per_stream} per stream)")
+        return _scheduler
+
+def open_stream() -> DecodeStream:
+    """A decode stream for one generation; batched across requests if ORPHEUS_DECODE_BATCHING is on."""
+    if not DECODE_BATCHING:
+        return DecodeStream()
+    return get_scheduler().open_stream()
+
+def decode_stats() -> Dict:
+    """Batch formation counters of the scheduler, or {"enabled": False}."""
+    if _scheduler is None:
+        return {"enabled": False}
+    return _scheduler.stats()
@@ -0,0 +1,394 @@
+"""
+Optional multi-process SNAC decode tier (ORPHEUS_DECODE_WORKERS).
+
+In one process, concurrent decodes share the GIL and one torch thread pool,
+so they scale poorly past a few cores. With ORPHEUS_DECODE_WORKERS=N, the
+server starts N worker processes. Each holds its own SNAC model, with
+torch's threads pinned to its own group of cores (ORPHEUS_DECODE_WORKER_PINNING).
+speechpipe.decode_code_windows(), the call every decoder uses, then hands
+its windows to the least busy worker, so the decoders don't change.
+
+Codes and PCM don't go through pickling. Each worker owns a shared-memory
+ring of ORPHEUS_DECODE_WORKER_SLOTS slots, each large enough for
+ORPHEUS_DECODE_WORKER_MAX_FRAMES frames. The caller writes the codes into a
+free slot and sends the worker a small message with the slot number and the
+window layout. The worker writes the int16 PCM back into the same slot.
+Calls larger than a slot are split, and a single window larger than a slot
+is decoded in-process.
+
+Each worker runs speechpipe.warm_up() before it reports ready. Workers are
+started by start_decode_workers() (or on first use) and stopped by
+stop_decode_workers(). If a worker dies, or a call gets no answer within
+ORPHEUS_DECODE_WORKER_TIMEOUT seconds, its calls in flight fail and it
+gets no more work; a stuck worker is also terminated. A failed call is
+retried once on another worker, or in the server process if none is left,
+so one bad worker does not fail the request. Once no worker is left,
+decoding falls back to the server process.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import governor
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_PER_FRAME = 2048
+
+try:
+    DECODE_WORKERS = max(0, int(os.environ.get("ORPHEUS_DECODE_WORKERS", "0")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_WORKERS value, using 0 (decode in-process) as fallback")
+    DECODE_WORKERS = 0
+
+try:
+    WORKER_SLOTS = max(1, int(os.environ.get("ORPHEUS_DECODE_WORKER_SLOTS", "4")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_WORKER_SLOTS value, using 4 as fallback")
+    WORKER_SLOTS = 4
+
+try:
+    # Frames summed over the windows of one call: 8 windows of an offline segment
+    WORKER_MAX_FRAMES = max(1, int(os.environ.get("ORPHEUS_DECODE_WORKER_MAX_FRAMES", "256")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_WORKER_MAX_FRAMES value, using 256 as fallback")
+    WORKER_MAX_FRAMES = 256
+
+try:
+    WORKER_START_TIMEOUT = max(1.0, float(os.environ.get("ORPHEUS_DECODE_WORKER_START_TIMEOUT", "300")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_WORKER_START_TIMEOUT value, using 300 s as fallback")
+    WORKER_START_TIMEOUT = 300.0
+
+try:
+    # Per call; a worker that is alive but stuck would otherwise hold its caller and slot forever
+    WORKER_TIMEOUT = max(1.0, float(os.environ.get("ORPHEUS_DECODE_WORKER_TIMEOUT", "60")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_WORKER_TIMEOUT value, using 60 s as fallback")
+    WORKER_TIMEOUT = 60.0
+
+WORKER_PINNING = os.environ.get("ORPHEUS_DECODE_WORKER_PINNING", "true").strip().lower() in ("1", "true", "yes", "on")
+
+# Set in worker processes, whose decodes always run locally
+IN_WORKER = False
+
+def _slot_layout(max_frames: int):
+    """(input bytes, output bytes) of one ring slot."""
+    return max_frames * 7 * 4, max_frames * SAMPLES_PER_FRAME * 2
+
+def core_groups(workers: int, cpus: Optional[List[int]] = None, budget: Optional[int] = None) -> List[List[int]]:
+    """Disjoint groups of CPUs, one per worker, covering at most the CPU budget.
+
+    With more workers than CPUs the groups wrap around and share CPUs.
+    """
+    cpus = sorted(os.sched_getaffinity(0)) if cpus is None else list(cpus)
+    budget = min(len(cpus), governor.CPU_BUDGET if budget is None else budget)
+    per_worker = max(1, budget // workers)
+    return [[cpus[(i * per_worker + j) % len(cpus)] for j in range(per_worker)] for i in range(workers)]
+
+def _worker_main(index: int, cores: Optional[List[int]], shm_name: str, slots: int, max_frames: int, conn) -> None:
+    """Worker process: load SNAC, then decode the windows placed in its ring until told to stop."""
+    global IN_WORKER
+    IN_WORKER = True
+    if cores:
+        os.sched_setaffinity(0, cores)
+    from . import speechpipe
+    speechpipe.initialize()
+    governor.configure(intra_op_threads=len(cores) if cores else governor.INTRA_OP_THREADS, decode_slots=1)
+    speechpipe.warm_up()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    in_bytes, out_bytes = _slot_layout(max_frames)
+    slot_bytes = in_bytes + out_bytes
+    conn.send(("ready", os.getpid()))
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            slot, window_frames, keep = message
+            base = slot * slot_bytes
+            try:
+                codes = np.ndarray((len(keep), 7 * window_frames), dtype=np.int32, buffer=shm.buf, offset=base)
+                audio = speechpipe.decode_code_windows(list(codes), window_frames, keep)
+                offset = base + in_bytes
+                for pcm in audio:
+                    shm.buf[offset:offset + len(pcm)] = pcm
+                    offset += len(pcm)
+                conn.send((slot, [len(pcm) for pcm in audio], None))
+            except Exception as e:
+                conn.send((slot, None, f"{type(e).__name__}: {e}"))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        shm.close()
+
+class _Worker:
+    """Parent-side handle of one worker process: its ring, free slots and calls in flight."""
+    def __init__(self, context, index: int, cores: Optional[List[int]], slots: int, max_frames: int):
+        self.index = index
+        self.cores = cores
+        self.in_bytes, self.out_bytes = _slot_layout(max_frames)
+        self.slot_bytes = self.in_bytes + self.out_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self.pending: Dict[int, Future] = {}
+        self.in_flight = 0
+        self.alive = True
+        self.calls = 0
+        self._send_lock = threading.Lock()
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, name=f"SnacDecodeWorker-{index}", daemon=True,
+                                       args=(index, cores, self.shm.name, slots, max_frames, child_conn))
+        self.process.start()
+        child_conn.close()
+        if cores:
+            # Pin before the child creates any threads; the child pins itself again once running
+            try:
+                os.sched_setaffinity(self.process.pid, cores)
+            except OSError:
+                pass
+        self._reader = None
+
+    def wait_ready(self, timeout: float) -> None:
+        if not self.conn.poll(timeout):
+            raise RuntimeError(f"decode worker {self.index} did not start within {timeout:g} s")
+        message = self.conn.recv()
+        if message[0] != "ready":
+            raise RuntimeError(f"decode worker {self.index} sent {message!r} instead of ready")
+        self._reader = threading.Thread(target=self._read_results, name=f"SnacDecodeWorker-{self.index}-results",
+                                        daemon=True)
+        self._reader.start()
+
+    def _read_results(self) -> None:
+        while True:
+            try:
+                slot, lengths, error = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            # None once the call timed out and gave its slot back
+            future = self.pending.pop(slot, None)
+            if future is None or future.done():
+                continue
+            if error is None:
+                future.set_result(lengths)
+            else:
+                future.set_exception(RuntimeError(f"decode worker {self.index} failed: {error}"))
+        # Under the send lock, so no call can be sent after the pending ones are failed
+        with self._send_lock:
+            self.alive = False
+            for future in list(self.pending.values()):
+                if not future.done():
+                    future.set_exception(RuntimeError(f"decode worker {self.index} exited"))
+
+    def retire(self, reason: str) -> None:
+        """Send the worker no more calls, fail the ones in flight and terminate its process."""
+        with self._send_lock:
+            self.alive = False
+            for future in list(self.pending.values()):
+                if not future.done():
+                    future.set_exception(RuntimeError(f"decode worker {self.index} {reason}"))
+        logger.error(f"Decode worker {self.index} {reason}; retiring it")
+        # SIGKILL: a stuck worker may not get to handle SIGTERM
+        self.process.kill()
+
+    def decode(self, batch: np.ndarray, window_frames: int, keep, timeout: float = WORKER_TIMEOUT) -> List[bytes]:
+        slot = self.free_slots.get()
+        try:
+            base = slot * self.slot_bytes
+            np.ndarray(batch.shape, dtype=np.int32, buffer=self.shm.buf, offset=base)[:] = batch
+            future = Future()
+            with self._send_lock:
+                if not self.alive:
+                    raise RuntimeError(f"decode worker {self.index} exited")
+                self.pending[slot] = future
+                self.conn.send((slot, window_frames, list(keep)))
+            try:
+                lengths = future.result(timeout)
+            except FutureTimeoutError:
+                self.retire(f"did not answer within {timeout:g} s")
+                raise RuntimeError(f"decode worker {self.index} did not answer within {timeout:g} s") from None
+            offset = base + self.in_bytes
+            audio = []
+            for length in lengths:
+                audio.append(bytes(self.shm.buf[offset:offset + length]))
+                offset += length
+            return audio
+        finally:
+            self.pending.pop(slot, None)
+            self.free_slots.put(slot)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        try:
+            with self._send_lock:
+                self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+        self.shm.close()
+        self.shm.unlink()
+
+class DecodeWorkerPool:
+    """N decode worker processes; each call goes to the one with the fewest calls in flight."""
+    def __init__(self, workers: int, pinning: bool = WORKER_PINNING, slots: int = WORKER_SLOTS,
+                 max_frames: int = WORKER_MAX_FRAMES, start_timeout: float = WORKER_START_TIMEOUT,
+                 cores: Optional[List[List[int]]] = None):
+        # spawn, not fork: forking a process with torch and server threads running is unsafe
+        context = multiprocessing.get_context("spawn")
+        self.max_frames = max_frames
+        if cores is None:
+            cores = core_groups(workers) if pinning else [None] * workers
+        self._lock = threading.Lock()
+        self.workers: List[_Worker] = []
+        try:
+            for index in range(workers):
+                self.workers.append(_Worker(context, index, cores[index], slots, max_frames))
+            for worker in self.workers:
+                worker.wait_ready(start_timeout)
+        except BaseException:
+            self.close()
+            raise
+        self.local_fallbacks = 0
+        self.retries = 0
+
+    def alive(self) -> bool:
+        return any(worker.alive for worker in self.workers)
+
+    def _pick(self, exclude: Optional[_Worker] = None) -> Optional[_Worker]:
+        with self._lock:
+            candidates = [worker for worker in self.workers if worker.alive and worker is not exclude]
+            if not candidates:
+                return None
+            worker = min(candidates, key=lambda w: w.in_flight)
+            worker.in_flight += 1
+            worker.calls += 1
+            return worker
+
+    def _decode_on(self, worker: _Worker, batch: np.ndarray, window_frames: int, keep) -> List[bytes]:
+        try:
+            return worker.decode(batch, window_frames, keep)
+        finally:
+            with self._lock:
+                worker.in_flight -= 1
+
+    def _decode_chunk(self, batch: np.ndarray, window_frames: int, keep) -> Optional[List[bytes]]:
+        """Decode on the least busy worker; a failed call is retried once on another one.
+
+        Returns None when no other worker is left to retry on, so the caller
+        decodes in-process instead of failing the request.
+        """
+        worker = self._pick()
+        if worker is None:
+            return None
+        try:
+            return self._decode_on(worker, batch, window_frames, keep)
+        except RuntimeError as e:
+            error = e
+        with self._lock:
+            self.retries += 1
+        retry = self._pick(exclude=worker)
+        if retry is None:
+            logger.warning(f"{error}; decoding the call in-process")
+            return None
+        logger.warning(f"{error}; retrying the call on decode worker {retry.index}")
+        return self._decode_on(retry, batch, window_frames, keep)
+
+    def decode(self, host_codes, window_frames: int, keep) -> Optional[List[bytes]]:
+        """Same contract as speechpipe.decode_code_windows; None if the call should be decoded in-process
+        (a window does not fit a slot, or a worker failed and no other one is left)."""
+        per_call = self.max_frames // window_frames
+        if per_call == 0:
+            with self._lock:
+                self.local_fallbacks += 1
+            return None
+        audio = []
+        for start in range(0, len(host_codes), per_call):
+            batch = np.stack(host_codes[start:start + per_call]).astype(np.int32, copy=False)
+            chunk_audio = self._decode_chunk(batch, window_frames, keep[start:start + per_call])
+            if chunk_audio is None:
+                with self._lock:
+                    self.local_fallbacks += 1
+                return None
+            audio.extend(chunk_audio)
+        return audio
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": True,
+                "workers": len(self.workers),
+                "alive": sum(worker.alive for worker in self.workers),
+                "pids": [worker.process.pid for worker in self.workers],
+                "cores": [worker.cores for worker in self.workers],
+                "calls": [worker.calls for worker in self.workers],
+                "in_flight": [worker.in_flight for worker in self.workers],
+                "max_frames_per_call": self.max_frames,
+                "local_fallbacks": self.local_fallbacks,
+                "retries": self.retries,
+            }
+
+_pool: Optional[DecodeWorkerPool] = None
+_pool_lock = threading.Lock()
+_pool_failed = False
+
+def start_decode_workers() -> Optional[DecodeWorkerPool]:
+    """Start the ORPHEUS_DECODE_WORKERS pool if configured; returns it, or None to decode in-process."""
+    global _pool, _pool_failed
+    if DECODE_WORKERS == 0 or IN_WORKER or _pool_failed:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            start = time.perf_counter()
+            try:
+                _pool = DecodeWorkerPool(DECODE_WORKERS)
+            except Exception as e:
+                _pool_failed = True
+                logger.error(f"Could not start {DECODE_WORKERS} decode workers ({e}); decoding in-process")
+                return None
+            logger.info(f"Started {DECODE_WORKERS} SNAC decode workers in {time.perf_counter() - start:.1f} s "
+                        f"(cores {_pool.stats()['cores']})")
+        return _pool
+
+def get_pool() -> Optional[DecodeWorkerPool]:
+    """The running pool (started on first use), or None when decoding in-process."""
+    global _pool_failed
+    pool = _pool if _pool is not None else start_decode_workers()
+    if pool is not None and not pool.alive():
+        if not _pool_failed:
+            _pool_failed = True
+            logger.error("All decode workers have exited; decoding in-process")
+        return None
+    return pool
+
+def stop_decode_workers() -> None:
+    """Stop the worker processes and release their shared memory."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def decode_worker_stats() -> Dict:
+    """Worker processes, their cores and call counts, or {"enabled": False}."""
+    if _pool is None:
+        return {"enabled": False}
+    return _pool.stats()
@@ -0,0 +1,191 @@
+"""
+Thread budget for SNAC decoding.
+
+Requests decode on the pipeline worker threads (pipeline.py), and each decode
+call would otherwise use torch's default intra-op pool, which is sized to
+the host's cores, not the container's CPU quota. With a few concurrent
+requests a CPU node then runs many times more threads than it has CPUs and
+throughput collapses.
+
+The governor owns the thread settings instead:
+- the CPU budget comes from the cgroup CPU quota (v2 cpu.max or v1
+  cfs_quota_us), capped by the CPU affinity mask (ORPHEUS_CPU_BUDGET
+  overrides it);
+- torch's intra-op threads per decode call (ORPHEUS_TORCH_THREADS) and
+  inter-op threads (ORPHEUS_TORCH_INTEROP_THREADS) are set once at startup;
+- at most ORPHEUS_DECODE_SLOTS decode calls run at once, so slots times
+  threads stays within the budget. The others wait for a slot, and
+  decode_slot_stats() reports how long.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+import contextlib
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _cgroup_paths() -> Dict[str, str]:
+    """Controller -> cgroup path of this process ("" for the unified v2 hierarchy)."""
+    paths = {}
+    for line in (_read("/proc/self/cgroup") or "").splitlines():
+        _, controllers, path = line.split(":", 2)
+        for controller in controllers.split(","):
+            paths[controller] = path
+    return paths
+
+def _candidate_dirs(mount: str, path: str) -> Tuple[str, ...]:
+    """The process's own cgroup directory under mount first, then the mount itself (once if they are the same)."""
+    own = os.path.normpath(os.path.join(mount, path.lstrip("/")))
+    return (own,) if own == os.path.normpath(mount) else (own, mount)
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs allowed by the cgroup quota, or None if there is no quota."""
+    paths = _cgroup_paths()
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    for directory in _candidate_dirs("/sys/fs/cgroup", paths.get("", "/")):
+        cpu_max = _read(os.path.join(directory, "cpu.max"))
+        if cpu_max:
+            quota, _, period = cpu_max.partition(" ")
+            if quota != "max" and period:
+                return int(quota) / int(period)
+            return None
+    # cgroup v1
+    for mount in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        for directory in _candidate_dirs(mount, paths.get("cpu", "/")):
+            quota = _read(os.path.join(directory, "cpu.cfs_quota_us"))
+            period = _read(os.path.join(directory, "cpu.cfs_period_us"))
+            if quota and period:
+                return int(quota) / int(period) if int(quota) > 0 else None
+    return None
+
+def cpu_budget() -> Tuple[int, str]:
+    """(CPUs available to this process, where the number came from)."""
+    override = os.environ.get("ORPHEUS_CPU_BUDGET")
+    if override:
+        try:
+            return max(1, int(override)), "ORPHEUS_CPU_BUDGET"
+        except ValueError:
+            logger.warning(f"Invalid ORPHEUS_CPU_BUDGET value '{override}', detecting the CPU budget")
+    try:
+        cpus, source = len(os.sched_getaffinity(0)), "affinity"
+    except AttributeError:
+        cpus, source = os.cpu_count() or 1, "host"
+    try:
+        quota = cgroup_cpu_limit()
+    except (OSError, ValueError):
+        quota = None
+    if quota is not None and quota < cpus:
+        # A fractional quota still gets the whole CPU it partly owns
+        cpus, source = max(1, math.ceil(quota)), "cgroup quota"
+    return cpus, source
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return max(minimum, int(value))
+    except ValueError:
+        logger.warning(f"Invalid {name} value, using {default} as fallback")
+        return default
+
+CPU_BUDGET, CPU_BUDGET_SOURCE = cpu_budget()
+# Small decode windows stop scaling after a few threads; more slots use the rest
+INTRA_OP_THREADS = _env_int("ORPHEUS_TORCH_THREADS", min(CPU_BUDGET, 4), 1)
+INTEROP_THREADS = _env_int("ORPHEUS_TORCH_INTEROP_THREADS", 1, 1)
+DECODE_SLOTS = _env_int("ORPHEUS_DECODE_SLOTS", max(1, CPU_BUDGET // INTRA_OP_THREADS), 1)
+
+class DecodeSlots:
+    """Bounded number of concurrent decode calls, with queueing statistics."""
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @contextlib.contextmanager
+    def slot(self):
+        # Uncontended path: no clock reads
+        if not self._semaphore.acquire(blocking=False):
+            with self._lock:
+                self.waiting += 1
+            start = time.perf_counter()
+            self._semaphore.acquire()
+            wait = time.perf_counter() - start
+            with self._lock:
+                self.waiting -= 1
+                self.queued += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+        with self._lock:
+            self.in_use += 1
+            self.acquired += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "decodes": self.acquired,
+                "queued_decodes": self.queued,
+                "mean_wait_ms": self.total_wait / self.acquired * 1000 if self.acquired else 0.0,
+                "mean_queued_wait_ms": self.total_wait / self.queued * 1000 if self.queued else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+_slots = DecodeSlots(DECODE_SLOTS)
+
+def decode_slot():
+    """Context manager held around every SNAC decode call."""
+    return _slots.slot()
+
+def configure(intra_op_threads: Optional[int] = None, decode_slots: Optional[int] = None) -> None:
+    """Apply the thread settings to torch; arguments override the configured values (benchmarks)."""
+    global INTRA_OP_THREADS, DECODE_SLOTS, _slots
+    import torch
+    if intra_op_threads is not None:
+        INTRA_OP_THREADS = intra_op_threads
+    if decode_slots is not None:
+        # A new slot pool also starts fresh statistics
+        DECODE_SLOTS = decode_slots
+        _slots = DecodeSlots(decode_slots)
+    torch.set_num_threads(INTRA_OP_THREADS)
+    try:
+        torch.set_num_interop_threads(INTEROP_THREADS)
+    except RuntimeError:
+        # Can only be set before torch's first parallel work; keep what is there
+        pass
+
+def decode_slot_stats() -> Dict:
+    """CPU budget, thread settings and decode slot queueing."""
+    stats = {
+        "cpu_budget": CPU_BUDGET,
+        "cpu_budget_source": CPU_BUDGET_SOURCE,
+        "intra_op_threads": INTRA_OP_THREADS,
+        "interop_threads": INTEROP_THREADS,
+    }
+    stats.update(_slots.stats())
+    return stats
@@ -0,0 +1,141 @@
+"""
+Shared async HTTP client for the LLM backend.
+
+One httpx.AsyncClient per process, with a persistent connection pool,
+keep-alive and HTTP/2 (negotiated when the backend supports it). The client
+lives on a dedicated engine event loop running in a background thread, so
+both async code and the synchronous token generators can use the same pool:
+synchronous callers hand coroutines to the loop with run_coroutine(), and
+code on other event loops awaits them with await_coroutine().
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import contextvars
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid {name} value, using {default} as fallback")
+        return default
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, str(default)))
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid {name} value, using {default} as fallback")
+        return default
+
+# Connection pool settings
+MAX_CONNECTIONS = _int_env("ORPHEUS_HTTP_MAX_CONNECTIONS", 100)
+MAX_KEEPALIVE_CONNECTIONS = _int_env("ORPHEUS_HTTP_MAX_KEEPALIVE", 20)
+KEEPALIVE_EXPIRY = _float_env("ORPHEUS_HTTP_KEEPALIVE_EXPIRY", 60.0)
+CONNECT_TIMEOUT = _float_env("ORPHEUS_HTTP_CONNECT_TIMEOUT", 10.0)
+HTTP2_ENABLED = os.environ.get("ORPHEUS_HTTP2", "true").strip().lower() in ("1", "true", "yes", "on")
+
+if HTTP2_ENABLED and not H2_AVAILABLE:
+    logger.warning("ORPHEUS_HTTP2 is enabled but the 'h2' package is not installed. Using HTTP/1.1.")
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_client: Optional[httpx.AsyncClient] = None
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the engine event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="EngineLoop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+async def _in_context(coro, context: contextvars.Context):
+    # Tasks on the engine loop start from the loop thread's context; restore the
+    # caller's variables (e.g. the request id used in log records) first
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+def run_coroutine(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the engine loop from synchronous code and return its result."""
+    loop = get_loop()
+    if _loop_thread is threading.current_thread():
+        raise RuntimeError("run_coroutine() would deadlock when called from the engine loop thread")
+    context = contextvars.copy_context()
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, context), loop).result(timeout)
+
+async def await_coroutine(coro):
+    """Run a coroutine on the engine loop from another event loop and await its result."""
+    loop = get_loop()
+    if loop is asyncio.get_running_loop():
+        return await coro
+    context = contextvars.copy_context()
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_in_context(coro, context), loop))
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client. Must be called from the engine loop."""
+    global _client
+    if _client is None or _client.is_closed:
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        _client = httpx.AsyncClient(
+            limits=limits,
+            timeout=httpx.Timeout(None, connect=CONNECT_TIMEOUT),
+            http2=HTTP2_ENABLED and H2_AVAILABLE,
+        )
+    return _client
+
+async def _open() -> None:
+    get_client()
+
+async def _close() -> None:
+    global _client
+    # Stop background work on the loop (e.g. backend health checks) before it goes away
+    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.get_running_loop().shutdown_asyncgens()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def open_client() -> None:
+    """Create the shared client ahead of the first request (call at app startup)."""
+    run_coroutine(_open())
+    logger.info(f"LLM HTTP client ready (max connections: {MAX_CONNECTIONS}, "
+                f"keep-alive: {MAX_KEEPALIVE_CONNECTIONS}, HTTP/2: {HTTP2_ENABLED and H2_AVAILABLE})")
+
+def close_client() -> None:
+    """Close the shared client and stop the engine loop (call at app shutdown)."""
+    global _loop, _loop_thread
+    with _lock:
+        loop, thread = _loop, _loop_thread
+        _loop, _loop_thread = None, None
+    if loop is None or loop.is_closed():
+        return
+    asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout=5)
+    loop.close()
@@ -1,25 +1,26 @@
 import os
 import sys
-import requests
 import json
 import time
 import wave
 import numpy as np
 import argparse
 import threading
-import queue
 import asyncio
+import contextvars
+import functools
+import collections
+import re
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Generator, Union, Tuple, AsyncGenerator
+import logging
 from dotenv import load_dotenv
+import httpx
 
-# Optional sounddevice import for local audio playback
-try:
-    import sounddevice as sd
-    SOUNDDEVICE_AVAILABLE = True
-except ImportError:
-    print("Warning: sounddevice not available. Audio playback disabled.")
-    SOUNDDEVICE_AVAILABLE = False
+from .logging_utils import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Helper to detect if running in Uvicorn's reloader
 def is_reloader_process():
@@ -35,66 +36,79 @@ if not IS_RELOADER:
 # Load environment variables from .env file
 load_dotenv()
 
-# Detect hardware capabilities and display information
-import torch
-import psutil
-
-# Detect if we're on a high-end system based on hardware capabilities
+# Set by detect_hardware(); torch and psutil are only imported there, so
+# importing the package stays cheap
 HIGH_END_GPU = False
-if torch.cuda.is_available():
-    # Get GPU properties
-    props = torch.cuda.get_device_properties(0)
-    gpu_name = props.name
-    gpu_mem_gb = props.total_memory / (1024**3)
-    compute_capability = f"{props.major}.{props.minor}"
+
+def detect_hardware() -> None:
+    """Detect the GPU (or CPU and RAM), log the hardware banner and set HIGH_END_GPU."""
+    global HIGH_END_GPU, NUM_WORKERS
+    import torch
+    import psutil
+
+    # Detect if we're on a high-end system based on hardware capabilities
+    if torch.cuda.is_available():
+        # Get GPU properties
+        props = torch.cuda.get_device_properties(0)
+        gpu_name = props.name
+        gpu_mem_gb = props.total_memory / (1024**3)
+        compute_capability = f"{props.major}.{props.minor}"
     
-    # Consider high-end if: large VRAM (≥16GB) OR high compute capability (≥8.0) OR large VRAM (≥12GB) with good CC (≥7.0)
-    HIGH_END_GPU = (gpu_mem_gb >= 16.0 or 
-                    props.major >= 8 or 
-                    (gpu_mem_gb >= 12.0 and props.major >= 7))
+        # Consider high-end if: large VRAM (≥16GB) OR high compute capability (≥8.0) OR large VRAM (≥12GB) with good CC (≥7.0)
+        HIGH_END_GPU = (gpu_mem_gb >= 16.0 or 
+                        props.major >= 8 or 
+                        (gpu_mem_gb >= 12.0 and props.major >= 7))
         
-    if HIGH_END_GPU:
-        if not IS_RELOADER:
-            print(f"🖥️ Hardware: High-end CUDA GPU detected")
-            print(f"📊 Device: {gpu_name}")
-            print(f"📊 VRAM: {gpu_mem_gb:.2f} GB")
-            print(f"📊 Compute Capability: {compute_capability}")
-            print("🚀 Using high-performance optimizations")
+        if HIGH_END_GPU:
+            if not IS_RELOADER:
+                logger.info(f"🖥️ Hardware: High-end CUDA GPU detected")
+                logger.info(f"📊 Device: {gpu_name}")
+                logger.info(f"📊 VRAM: {gpu_mem_gb:.2f} GB")
+                logger.info(f"📊 Compute Capability: {compute_capability}")
+                logger.info("🚀 Using high-performance optimizations")
+        else:
+            if not IS_RELOADER:
+                logger.info(f"🖥️ Hardware: CUDA GPU detected")
+                logger.info(f"📊 Device: {gpu_name}")
+                logger.info(f"📊 VRAM: {gpu_mem_gb:.2f} GB")
+                logger.info(f"📊 Compute Capability: {compute_capability}")
+                logger.info("🚀 Using GPU-optimized settings")
     else:
-        if not IS_RELOADER:
-            print(f"🖥️ Hardware: CUDA GPU detected")
-            print(f"📊 Device: {gpu_name}")
-            print(f"📊 VRAM: {gpu_mem_gb:.2f} GB")
-            print(f"📊 Compute Capability: {compute_capability}")
-            print("🚀 Using GPU-optimized settings")
-else:
-    # Get CPU info
-    cpu_cores = psutil.cpu_count(logical=False)
-    cpu_threads = psutil.cpu_count(logical=True)
-    ram_gb = psutil.virtual_memory().total / (1024**3)
+        # Get CPU info
+        cpu_cores = psutil.cpu_count(logical=False)
+        cpu_threads = psutil.cpu_count(logical=True)
+        ram_gb = psutil.virtual_memory().total / (1024**3)
     
-    if not IS_RELOADER:
-        print(f"🖥️ Hardware: CPU only (No CUDA GPU detected)")
-        print(f"📊 CPU: {cpu_cores} cores, {cpu_threads} threads")
-        print(f"📊 RAM: {ram_gb:.2f} GB")
-        print("⚙️ Using CPU-optimized settings")
+        if not IS_RELOADER:
+            logger.info(f"🖥️ Hardware: CPU only (No CUDA GPU detected)")
+            logger.info(f"📊 CPU: {cpu_cores} cores, {cpu_threads} threads")
+            logger.info(f"📊 RAM: {ram_gb:.2f} GB")
+            logger.info("⚙️ Using CPU-optimized settings")
+
+    # Parallel processing settings
+    NUM_WORKERS = 4 if HIGH_END_GPU else 2
 
 # Load configuration from environment variables without hardcoded defaults
 # Critical settings - will log errors if missing
 required_settings = ["ORPHEUS_API_URL", "ORPHEUS_API_KEY"]
 missing_settings = [s for s in required_settings if s not in os.environ]
+# A backend list (ORPHEUS_API_URLS) replaces the single URL
+if "ORPHEUS_API_URLS" in os.environ and "ORPHEUS_API_URL" in missing_settings:
+    missing_settings.remove("ORPHEUS_API_URL")
 if missing_settings:
-    print(f"ERROR: Missing required environment variable(s): {', '.join(missing_settings)}")
-    print("Please set them in .env file or environment. See .env.example for defaults.")
+    logger.error(f"Missing required environment variable(s): {', '.join(missing_settings)}. "
+                 "Please set them in .env file or environment. See .env.example for defaults.")
 
 # API connection settings
 API_URL = os.environ.get("ORPHEUS_API_URL")
 API_KEY = os.environ.get("ORPHEUS_API_KEY")
+# Optional comma-separated list of replicas; requests are routed by tts_engine.backends
+API_URLS = os.environ.get("ORPHEUS_API_URLS")
 
-if not API_URL:
-    print("WARNING: ORPHEUS_API_URL not set. API calls will fail until configured.")
+if not API_URL and not API_URLS:
+    logger.warning("ORPHEUS_API_URL not set. API calls will fail until configured.")
 if not API_KEY:
-    print("WARNING: ORPHEUS_API_KEY not set. API calls will likely fail due to unauthorized access.")
+    logger.warning("ORPHEUS_API_KEY not set. API calls will likely fail due to unauthorized access.")
 
 HEADERS = {
     "Content-Type": "application/json"
@@ -106,28 +120,28 @@ if API_KEY:
 try:
     REQUEST_TIMEOUT = int(os.environ.get("ORPHEUS_API_TIMEOUT", "120"))
 except (ValueError, TypeError):
-    print("WARNING: Invalid ORPHEUS_API_TIMEOUT value, using 120 seconds as fallback")
+    logger.warning("Invalid ORPHEUS_API_TIMEOUT value, using 120 seconds as fallback")
     REQUEST_TIMEOUT = 120
 
-print(f"--- DEBUG: Initial REQUEST_TIMEOUT set to: {REQUEST_TIMEOUT} seconds ---")
+logger.debug(f"Initial REQUEST_TIMEOUT set to: {REQUEST_TIMEOUT} seconds")
 
 # Model generation parameters from environment variables
 try:
     MAX_TOKENS = int(os.environ.get("ORPHEUS_MAX_TOKENS", "8192"))
 except (ValueError, TypeError):
-    print("WARNING: Invalid ORPHEUS_MAX_TOKENS value, using 8192 as fallback")
+    logger.warning("Invalid ORPHEUS_MAX_TOKENS value, using 8192 as fallback")
     MAX_TOKENS = 8192
 
 try:
     TEMPERATURE = float(os.environ.get("ORPHEUS_TEMPERATURE", "0.1"))
 except (ValueError, TypeError):
-    print("WARNING: Invalid ORPHEUS_TEMPERATURE value, using 0.1 as fallback")
+    logger.warning("Invalid ORPHEUS_TEMPERATURE value, using 0.1 as fallback")
     TEMPERATURE = 0.1
 
 try:
     TOP_P = float(os.environ.get("ORPHEUS_TOP_P", "0.85"))
 except (ValueError, TypeError):
-    print("WARNING: Invalid ORPHEUS_TOP_P value, using 0.85 as fallback")
+    logger.warning("Invalid ORPHEUS_TOP_P value, using 0.85 as fallback")
     TOP_P = 0.85
 
 # Repetition penalty is hardcoded to 1.1 which is the only stable value for quality output
@@ -136,24 +150,131 @@ REPETITION_PENALTY = 1.1
 try:
     SAMPLE_RATE = int(os.environ.get("ORPHEUS_SAMPLE_RATE", "24000"))
 except (ValueError, TypeError):
-    print("WARNING: Invalid ORPHEUS_SAMPLE_RATE value, using 24000 as fallback")
+    logger.warning("Invalid ORPHEUS_SAMPLE_RATE value, using 24000 as fallback")
     SAMPLE_RATE = 24000
 
+# SNAC decode strategy. "sliding" re-decodes a 28-token window every 7 tokens
+# and keeps one frame of it (each frame is decoded four times); "incremental"
+# decodes every DECODE_HOP_FRAMES frames once, with DECODE_CONTEXT_FRAMES of
+# left context; "offline" waits for the whole utterance and decodes it in a
+# few large segments. Every endpoint delivers a complete file, so
+# FILE_DECODE_MODE is the default for all of them. Can be overridden per request.
+DECODE_MODES = ("sliding", "incremental", "offline")
+if "ORPHEUS_DECODE_MODE" in os.environ:
+    logger.warning("ORPHEUS_DECODE_MODE is no longer used: every endpoint delivers a complete file, so set "
+                   "ORPHEUS_FILE_DECODE_MODE (or a request's decode_mode) instead")
+
+FILE_DECODE_MODE = os.environ.get("ORPHEUS_FILE_DECODE_MODE", "offline").strip().lower()
+if FILE_DECODE_MODE not in DECODE_MODES:
+    logger.warning(f"Invalid ORPHEUS_FILE_DECODE_MODE value '{FILE_DECODE_MODE}', using 'offline' as fallback")
+    FILE_DECODE_MODE = "offline"
+
+try:
+    DECODE_HOP_FRAMES = max(1, int(os.environ.get("ORPHEUS_DECODE_HOP_FRAMES", "4")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_HOP_FRAMES value, using 4 as fallback")
+    DECODE_HOP_FRAMES = 4
+
+try:
+    DECODE_CONTEXT_FRAMES = max(0, int(os.environ.get("ORPHEUS_DECODE_CONTEXT_FRAMES", "2")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_DECODE_CONTEXT_FRAMES value, using 2 as fallback")
+    DECODE_CONTEXT_FRAMES = 2
+
+# Frames decoded after the emitted ones; same right context the sliding window gives
+DECODE_LOOKAHEAD_FRAMES = 2
+
+try:
+    OFFLINE_SEGMENT_FRAMES = max(1, int(os.environ.get("ORPHEUS_OFFLINE_SEGMENT_FRAMES", "24")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_OFFLINE_SEGMENT_FRAMES value, using 24 as fallback")
+    OFFLINE_SEGMENT_FRAMES = 24
+
+# Context decoded on each side of an offline segment
+OFFLINE_CONTEXT_FRAMES = 4
+
+# Batches of a long text generated at once; they are still reassembled in order
+try:
+    BATCH_CONCURRENCY = max(1, int(os.environ.get("ORPHEUS_BATCH_CONCURRENCY", "4")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_BATCH_CONCURRENCY value, using 4 as fallback")
+    BATCH_CONCURRENCY = 4
+
+# Syntheses synthesize() runs at once; further calls wait for a free thread
+# without blocking their event loop
+try:
+    SYNTHESIS_CONCURRENCY = max(1, int(os.environ.get("ORPHEUS_SYNTHESIS_CONCURRENCY", "8")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_SYNTHESIS_CONCURRENCY value, using 8 as fallback")
+    SYNTHESIS_CONCURRENCY = 8
+
+# Streaming mode: consume the OpenAI-compatible SSE stream ("stream": true) so the
+# decoder receives tokens while the backend is still generating
+API_STREAM = os.environ.get("ORPHEUS_API_STREAM", "true").strip().lower() in ("1", "true", "yes", "on")
+
+# Status codes that mean "this backend can't stream". A 400 or 422 is only taken
+# to mean that when its body names the "stream" field; otherwise it is an
+# ordinary bad request. Such URLs use the JSON path for STREAM_FALLBACK_TTL
+# seconds, after which streaming is tried again.
+STREAM_UNSUPPORTED_STATUS_CODES = (404, 405, 415, 501)
+try:
+    STREAM_FALLBACK_TTL = float(os.environ.get("ORPHEUS_STREAM_FALLBACK_TTL", "300"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_STREAM_FALLBACK_TTL value, using 300 as fallback")
+    STREAM_FALLBACK_TTL = 300.0
+# URL -> time.monotonic() at which streaming is tried again
+_NON_STREAMING_URLS: Dict[str, float] = {}
+
+def _streams_to(url: str) -> bool:
+    """Whether requests to url use the SSE stream, i.e. no recent fallback is in effect."""
+    if not API_STREAM:
+        return False
+    retry_at = _NON_STREAMING_URLS.get(url)
+    if retry_at is None:
+        return True
+    if time.monotonic() >= retry_at:
+        _NON_STREAMING_URLS.pop(url, None)
+        return True
+    return False
+
+def _rejects_streaming(response: httpx.Response) -> bool:
+    """Whether an error response (body already read) means the backend can't stream."""
+    if response.status_code in STREAM_UNSUPPORTED_STATUS_CODES:
+        return True
+    return response.status_code in (400, 422) and "stream" in response.text.lower()
+
+def _is_backend_failure(error: BaseException) -> bool:
+    """Errors worth retrying on another attempt; they also count against the backend's circuit breaker."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, httpx.TransportError)
+
 # Print loaded configuration only in the main process, not in the reloader
 if not IS_RELOADER:
-    print(f"Configuration loaded:")
-    print(f"  API_URL: {API_URL}")
+    logger.info(f"Configuration loaded:")
+    if API_URLS:
+        logger.info(f"  API_URLS: {API_URLS}")
+    else:
+        logger.info(f"  API_URL: {API_URL}")
     if API_KEY:
-        print(f"  API_KEY: {'Loaded (sensitive value not shown)' if API_KEY else 'Not Set'}")
+        logger.info(f"  API_KEY: {'Loaded (sensitive value not shown)' if API_KEY else 'Not Set'}")
     else:
-        print(f"  API_KEY: Not Set")
-    print(f"  MAX_TOKENS: {MAX_TOKENS}")
-    print(f"  TEMPERATURE: {TEMPERATURE}")
-    print(f"  TOP_P: {TOP_P}")
-    print(f"  REPETITION_PENALTY: {REPETITION_PENALTY}")
+        logger.info(f"  API_KEY: Not Set")
+    logger.info(f"  MAX_TOKENS: {MAX_TOKENS}")
+    logger.info(f"  TEMPERATURE: {TEMPERATURE}")
+    logger.info(f"  TOP_P: {TOP_P}")
+    logger.info(f"  REPETITION_PENALTY: {REPETITION_PENALTY}")
+    logger.info(f"  API_STREAM: {API_STREAM}")
+    if FILE_DECODE_MODE == "incremental":
+        logger.info(f"  FILE_DECODE_MODE: incremental (hop {DECODE_HOP_FRAMES} frames, context {DECODE_CONTEXT_FRAMES})")
+    elif FILE_DECODE_MODE == "offline":
+        logger.info(f"  FILE_DECODE_MODE: offline ({OFFLINE_SEGMENT_FRAMES}-frame segments)")
+    else:
+        logger.info(f"  FILE_DECODE_MODE: {FILE_DECODE_MODE}")
 
-# Parallel processing settings
-NUM_WORKERS = 4 if HIGH_END_GPU else 2
+# Parallel processing settings (raised by detect_hardware() on high-end GPUs)
+NUM_WORKERS = 2
 
 # Define voices by language
 ENGLISH_VOICES = ["tara", "leah", "jess", "leo", "dan", "mia", "zac", "zoe"]
@@ -192,8 +313,41 @@ VOICE_TO_LANGUAGE.update({voice: "italian" for voice in ITALIAN_VOICES})
 # Languages list for the UI
 AVAILABLE_LANGUAGES = ["english", "french", "german", "korean", "hindi", "mandarin", "spanish", "italian"]
 
+from . import http_client, backends, resilience, decode_scheduler
+from .resilience import BackendUnavailableError, StreamInterruptedError
+
 # Import the unified token handling from speechpipe
-from .speechpipe import turn_token_into_id, CUSTOM_TOKEN_PREFIX
+from .speechpipe import (
+    CUSTOM_TOKEN_PREFIX,
+    CUSTOM_TOKEN_NUMBER_PATTERN,
+    parse_custom_token_numbers,
+    token_ids_from_chunk,
+    TokenRingBuffer,
+    decode_utterance
+)
+from . import speechpipe, decode_workers, pipeline
+
+_engine_lock = threading.Lock()
+_engine_initialized = False
+
+def initialize_engine() -> None:
+    """
+    Load the heavy parts of the engine: detect the hardware, import torch and
+    load the SNAC decoder (speechpipe.initialize), and start any decode
+    workers. Importing tts_engine does none of this. Servers call it at
+    startup; generation calls it on first use otherwise. Idempotent.
+    """
+    global _engine_initialized
+    with _engine_lock:
+        if _engine_initialized:
+            return
+        start = time.time()
+        detect_hardware()
+        speechpipe.initialize()
+        decode_workers.start_decode_workers()
+        _engine_initialized = True
+        logger.info(f"Engine initialized in {time.time() - start:.2f} s")
+
 
 # Special token IDs for Orpheus model
 START_TOKEN_ID = 128259
@@ -218,6 +372,10 @@ class PerformanceMonitor:
         self._check_report()
         
     def _check_report(self) -> None:
+        # Runs for every token chunk and audio chunk: skip the clock read
+        # entirely when progress reports would be dropped anyway
+        if not logger.isEnabledFor(logging.INFO):
+            return
         current_time = time.time()
         if current_time - self.last_report_time >= self.report_interval:
             self.report()
@@ -234,16 +392,18 @@ class PerformanceMonitor:
         # Estimate audio duration based on audio chunks (each chunk is ~0.085s of audio)
         est_duration = self.audio_chunks * 0.085
         
-        print(f"Progress: {tokens_per_sec:.1f} tokens/sec, est. {est_duration:.1f}s audio generated, {self.token_count} tokens, {self.audio_chunks} chunks in {elapsed:.1f}s")
+        logger.info(f"Progress: {tokens_per_sec:.1f} tokens/sec, est. {est_duration:.1f}s audio generated, {self.token_count} tokens, {self.audio_chunks} chunks in {elapsed:.1f}s")
 
-# Create global performance monitor
-perf_monitor = PerformanceMonitor()
+# Monitor of the generation being served; generate_speech_from_api sets a new
+# one per request, and the token relay and pipeline tasks inherit it with the
+# rest of the caller's context, so concurrent requests keep separate counters
+_perf_monitor: contextvars.ContextVar = contextvars.ContextVar("orpheus_perf_monitor", default=PerformanceMonitor())
 
 def format_prompt(prompt: str, voice: str = DEFAULT_VOICE) -> str:
     """Format prompt for Orpheus model with voice prefix and special tokens."""
     # Validate voice and provide fallback
     if voice not in AVAILABLE_VOICES:
-        print(f"Warning: Voice '{voice}' not recognized. Using '{DEFAULT_VOICE}' instead.")
+        logger.warning(f"Voice '{voice}' not recognized. Using '{DEFAULT_VOICE}' instead.")
         voice = DEFAULT_VOICE
         
     # Format similar to how engine_class.py does it with special tokens
@@ -255,19 +415,278 @@ def format_prompt(prompt: str, voice: str = DEFAULT_VOICE) -> str:
     
     return f"{special_start}{formatted_prompt}{special_end}"
 
-def generate_tokens_from_api(prompt: str, voice: str = DEFAULT_VOICE, temperature: float = TEMPERATURE, 
-                           top_p: float = TOP_P, max_tokens: int = MAX_TOKENS, 
-                           repetition_penalty: float = REPETITION_PENALTY) -> Generator[str, None, None]:
-    """Generate tokens from text using RunPod API with proper JSON response handling."""
+def _extract_token_numbers_from_json(response_data: Any) -> np.ndarray:
+    """Parse every custom token in a complete (non-streaming) JSON response at once.
+
+    Handles the RunPod format ({"output": [{"output": {"generated_text": ...}}]})
+    as well as plain OpenAI-style completions ({"choices": [{"text": ...}]}).
+    Returns the raw custom token numbers as a single int64 array.
+    """
+    texts = []
+    
+    # OpenAI-compatible completion returned by backends that ignored "stream": true
+    if isinstance(response_data, dict) and isinstance(response_data.get("choices"), list):
+        for choice in response_data["choices"]:
+            if isinstance(choice, dict):
+                texts.append(choice.get("text") or "")
+
+    # Handle the response format: {"output": [{"output": {"generated_text": "<custom_token_4><custom_token_5>..."}}]}
+    elif isinstance(response_data, dict) and "output" in response_data:
+        output_data = response_data["output"]
+        
+        if isinstance(output_data, list):
+            logger.debug(f"Processing {len(output_data)} items from output array")
+            
+            for item in output_data:
+                if isinstance(item, dict):
+                    # Handle nested structure: item["output"]["generated_text"]
+                    if "output" in item and isinstance(item["output"], dict):
+                        generated_text = item["output"].get("generated_text", "")
+                        logger.debug(f"Found generated_text with {len(generated_text)} characters")
+                        texts.append(generated_text)
+                            
+                    # Handle direct text format: item["text"]
+                    elif "text" in item:
+                        token_text = item["text"]
+                        
+                        # Check if this is a custom token
+                        if token_text.startswith(CUSTOM_TOKEN_PREFIX) and token_text.endswith('>'):
+                            texts.append(token_text)
+                        else:
+                            logger.debug(f"Skipping non-custom token: {token_text}")
+                    else:
+                        logger.debug(f"Item has unexpected structure: {list(item.keys())}")
+                else:
+                    logger.debug(f"Non-dict item in output array: {type(item)}")
+        else:
+            logger.debug(f"Unexpected output format: {type(output_data)}")
+    else:
+        logger.debug(f"No 'output' key in response or unexpected format")
+        logger.debug(f"Response keys: {list(response_data.keys()) if isinstance(response_data, dict) else 'Not a dict'}")
+    
+    # One regex pass and one string-to-int conversion for the whole response
+    token_numbers = parse_custom_token_numbers("".join(texts))
+    logger.debug(f"Extracted {token_numbers.size} custom tokens from response")
+    return token_numbers
+
+def _extract_stream_text(event: Any) -> str:
+    """Return the text delta carried by one server-sent event payload."""
+    if not isinstance(event, dict):
+        return ""
+    choices = event.get("choices")
+    if isinstance(choices, list) and choices:
+        choice = choices[0]
+        if isinstance(choice, dict):
+            # /v1/completions uses "text", /v1/chat/completions uses "delta.content"
+            if choice.get("text"):
+                return choice["text"]
+            delta = choice.get("delta")
+            if isinstance(delta, dict):
+                return delta.get("content") or ""
+        return ""
+    # llama.cpp native /completion stream
+    return event.get("content") or ""
+
+class _SSETokenParser:
+    """Incrementally extract custom token numbers from the lines of an SSE stream.
+
+    A token may be split across events (e.g. "<custom_tok" + "en_1234>"), so any
+    incomplete tail is carried over and completed by the next event.
+    """
+    def __init__(self):
+        self.pending = ""
+        self.done = False
+    
+    def feed_line(self, line: str) -> Optional[np.ndarray]:
+        if not line or not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            self.done = True
+            return None
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping malformed SSE event: {data[:100]}")
+            return None
+        
+        text = _extract_stream_text(event)
+        if not text:
+            return None
+        self.pending += text
+        
+        numbers = []
+        last_end = 0
+        for match in CUSTOM_TOKEN_NUMBER_PATTERN.finditer(self.pending):
+            numbers.append(int(match.group(1)))
+            last_end = match.end()
+        
+        # Keep only a possibly incomplete token for the next event
+        tail = self.pending[last_end:]
+        partial_start = tail.rfind("<")
+        self.pending = tail[partial_start:] if partial_start != -1 else ""
+        return np.array(numbers, dtype=np.int64) if numbers else None
+
+class _BackendAttempt:
+    """One request for a generation, sent to one leased backend.
+
+    Token chunks are pulled with next_chunk(). The lease (and the HTTP
+    response) is held until the stream ends, fails or close() is called.
+    """
+    def __init__(self, client: httpx.AsyncClient, pool: "backends.BackendPool", estimated_tokens: int,
+                 exclude: Optional["backends.Backend"], payload: Dict[str, Any], stream_payload: Dict[str, Any]):
+        self.backend: Optional[backends.Backend] = None
+        self.started = time.perf_counter()
+        self._chunks = self._stream(client, pool, estimated_tokens, exclude, payload, stream_payload)
+
+    async def _stream(self, client, pool, estimated_tokens, exclude, payload, stream_payload):
+        async with pool.lease(estimated_tokens, exclude=exclude) as lease:
+            self.backend = lease.backend
+            use_stream = _streams_to(lease.url)
+            while True:
+                logger.debug(f"Attempting to POST to URL: {lease.url} (streaming: {use_stream})")
+                
+                async with client.stream(
+                    "POST",
+                    lease.url, 
+                    headers=HEADERS, 
+                    json=stream_payload if use_stream else payload, 
+                    timeout=REQUEST_TIMEOUT
+                ) as response:
+                    if response.is_error:
+                        await response.aread()
+                        # Backends without streaming support reject the request outright;
+                        # retry this request with the JSON payload and skip streaming for a while
+                        if use_stream and _rejects_streaming(response):
+                            logger.info(f"Streaming request rejected with status {response.status_code}, "
+                                        f"falling back to non-streaming mode for {lease.url} "
+                                        f"for {STREAM_FALLBACK_TTL:g} seconds")
+                            _NON_STREAMING_URLS[lease.url] = time.monotonic() + STREAM_FALLBACK_TTL
+                            use_stream = False
+                            continue
+                        response.raise_for_status()
+                    
+                    content_type = response.headers.get("Content-Type", "")
+                    if use_stream and "text/event-stream" in content_type:
+                        parser = _SSETokenParser()
+                        async for line in response.aiter_lines():
+                            token_numbers = parser.feed_line(line)
+                            if token_numbers is not None:
+                                lease.progress(token_numbers.size)
+                                yield token_numbers
+                            if parser.done:
+                                break
+                    else:
+                        # Either streaming is disabled or the backend ignored "stream": true
+                        await response.aread()
+                        response_data = response.json()
+                        logger.debug(f"Response received: {type(response_data)}")
+                        token_numbers = _extract_token_numbers_from_json(response_data)
+                        if token_numbers.size:
+                            yield token_numbers
+                return
+
+    async def next_chunk(self) -> Optional[np.ndarray]:
+        """Next token chunk, or None once the backend has finished."""
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def close(self) -> None:
+        await self._chunks.aclose()
+
+async def _cancel_attempts(pending: Dict[asyncio.Task, _BackendAttempt]) -> None:
+    for task, attempt in pending.items():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await attempt.close()
+
+async def _first_chunk(attempt: _BackendAttempt, start_hedge,
+                       deadline: resilience.Deadline) -> Tuple[_BackendAttempt, Optional[np.ndarray], Optional[BaseException]]:
+    """Wait for the first chunk of attempt, hedging to a second backend if it is slow.
+
+    start_hedge() is called once the hedge delay passes and returns a second
+    attempt (or None if no hedge should be sent). Whichever attempt delivers
+    first wins and the other is cancelled. A failure is only returned once no
+    other attempt is left to wait for, or when the deadline runs out.
+    Returns (attempt, chunk, error).
+    """
+    pool = backends.get_pool()
+    pending = {asyncio.ensure_future(attempt.next_chunk()): attempt}
+    hedge_delay = pool.hedging.delay() if len(pool.backends) > 1 else None
+    hedge_at = attempt.started + hedge_delay if hedge_delay is not None else None
+    last = (attempt, None, None)
+    while pending:
+        timeout = deadline.remaining()
+        if hedge_at is not None:
+            timeout = min(timeout, max(0.0, hedge_at - time.perf_counter()))
+        done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            if deadline.expired:
+                for slow in pending.values():
+                    if slow.backend is not None:
+                        pool.record_failure(slow.backend, TimeoutError("no first chunk before the deadline"))
+                await _cancel_attempts(pending)
+                return attempt, None, BackendUnavailableError(
+                    f"No response from the LLM backend within the {deadline.seconds:g}s deadline")
+            hedge_at = None  # at most one hedge per attempt
+            hedge = start_hedge(attempt)
+            if hedge is not None:
+                pending[asyncio.ensure_future(hedge.next_chunk())] = hedge
+            continue
+        hedge_at = None
+        for task in done:
+            finished = pending.pop(task)
+            error = task.exception()
+            if error is None:
+                winner = (finished, task.result(), None)
+                if task.result() is not None:
+                    # From the original attempt's start: that is the latency the caller saw,
+                    # and a hedge's own (later) start would bias the hedge delay low
+                    pool.hedging.record_first_chunk(time.perf_counter() - attempt.started)
+                await _cancel_attempts(pending)
+                if finished is not attempt:
+                    pool.hedging.hedges_won += 1
+                    logger.info(f"Hedged request to {finished.backend.url} answered first")
+                return winner
+            last = (finished, None, error)
+            if pending:
+                logger.warning(f"Request to {finished.backend.url if finished.backend else 'backend'} failed "
+                               f"({error!r}); waiting for the hedged request")
+                if finished.backend is not None and _is_backend_failure(error):
+                    if isinstance(error, httpx.TransportError):
+                        pool.mark_failed(finished.backend, error)
+                    else:
+                        pool.record_failure(finished.backend, error)
+    return last
+
+async def agenerate_tokens_from_api(prompt: str, voice: str = DEFAULT_VOICE, temperature: float = TEMPERATURE, 
+                                    top_p: float = TOP_P, max_tokens: int = MAX_TOKENS, 
+                                    repetition_penalty: float = REPETITION_PENALTY) -> AsyncGenerator[np.ndarray, None]:
+    """Generate tokens from text using the LLM backend, yielding them in chunks.
+
+    Each chunk is an int64 array of raw custom token numbers (the N in
+    <custom_token_N>); tokens_decoder turns them into SNAC codes.
+
+    Runs on the engine loop and uses the shared connection pool. Each attempt
+    leases a backend from the routing pool (see backends.py); a retry prefers a
+    different backend than the one that just failed, and with hedging enabled a
+    slow first chunk triggers a second request to another backend. When API_STREAM
+    is enabled the OpenAI-compatible SSE stream is consumed incrementally, so a
+    chunk is yielded per event while the backend is still generating. Backends
+    that reject streaming fall back to the JSON path (a single large chunk).
+    """
     start_time = time.time()
     formatted_prompt = format_prompt(prompt, voice)
-    print(f"Generating speech for: {formatted_prompt}")
+    logger.info(f"Generating speech for: {formatted_prompt}")
     
-    # Optimize the token generation for GPUs
+    # Optimize the token generation for GPUs. This runs on the engine loop, so only
+    # read the device once the engine is loaded: reading it earlier would load SNAC here
     if HIGH_END_GPU:
-        print("Using optimized parameters for high-end GPU")
-    elif torch.cuda.is_available():
-        print("Using optimized parameters for GPU acceleration")
+        logger.info("Using optimized parameters for high-end GPU")
+    elif _engine_initialized and speechpipe.snac_device == "cuda":
+        logger.info("Using optimized parameters for GPU acceleration")
     
     # Create the request payload for the LLM server
     llm_input_payload = {
@@ -277,7 +696,7 @@ def generate_tokens_from_api(prompt: str, voice: str = DEFAULT_VOICE, temperatur
         "max_tokens": max_tokens,
         "repetition_penalty": repetition_penalty,
         "stop": ["<|eot_id|>"],
-        "stream": False  # Use synchronous mode since streaming endpoints aren't available
+        "stream": False
     }
     
     # Wrap the llm_input_payload under the "input" key for RunPod
@@ -285,164 +704,199 @@ def generate_tokens_from_api(prompt: str, voice: str = DEFAULT_VOICE, temperatur
         "input": llm_input_payload
     }
     
-    # Session for connection pooling and retry logic
-    session = requests.Session()
+    # OpenAI-compatible payload for the streaming /v1/completions endpoint
+    stream_payload = {**llm_input_payload, "stream": True}
+    
+    # Shared client: connections are reused across calls and requests
+    client = http_client.get_client()
+    pool = backends.get_pool()
+    estimated_tokens = backends.estimate_tokens(prompt, max_tokens)
+    backend = None
+    failed_backend = None
     
+    def start_hedge(slow_attempt: _BackendAttempt) -> Optional[_BackendAttempt]:
+        if not pool.hedging.try_hedge():
+            logger.debug("First chunk is late but the hedging budget is spent")
+            return None
+        logger.info(f"No first chunk from {slow_attempt.backend.url if slow_attempt.backend else 'backend'} "
+                    f"after {time.perf_counter() - slow_attempt.started:.2f}s; hedging to another backend")
+        return _BackendAttempt(client, pool, estimated_tokens, slow_attempt.backend, payload, stream_payload)
+    
+    monitor = _perf_monitor.get()
+    # One time budget for getting a first token, shared by every attempt and backoff
+    deadline = resilience.Deadline()
     retry_count = 0
     max_retries = 3
+    token_counter = 0
+    last_error: Optional[BaseException] = None
     
-    print(f"--- DEBUG: REQUEST_TIMEOUT in generate_tokens_from_api: {REQUEST_TIMEOUT} seconds ---")
+    logger.debug(f"REQUEST_TIMEOUT in generate_tokens_from_api: {REQUEST_TIMEOUT} seconds, deadline: {deadline.seconds:g} seconds")
     
     while retry_count < max_retries:
+        attempt = _BackendAttempt(client, pool, estimated_tokens, failed_backend, payload, stream_payload)
         try:
-            print(f"--- TTS Worker Debug ---")
-            print(f"Attempting to POST to URL: {API_URL}")
-            print(f"--- End TTS Worker Debug ---")
-            
-            # Use the /runsync endpoint directly since streaming endpoints aren't supported
-            response = session.post(
-                API_URL, 
-                headers=HEADERS, 
-                json=payload, 
-                timeout=REQUEST_TIMEOUT
-            )
+            attempt, token_numbers, error = await _first_chunk(attempt, start_hedge, deadline)
+            backend = attempt.backend
+            if error is not None:
+                raise error
+            if backend is not None:
+                pool.record_success(backend)
             
-            response.raise_for_status()
-            response_data = response.json()
-            
-            print(f"TTS_WORKER_DEBUG --- Response received: {type(response_data)}")
-            
-            # Process the complete JSON response
-            token_counter = 0
-            
-            # Handle the response format: {"output": [{"output": {"generated_text": "<custom_token_4><custom_token_5>..."}}]}
-            if isinstance(response_data, dict) and "output" in response_data:
-                output_data = response_data["output"]
-                
-                if isinstance(output_data, list):
-                    print(f"TTS_WORKER_DEBUG --- Processing {len(output_data)} items from output array")
-                    
-                    for item in output_data:
-                        if isinstance(item, dict):
-                            # Handle nested structure: item["output"]["generated_text"]
-                            if "output" in item and isinstance(item["output"], dict):
-                                generated_text = item["output"].get("generated_text", "")
-                                print(f"TTS_WORKER_DEBUG --- Found generated_text with {len(generated_text)} characters")
-                                
-                                # Parse tokens from the generated text string
-                                import re
-                                # Find all custom tokens in the format <custom_token_XXXX>
-                                token_pattern = r'<custom_token_\d+>'
-                                tokens = re.findall(token_pattern, generated_text)
-                                
-                                print(f"TTS_WORKER_DEBUG --- Extracted {len(tokens)} custom tokens from generated text")
-                                
-                                for token_text in tokens:
-                                    token_counter += 1
-                                    perf_monitor.add_tokens()
-                                    print(f"TTS_WORKER_DEBUG --- Yielding token {token_counter}: {token_text}")
-                                    yield token_text
-                                    
-                            # Handle direct text format: item["text"]
-                            elif "text" in item:
-                                token_text = item["text"]
-                                
-                                # Check if this is a custom token
-                                if token_text.startswith(CUSTOM_TOKEN_PREFIX) and token_text.endswith('>'):
-                                    token_counter += 1
-                                    perf_monitor.add_tokens()
-                                    print(f"TTS_WORKER_DEBUG --- Yielding token {token_counter}: {token_text}")
-                                    yield token_text
-                                else:
-                                    print(f"TTS_WORKER_DEBUG --- Skipping non-custom token: {token_text}")
-                            else:
-                                print(f"TTS_WORKER_DEBUG --- Item has unexpected structure: {list(item.keys())}")
-                        else:
-                            print(f"TTS_WORKER_DEBUG --- Non-dict item in output array: {type(item)}")
-                else:
-                    print(f"TTS_WORKER_DEBUG --- Unexpected output format: {type(output_data)}")
-            else:
-                print(f"TTS_WORKER_DEBUG --- No 'output' key in response or unexpected format")
-                print(f"TTS_WORKER_DEBUG --- Response keys: {list(response_data.keys()) if isinstance(response_data, dict) else 'Not a dict'}")
+            while token_numbers is not None:
+                token_counter += token_numbers.size
+                monitor.add_tokens(token_numbers.size)
+                yield token_numbers
+                token_numbers = await attempt.next_chunk()
             
             # Report completion
             generation_time = time.time() - start_time
             tokens_per_second = token_counter / generation_time if generation_time > 0 else 0
-            print(f"Token processing complete: {token_counter} tokens in {generation_time:.2f}s ({tokens_per_second:.1f} tokens/sec)")
+            logger.info(f"Token processing complete: {token_counter} tokens in {generation_time:.2f}s ({tokens_per_second:.1f} tokens/sec)")
             
             if token_counter == 0:
-                print("Warning: LLM response contained no custom tokens.")
-                print(f"TTS_WORKER_DEBUG --- Full response for debugging: {json.dumps(response_data, indent=2)}")
+                logger.warning("LLM response contained no custom tokens.")
             
             return  # Successful completion
 
-        except requests.exceptions.HTTPError as http_err:
-            print(f"HTTP error occurred: {http_err} - Status Code: {http_err.response.status_code}")
-            print(f"Response text: {http_err.response.text}")
-            if http_err.response.status_code >= 500:
-                retry_count += 1
-                if retry_count < max_retries:
-                    wait_time = 2 ** retry_count
-                    print(f"Retrying in {wait_time} seconds... (attempt {retry_count + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print("Max retries reached for HTTPError. Token generation failed.")
-                    return
-            else:
-                print("Client-side HTTPError. Not retrying. Token generation failed.")
+        except BackendUnavailableError:
+            # Every circuit is open or the deadline ran out: fail fast, don't retry
+            raise
+
+        except httpx.HTTPStatusError as http_err:
+            logger.error(f"HTTP error occurred: {http_err} - Status Code: {http_err.response.status_code}. "
+                         f"Response text: {http_err.response.text}")
+            if not _is_backend_failure(http_err):
+                logger.error("Client-side HTTPError. Not retrying. Token generation failed.")
                 return
+            if backend is not None:
+                pool.record_failure(backend, http_err)
+            failed_backend = backend
+            last_error = http_err
             
-        except requests.exceptions.Timeout:
-            print(f"Request timed out after {REQUEST_TIMEOUT} seconds")
-            retry_count += 1
-            if retry_count < max_retries:
-                wait_time = 2 ** retry_count
-                print(f"Retrying in {wait_time} seconds... (attempt {retry_count+1}/{max_retries})")
-                time.sleep(wait_time)
+        except httpx.TransportError as conn_err:
+            # Tokens already handed to the decoder can't be taken back, so a
+            # stream that breaks midway is not retried (it would repeat audio).
+            # It still counts against the backend, and the caller must not
+            # mistake the truncated audio for a complete result.
+            if token_counter > 0:
+                logger.error(f"Stream interrupted after {token_counter} tokens: {conn_err!r}. Not retrying.")
+                if backend is not None:
+                    pool.mark_failed(backend, conn_err)
+                raise StreamInterruptedError(
+                    f"LLM backend stream interrupted after {token_counter} tokens: {conn_err!r}",
+                    tokens=token_counter) from conn_err
+            if isinstance(conn_err, httpx.TimeoutException):
+                logger.warning(f"Request timed out after {REQUEST_TIMEOUT} seconds")
             else:
-                print("Max retries reached for Timeout. Token generation failed.")
-                return
-                
-        except requests.exceptions.ConnectionError as conn_err:
-            print(f"Connection error to API at {API_URL}: {conn_err}")
-            retry_count += 1
-            if retry_count < max_retries:
-                wait_time = 2 ** retry_count
-                print(f"Retrying in {wait_time} seconds... (attempt {retry_count+1}/{max_retries})")
-                time.sleep(wait_time)
-            else:
-                print("Max retries reached for ConnectionError. Token generation failed.")
-                return
+                logger.error(f"Connection error to API at {backend.url if backend else 'backend'}: {conn_err!r}")
+            if backend is not None:
+                pool.mark_failed(backend, conn_err)
+            failed_backend = backend
+            last_error = conn_err
         
         except Exception as e: 
-            print(f"An unexpected error occurred in generate_tokens_from_api: {type(e).__name__} - {e}")
-            import traceback
-            traceback.print_exc()
-            print("Token generation failed due to an unexpected error.")
+            logger.exception(f"An unexpected error occurred in generate_tokens_from_api: {type(e).__name__} - {e}. "
+                             "Token generation failed.")
             return
+        
+        finally:
+            # Releases the backend lease and returns the connection to the pool
+            await attempt.close()
+        
+        retry_count += 1
+        if retry_count >= max_retries:
+            logger.error(f"Max retries reached for {type(last_error).__name__}. Token generation failed.")
+            break
+        # Jittered backoff on the engine loop: no thread is held while waiting
+        wait_time = resilience.backoff_delay(retry_count)
+        if wait_time >= deadline.remaining():
+            logger.error(f"Deadline of {deadline.seconds:g} seconds leaves no time to retry. Token generation failed.")
+            break
+        logger.warning(f"Retrying in {wait_time:.2f} seconds... (attempt {retry_count + 1}/{max_retries})")
+        await asyncio.sleep(wait_time)
 
-    # Fallback if the while loop exits without a 'return' inside
-    print("Token generation ultimately failed after all retries or due to a non-retryable error.")
+    raise BackendUnavailableError(f"LLM backend request failed after {retry_count} attempt(s): {last_error!r}")
 
-# The turn_token_into_id function is now imported from speechpipe.py
-# This eliminates duplicate code and ensures consistent behavior
+def generate_tokens_from_api(prompt: str, voice: str = DEFAULT_VOICE, temperature: float = TEMPERATURE, 
+                           top_p: float = TOP_P, max_tokens: int = MAX_TOKENS, 
+                           repetition_penalty: float = REPETITION_PENALTY) -> Generator[np.ndarray, None, None]:
+    """Synchronous view of agenerate_tokens_from_api.
+
+    The request itself runs on the engine loop; token chunks (int64 arrays of
+    raw custom token numbers) are handed over to the calling thread as they
+    arrive and can be passed straight to tokens_decoder.
+    """
+    agen = agenerate_tokens_from_api(prompt, voice, temperature, top_p, max_tokens, repetition_penalty)
+    
+    async def next_chunk():
+        try:
+            return await agen.__anext__()
+        except StopAsyncIteration:
+            return None
+    
+    try:
+        while True:
+            chunk = http_client.run_coroutine(next_chunk())
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Closes the response (and returns its connection to the pool) if the
+        # consumer stops early
+        http_client.run_coroutine(agen.aclose())
+
+async def relay_tokens_from_api(prompt: str, voice: str = DEFAULT_VOICE, temperature: float = TEMPERATURE,
+                                top_p: float = TOP_P, max_tokens: int = MAX_TOKENS,
+                                repetition_penalty: float = REPETITION_PENALTY) -> AsyncGenerator[np.ndarray, None]:
+    """agenerate_tokens_from_api for consumers on another event loop, such as the pipeline workers.
+
+    The request runs on the engine loop, and each chunk is awaited without
+    blocking the consumer's loop.
+    """
+    agen = agenerate_tokens_from_api(prompt, voice, temperature, top_p, max_tokens, repetition_penalty)
+    
+    async def next_chunk():
+        try:
+            return await agen.__anext__()
+        except StopAsyncIteration:
+            return None
+    
+    try:
+        while True:
+            chunk = await http_client.await_coroutine(next_chunk())
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await http_client.await_coroutine(agen.aclose())
 
 def convert_to_audio(multiframe: List[int], count: int) -> Optional[bytes]:
     """Convert token frames to audio with performance monitoring."""
     # Import here to avoid circular imports
     from .speechpipe import convert_to_audio as orpheus_convert_to_audio
-    start_time = time.time()
     result = orpheus_convert_to_audio(multiframe, count)
     
     if result is not None:
-        perf_monitor.add_audio_chunk()
+        _perf_monitor.get().add_audio_chunk()
         
     return result
 
+async def _collect_audio(results) -> AsyncGenerator[bytes, None]:
+    """Pass decoded audio on from a DecodeStream with performance monitoring, skipping invalid windows."""
+    monitor = _perf_monitor.get()
+    async for result in results:
+        if result is not None:
+            monitor.add_audio_chunk()
+            yield result
+
 async def tokens_decoder(token_gen) -> AsyncGenerator[bytes, None]:
-    """Simplified token decoder with early first-chunk processing for lower latency."""
-    buffer = []
+    """Simplified token decoder with early first-chunk processing for lower latency.
+
+    token_gen may yield single token strings or np.ndarray chunks of raw custom
+    token numbers; chunks are converted to IDs in one vectorized step. Windows
+    are decoded through a decode_scheduler stream, batched with other requests
+    when ORPHEUS_DECODE_BATCHING is on.
+    """
     count = 0
     
     # Use different thresholds for first chunk vs. subsequent chunks
@@ -451,165 +905,234 @@ async def tokens_decoder(token_gen) -> AsyncGenerator[bytes, None]:
     min_frames_subsequent = 28  # Default for reliability after first chunk (4 chunks of 7)
     process_every = 7  # Process every 7 tokens (standard for Orpheus model)
     
+    # Constant-memory token history sized to the largest window; windows are views
+    ring = TokenRingBuffer(min_frames_subsequent)
+    stream = decode_scheduler.open_stream()
+    
     start_time = time.time()
     last_log_time = start_time
     token_count = 0
+    # Decided once per request so the per-chunk path skips the clock when INFO is off
+    log_rates = logger.isEnabledFor(logging.INFO)
     
-    async for token_text in token_gen:
-        token = turn_token_into_id(token_text, count)
-        if token is not None and token > 0:
-            # Add to buffer using simple append (reliable method)
-            buffer.append(token)
-            count += 1
-            token_count += 1
+    try:
+        async for chunk in token_gen:
+            token_ids = token_ids_from_chunk(chunk, count)
+            if token_ids.size == 0:
+                continue
+            
+            previous_count = count
+            count += token_ids.size
+            token_count += token_ids.size
+            written = 0
             
             # Log throughput periodically
-            current_time = time.time()
-            if current_time - last_log_time > 5.0:  # Every 5 seconds
-                elapsed = current_time - start_time
-                if elapsed > 0:
-                    print(f"Token processing rate: {token_count/elapsed:.1f} tokens/second")
-                last_log_time = current_time
+            if log_rates:
+                current_time = time.time()
+                if current_time - last_log_time > 5.0:  # Every 5 seconds
+                    elapsed = current_time - start_time
+                    if elapsed > 0:
+                        logger.info(f"Token processing rate: {token_count/elapsed:.1f} tokens/second")
+                    last_log_time = current_time
             
-            # Different processing paths based on whether first chunk has been processed
-            if not first_chunk_processed:
-                # For first audio output, process as soon as we have enough tokens for one chunk
-                if count >= min_frames_first:
-                    buffer_to_proc = buffer[-min_frames_first:]
+            # A chunk may cross several 7-token frame boundaries; visit each in order
+            for boundary in range(previous_count - previous_count % process_every + process_every,
+                                  count + 1, process_every):
+                # Write up to this boundary only, so its window is still in the ring
+                ring.extend(token_ids[written:boundary - previous_count])
+                written = boundary - previous_count
+                
+                # Different processing paths based on whether first chunk has been processed
+                if not first_chunk_processed:
+                    # For first audio output, process as soon as we have enough tokens for one chunk
+                    buffer_to_proc = ring.window(min_frames_first)
                     
                     # Process the first chunk for immediate audio feedback
-                    print(f"Processing first audio chunk with {len(buffer_to_proc)} tokens")
-                    audio_samples = convert_to_audio(buffer_to_proc, count)
-                    if audio_samples is not None:
+                    logger.debug(f"Processing first audio chunk with {len(buffer_to_proc)} tokens")
+                    stream.submit(buffer_to_proc, 1, 1)
+                    async for audio_samples in _collect_audio(stream.results(flush=True)):
                         first_chunk_processed = True  # Mark first chunk as processed
                         yield audio_samples
-            else:
-                # For subsequent chunks, use standard processing with larger batch
-                if count % process_every == 0 and count >= min_frames_subsequent:
-                    # Use simple slice operation - reliable and correct
-                    buffer_to_proc = buffer[-min_frames_subsequent:]
+                elif boundary >= min_frames_subsequent:
+                    # For subsequent chunks, use standard processing with larger batch
+                    buffer_to_proc = ring.window(min_frames_subsequent)
                     
                     # Debug output to help diagnose issues
-                    if count % 28 == 0:
-                        print(f"Processing buffer with {len(buffer_to_proc)} tokens, total collected: {len(buffer)}")
+                    if boundary % 28 == 0 and logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Processing buffer with {len(buffer_to_proc)} tokens, total collected: {boundary}")
                     
-                    # Process the tokens
-                    audio_samples = convert_to_audio(buffer_to_proc, count)
-                    if audio_samples is not None:
+                    # Process the tokens; a chunk crossing several boundaries keeps a few windows in flight
+                    stream.submit(buffer_to_proc, 1, 1)
+                    async for audio_samples in _collect_audio(stream.results()):
                         yield audio_samples
+            
+            if written < token_ids.size:
+                ring.extend(token_ids[written:])
+            
+            # Hand over everything decoded for this chunk before waiting for more tokens
+            async for audio_samples in _collect_audio(stream.results(flush=True)):
+                yield audio_samples
+    finally:
+        stream.close()
 
-def tokens_decoder_sync(syn_token_gen, output_file=None):
-    """Optimized synchronous wrapper with parallel processing and efficient file I/O."""
+async def incremental_tokens_decoder(token_gen, hop_frames: int = DECODE_HOP_FRAMES,
+                                     context_frames: int = DECODE_CONTEXT_FRAMES) -> AsyncGenerator[bytes, None]:
+    """Decoder that runs each frame through SNAC once instead of once per sliding window.
+
+    Whenever hop_frames new frames plus DECODE_LOOKAHEAD_FRAMES of right
+    context are available, decodes them together with context_frames frames
+    before them and keeps only the hop's audio. Like tokens_decoder it never
+    emits frame 0; unlike it, the frames still pending when the stream ends are
+    flushed (without lookahead) rather than dropped.
+    """
+    process_every = 7
+    ring = TokenRingBuffer((context_frames + hop_frames + DECODE_LOOKAHEAD_FRAMES) * process_every)
+    stream = decode_scheduler.open_stream()
+    count = 0
+    next_frame = 1  # First frame whose audio has not been emitted yet
+    
+    try:
+        async for chunk in token_gen:
+            token_ids = token_ids_from_chunk(chunk, count)
+            if token_ids.size == 0:
+                continue
+            
+            previous_count = count
+            count += token_ids.size
+            written = 0
+            
+            for boundary in range(previous_count - previous_count % process_every + process_every,
+                                  count + 1, process_every):
+                frames = boundary // process_every
+                if frames - next_frame < hop_frames + DECODE_LOOKAHEAD_FRAMES:
+                    continue
+                ring.extend(token_ids[written:boundary - previous_count])
+                written = boundary - previous_count
+                
+                start_frame = max(0, next_frame - context_frames)
+                stream.submit(ring.window((frames - start_frame) * process_every), next_frame - start_frame, hop_frames)
+                next_frame += hop_frames
+                async for audio_samples in _collect_audio(stream.results()):
+                    yield audio_samples
+            
+            if written < token_ids.size:
+                ring.extend(token_ids[written:])
+            
+            async for audio_samples in _collect_audio(stream.results(flush=True)):
+                yield audio_samples
+        
+        # Flush the frames that never got their full lookahead
+        frames = count // process_every
+        if frames > next_frame:
+            start_frame = max(0, next_frame - context_frames)
+            window = ring.window((frames - start_frame) * process_every, end=frames * process_every)
+            logger.debug(f"Flushing {frames - next_frame} final frames")
+            stream.submit(window, next_frame - start_frame, frames - next_frame)
+            async for audio_samples in _collect_audio(stream.results(flush=True)):
+                yield audio_samples
+    finally:
+        stream.close()
+
+async def offline_tokens_decoder(token_gen, segment_frames: int = OFFLINE_SEGMENT_FRAMES) -> AsyncGenerator[bytes, None]:
+    """Throughput decoder for audio that is delivered as a whole file.
+
+    Collects every token first, then decodes the utterance with
+    speechpipe.decode_utterance: one SNAC pass for short texts, otherwise
+    segment_frames-frame segments with OFFLINE_CONTEXT_FRAMES of context on
+    each side. On CUDA the segments are batched into a few calls; on CPU one
+    segment per call is faster, since large batches fall out of cache. Emits
+    the same frames as the incremental decoder (all but frame 0).
+    """
+    chunks = []
+    count = 0
+    async for chunk in token_gen:
+        token_ids = token_ids_from_chunk(chunk, count)
+        if token_ids.size == 0:
+            continue
+        chunks.append(token_ids)
+        count += token_ids.size
+    if not chunks:
+        return
+    
+    max_batch = decode_scheduler.MAX_BATCH if speechpipe.snac_device == "cuda" else 1
+    logger.debug(f"Decoding {count // 7} frames offline")
+    monitor = _perf_monitor.get()
+    for audio_samples in decode_utterance(np.concatenate(chunks), 1, segment_frames, OFFLINE_CONTEXT_FRAMES,
+                                          max_batch):
+        monitor.add_audio_chunk()
+        yield audio_samples
+
+def resolve_decode_mode(decode_mode: Optional[str] = None) -> str:
+    """Validate a per-request decode mode; None selects ORPHEUS_FILE_DECODE_MODE."""
+    if decode_mode is None:
+        return FILE_DECODE_MODE
+    mode = decode_mode.strip().lower()
+    if mode not in DECODE_MODES:
+        raise ValueError(f"Unknown decode_mode '{decode_mode}', expected one of: {', '.join(DECODE_MODES)}")
+    return mode
+
+_DECODERS = {
+    "sliding": tokens_decoder,
+    "incremental": incremental_tokens_decoder,
+    "offline": offline_tokens_decoder,
+}
+
+def open_audio_stream(syn_token_gen, decode_mode=None) -> pipeline.AudioStream:
+    """Start decoding syn_token_gen on a pipeline worker; the audio is read from the returned stream.
+
+    syn_token_gen yields token chunks. Pass an async iterable such as
+    relay_tokens_from_api() so the worker runs other pipelines while this
+    one waits for tokens. The audio is delivered as a whole file, so
+    decode_mode None selects ORPHEUS_FILE_DECODE_MODE.
+    """
+    decoder = _DECODERS[resolve_decode_mode(decode_mode)]
     # Use a larger queue for high-end systems
     queue_size = 100 if HIGH_END_GPU else 50
-    audio_queue = queue.Queue(maxsize=queue_size)
+    # Token chunks are already batched (one array per network read), so they go
+    # straight to the decoder, which runs on one of the long-lived pipeline workers
+    return pipeline.submit(decoder, syn_token_gen, queue_size)
+
+def tokens_decoder_sync(syn_token_gen, output_file=None, decode_mode=None):
+    """Synchronous wrapper that decodes on a pipeline worker and writes the audio through a buffer.
+
+    See open_audio_stream for the arguments. Returns the audio segments once
+    generation is complete.
+    """
+    return collect_audio_stream(open_audio_stream(syn_token_gen, decode_mode), output_file)
+
+def collect_audio_stream(stream: pipeline.AudioStream, output_file=None) -> List[bytes]:
+    """Read a stream from open_audio_stream to the end, writing it to output_file if given."""
     audio_segments = []
     
     # If output_file is provided, prepare WAV file with buffered I/O
     wav_file = None
     if output_file:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
-        wav_file = wave.open(output_file, "wb")
+        try:
+            # Create directory if it doesn't exist
+            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+            wav_file = wave.open(output_file, "wb")
+        except Exception:
+            # Nobody will read the stream, so stop its pipeline
+            stream.close()
+            raise
         wav_file.setnchannels(1)
         wav_file.setsampwidth(2)
         wav_file.setframerate(SAMPLE_RATE)
     
-    # Batch processing of tokens for improved throughput
-    batch_size = 32 if HIGH_END_GPU else 16
-    
-    # Thread synchronization for proper completion detection
-    producer_done_event = threading.Event()
-    producer_started_event = threading.Event()
-    
-    # Convert the synchronous token generator into an async generator with batching
-    async def async_token_gen():
-        batch = []
-        for token in syn_token_gen:
-            batch.append(token)
-            if len(batch) >= batch_size:
-                for t in batch:
-                    yield t
-                batch = []
-        # Process any remaining tokens in the final batch
-        for t in batch:
-            yield t
-
-    async def async_producer():
-        # Track performance with more granular metrics
-        start_time = time.time()
-        chunk_count = 0
-        last_log_time = start_time
-        
-        try:
-            # Signal that producer has started processing
-            producer_started_event.set()
-            
-            async for audio_chunk in tokens_decoder(async_token_gen()):
-                # Process each audio chunk from the decoder
-                if audio_chunk:
-                    audio_queue.put(audio_chunk)
-                    chunk_count += 1
-                    
-                    # Log performance periodically
-                    current_time = time.time()
-                    if current_time - last_log_time >= 3.0:  # Every 3 seconds
-                        elapsed = current_time - last_log_time
-                        if elapsed > 0:
-                            recent_chunks = chunk_count
-                            chunks_per_sec = recent_chunks / elapsed
-                            print(f"Audio generation rate: {chunks_per_sec:.2f} chunks/second")
-                        last_log_time = current_time
-                        # Reset chunk counter for next interval
-                        chunk_count = 0
-        except Exception as e:
-            print(f"Error in token processing: {str(e)}")
-            import traceback
-            traceback.print_exc()
-        finally:
-            # Always signal completion, even if there was an error
-            print("Producer completed - setting done event")
-            producer_done_event.set()
-            # Add sentinel to queue to signal end of stream
-            audio_queue.put(None)
-
-    def run_async():
-        """Run the async producer in its own thread"""
-        asyncio.run(async_producer())
-
-    # Use a separate thread with higher priority for producer
-    thread = threading.Thread(target=run_async, name="TokenProcessor")
-    thread.daemon = True  # Allow thread to be terminated when main thread exits
-    thread.start()
-    
-    # Wait for producer to actually start before proceeding
-    # This avoids race conditions where we might try to read from an empty queue
-    # before the producer has had a chance to add anything
-    producer_started_event.wait(timeout=5.0)
-    
-    # Optimized I/O approach for all systems
-    # This approach is simpler and more reliable than separate code paths
     write_buffer = bytearray()
     buffer_max_size = 1024 * 1024  # 1MB max buffer size (adjustable)
     
-    # Keep track of the last time we checked for completion
-    last_check_time = time.time()
-    check_interval = 1.0  # Check producer status every second
+    # Track performance with more granular metrics
+    chunk_count = 0
+    last_log_time = time.time()
+    log_rates = logger.isEnabledFor(logging.INFO)
     
-    # Process audio chunks until we're done
-    while True:
-        try:
-            # Get the next audio chunk with a short timeout
-            # This allows us to periodically check status and handle other events
-            audio = audio_queue.get(timeout=0.1)
-            
-            # None marker indicates end of stream
-            if audio is None:
-                print("Received end-of-stream marker")
-                break
-            
+    # Iteration ends right after the decoder's last chunk, or when it fails
+    try:
+        for audio in stream:
             # Store the audio segment for return value
             audio_segments.append(audio)
+            chunk_count += 1
             
             # Write to file if needed
             if wav_file:
@@ -619,58 +1142,57 @@ def tokens_decoder_sync(syn_token_gen, output_file=None):
                 if len(write_buffer) >= buffer_max_size:
                     wav_file.writeframes(write_buffer)
                     write_buffer = bytearray()  # Reset buffer
-        
-        except queue.Empty:
-            # No data available right now
-            current_time = time.time()
             
-            # Periodically check if producer is done
-            if current_time - last_check_time > check_interval:
-                last_check_time = current_time
-                
-                # If producer is done and queue is empty, we're finished
-                if producer_done_event.is_set() and audio_queue.empty():
-                    print("Producer done and queue empty - finishing consumer")
-                    break
-                
-                # Flush buffer periodically even if not full
-                if wav_file and len(write_buffer) > 0:
-                    wav_file.writeframes(write_buffer)
-                    write_buffer = bytearray()  # Reset buffer
+            # Log performance periodically
+            if log_rates:
+                current_time = time.time()
+                if current_time - last_log_time >= 3.0:  # Every 3 seconds
+                    logger.info(f"Audio generation rate: {chunk_count / (current_time - last_log_time):.2f} chunks/second")
+                    last_log_time = current_time
+                    # Reset chunk counter for next interval
+                    chunk_count = 0
+    finally:
+        stream.close()
     
-    # Extra safety check - ensure thread is done
-    if thread.is_alive():
-        print("Waiting for token processor thread to complete...")
-        thread.join(timeout=10.0)
-        if thread.is_alive():
-            print("WARNING: Token processor thread did not complete within timeout")
+    if isinstance(stream.error, BackendUnavailableError):
+        # Expected when backends are down; re-raised below if nothing was produced
+        logger.error(f"Error in token processing: {str(stream.error)}")
+    elif stream.error is not None:
+        logger.error(f"Error in token processing: {str(stream.error)}", exc_info=stream.error)
     
     # Final flush of any remaining data
     if wav_file and len(write_buffer) > 0:
-        print(f"Final buffer flush: {len(write_buffer)} bytes")
+        logger.debug(f"Final buffer flush: {len(write_buffer)} bytes")
         wav_file.writeframes(write_buffer)
     
     # Close WAV file if opened
     if wav_file:
         wav_file.close()
         if output_file:
-            print(f"Audio saved to {output_file}")
+            logger.info(f"Audio saved to {output_file}")
+    
+    # Nothing was produced, or the token stream broke midway: surface the
+    # producer's error (e.g. BackendUnavailableError) to the caller instead of
+    # returning silent, empty or truncated audio
+    if stream.error is not None and (not audio_segments or isinstance(stream.error, StreamInterruptedError)):
+        raise stream.error
     
     # Calculate and print detailed performance metrics
     if audio_segments:
         total_bytes = sum(len(segment) for segment in audio_segments)
         duration = total_bytes / (2 * SAMPLE_RATE)  # 2 bytes per sample at 24kHz
-        total_time = time.time() - perf_monitor.start_time
+        # From this stream's start: batches of one request overlap, so the request's start would overstate it
+        total_time = time.time() - stream.started
         realtime_factor = duration / total_time if total_time > 0 else 0
         
-        print(f"Generated {len(audio_segments)} audio segments")
-        print(f"Generated {duration:.2f} seconds of audio in {total_time:.2f} seconds")
-        print(f"Realtime factor: {realtime_factor:.2f}x")
+        logger.info(f"Generated {len(audio_segments)} audio segments")
+        logger.info(f"Generated {duration:.2f} seconds of audio in {total_time:.2f} seconds")
+        logger.info(f"Realtime factor: {realtime_factor:.2f}x")
         
         if realtime_factor < 1.0:
-            print("⚠️ Warning: Generation is slower than realtime")
+            logger.warning("Generation is slower than realtime")
         else:
-            print(f"✓ Generation is {realtime_factor:.1f}x faster than realtime")
+            logger.info(f"✓ Generation is {realtime_factor:.1f}x faster than realtime")
     
     return audio_segments
 
@@ -679,8 +1201,11 @@ def stream_audio(audio_buffer):
     if audio_buffer is None or len(audio_buffer) == 0:
         return
     
-    if not SOUNDDEVICE_AVAILABLE:
-        print("Audio playback skipped: sounddevice not available")
+    # Optional dependency, only needed for local playback
+    try:
+        import sounddevice as sd
+    except ImportError:
+        logger.warning("Audio playback skipped: sounddevice not available")
         return
     
     try:
@@ -694,7 +1219,7 @@ def stream_audio(audio_buffer):
         sd.play(audio_float, SAMPLE_RATE)
         sd.wait()
     except Exception as e:
-        print(f"Audio playback error: {e}")
+        logger.error(f"Audio playback error: {e}")
 
 import re
 import numpy as np
@@ -749,17 +1274,21 @@ def split_text_into_sentences(text):
 def generate_speech_from_api(prompt, voice=DEFAULT_VOICE, output_file=None, temperature=TEMPERATURE, 
                      top_p=TOP_P, max_tokens=MAX_TOKENS, repetition_penalty=None, 
                              use_batching=True, max_batch_chars=2500, 
-                             output_format: Optional[str] = "wav") -> Tuple[bool, Optional[str]]:
+                             output_format: Optional[str] = "wav",
+                             decode_mode: Optional[str] = None) -> Tuple[bool, Optional[str]]:
     """
     Generate speech from text using Orpheus model with performance optimizations.
+    decode_mode is "sliding", "incremental" or "offline" (None: ORPHEUS_FILE_DECODE_MODE).
     Returns a tuple: (success_status, error_message_or_none).
+    Raises BackendUnavailableError when no LLM backend can serve the request,
+    and StreamInterruptedError (a subclass) when its token stream breaks midway.
     """
-    print(f"Starting speech generation for '{prompt[:50]}{'...' if len(prompt) > 50 else ''}'")
-    print(f"Using voice: {voice}, Output Format: {output_format}, GPU acceleration: {'Yes (High-end)' if HIGH_END_GPU else 'Yes' if torch.cuda.is_available() else 'No'}")
+    initialize_engine()
+    logger.info(f"Starting speech generation for '{prompt[:50]}{'...' if len(prompt) > 50 else ''}'")
+    logger.info(f"Using voice: {voice}, Output Format: {output_format}, GPU acceleration: {'Yes (High-end)' if HIGH_END_GPU else 'Yes' if speechpipe.snac_device == 'cuda' else 'No'}")
     
-    # Reset performance monitor
-    global perf_monitor
-    perf_monitor = PerformanceMonitor()
+    # A fresh monitor for this request only; others running at once keep theirs
+    monitor_token = _perf_monitor.set(PerformanceMonitor())
     
     start_time = time.time()
     
@@ -768,7 +1297,7 @@ def generate_speech_from_api(prompt, voice=DEFAULT_VOICE, output_file=None, temp
         # For shorter text, use the standard non-batched approach
         if not use_batching or len(prompt) < max_batch_chars:
             all_audio_segments = tokens_decoder_sync(
-                generate_tokens_from_api(
+                relay_tokens_from_api(
                     prompt=prompt, 
                     voice=voice,
                     temperature=temperature,
@@ -776,13 +1305,14 @@ def generate_speech_from_api(prompt, voice=DEFAULT_VOICE, output_file=None, temp
                     max_tokens=max_tokens,
                     repetition_penalty=REPETITION_PENALTY  # Always use hardcoded value
                 ),
-                output_file=output_file
+                output_file=output_file,
+                decode_mode=decode_mode
             )
         else:
             # For longer text, use sentence-based batching
-            print(f"Using sentence-based batching for text with {len(prompt)} characters")
+            logger.info(f"Using sentence-based batching for text with {len(prompt)} characters")
             sentences = split_text_into_sentences(prompt)
-            print(f"Split text into {len(sentences)} segments")
+            logger.info(f"Split text into {len(sentences)} segments")
             
             batches = []
             current_batch = ""
@@ -797,38 +1327,56 @@ def generate_speech_from_api(prompt, voice=DEFAULT_VOICE, output_file=None, temp
             if current_batch:
                 batches.append(current_batch)
             
-            print(f"Created {len(batches)} batches for processing")
+            logger.info(f"Created {len(batches)} batches for processing, up to {BATCH_CONCURRENCY} at once")
             
-            batch_temp_files = []
-            for i, batch_text in enumerate(batches):
-                print(f"Processing batch {i+1}/{len(batches)} ({len(batch_text)} characters)")
-                temp_batch_output_file = None
-                if output_file:
-                    # Ensure 'outputs' directory exists for temp files if main output_file is specified
-                    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
-                    temp_batch_output_file = f"{os.path.splitext(output_file)[0]}_temp_batch_{i}_{int(time.time())}.wav"
-                    batch_temp_files.append(temp_batch_output_file)
-                
-                batch_segments_data = tokens_decoder_sync(
-                    generate_tokens_from_api(
-                        prompt=batch_text,
+            def start_batch(i):
+                logger.info(f"Starting batch {i+1}/{len(batches)} ({len(batches[i])} characters)")
+                return open_audio_stream(
+                    relay_tokens_from_api(
+                        prompt=batches[i],
                         voice=voice,
                         temperature=temperature,
                         top_p=top_p,
                         max_tokens=max_tokens,
                         repetition_penalty=REPETITION_PENALTY
                     ),
-                    output_file=temp_batch_output_file
+                    decode_mode=decode_mode
                 )
-                all_audio_segments.extend(batch_segments_data)
             
-            if output_file and batch_temp_files:
-                stitch_wav_files(batch_temp_files, output_file)
+            # Later batches generate while earlier ones are read, and are read in
+            # order. A batch that is done first waits in its stream, which pauses
+            # its decoder once it holds a full queue of audio.
+            in_flight = collections.deque(start_batch(i) for i in range(min(BATCH_CONCURRENCY, len(batches))))
+            batch_temp_files = []
+            try:
+                for i in range(len(batches)):
+                    stream = in_flight.popleft()
+                    temp_batch_output_file = None
+                    if output_file:
+                        # Ensure 'outputs' directory exists for temp files if main output_file is specified
+                        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+                        temp_batch_output_file = f"{os.path.splitext(output_file)[0]}_temp_batch_{i}_{int(time.time())}.wav"
+                        batch_temp_files.append(temp_batch_output_file)
+                    
+                    batch_segments_data = collect_audio_stream(stream, output_file=temp_batch_output_file)
+                    all_audio_segments.extend(batch_segments_data)
+                    logger.info(f"Finished batch {i+1}/{len(batches)}")
+                    if i + len(in_flight) + 1 < len(batches):
+                        in_flight.append(start_batch(i + len(in_flight) + 1))
+                
+                if output_file and batch_temp_files:
+                    stitch_wav_files(batch_temp_files, output_file)
+            finally:
+                # Stop the batches still running if one of them failed
+                for stream in in_flight:
+                    stream.close()
                 for temp_file in batch_temp_files:
                     try:
                         os.remove(temp_file)
+                    except FileNotFoundError:
+                        pass
                     except Exception as e:
-                        print(f"Warning: Could not remove temporary file {temp_file}: {e}")
+                        logger.warning(f"Could not remove temporary file {temp_file}: {e}")
     
         # Report final performance metrics
         end_time = time.time()
@@ -837,55 +1385,86 @@ def generate_speech_from_api(prompt, voice=DEFAULT_VOICE, output_file=None, temp
         if all_audio_segments:
             total_bytes_generated = sum(len(segment) for segment in all_audio_segments)
             duration_generated = total_bytes_generated / (2 * SAMPLE_RATE)
-            print(f"Generated {len(all_audio_segments)} audio segments, total {duration_generated:.2f}s audio in {total_time:.2f}s.")
+            logger.info(f"Generated {len(all_audio_segments)} audio segments, total {duration_generated:.2f}s audio in {total_time:.2f}s.")
             if total_time > 0:
-                print(f"Realtime factor: {duration_generated/total_time:.2f}x")
+                logger.info(f"Realtime factor: {duration_generated/total_time:.2f}x")
         else:
-            print(f"No audio segments generated. Total time: {total_time:.2f} seconds")
+            logger.warning(f"No audio segments generated. Total time: {total_time:.2f} seconds")
             # If no audio segments were generated, it's a failure, regardless of file creation.
             if output_file and os.path.exists(output_file):
                 # Log the empty file situation more clearly as an error before returning failure
                 if os.path.getsize(output_file) <= 44: # Check for empty or header-only WAV
                     error_msg = f"Output file {output_file} was created but contains no audio data (size: {os.path.getsize(output_file)} bytes)."
-                    print(f"ERROR: {error_msg}")
+                    logger.error(error_msg)
                     return False, error_msg
             
             error_msg = "No audio segments were generated during the process."
-            print(f"ERROR: {error_msg}")
+            logger.error(error_msg)
             return False, error_msg
 
         # Check if the output file was created and is not empty (beyond just a header)
         if output_file:
             if not os.path.exists(output_file):
                 error_msg = f"Output file {output_file} was not created."
-                print(f"ERROR: {error_msg}")
+                logger.error(error_msg)
                 return False, error_msg
             # A typical WAV header is 44 bytes. If it's that or less, it's effectively empty.
             if os.path.getsize(output_file) <= 44: 
                 error_msg = f"Output file {output_file} is empty or contains only a header (size: {os.path.getsize(output_file)} bytes)."
-                print(f"ERROR: {error_msg}")
+                logger.error(error_msg)
                 # Optionally remove empty file: os.remove(output_file)
                 return False, error_msg
-            print(f"Successfully generated speech to {output_file}")
+            logger.info(f"Successfully generated speech to {output_file}")
         
-        print(f"Total speech generation completed in {total_time:.2f} seconds")
+        logger.info(f"Total speech generation completed in {total_time:.2f} seconds")
         return True, None # Success
 
+    except BackendUnavailableError:
+        # Callers map this to 503 / "try again later" rather than a generic failure
+        raise
     except Exception as e:
-        import traceback
-        tb_str = traceback.format_exc()
-        error_msg = f"""Error during speech generation: {str(e)}
-Traceback:
-{tb_str}"""
-        print(error_msg)
+        logger.exception(f"Error during speech generation: {str(e)}")
         return False, str(e) # Return the error message
+    finally:
+        _perf_monitor.reset(monitor_token)
+
+_synthesis_executor: Optional[ThreadPoolExecutor] = None
+_synthesis_executor_lock = threading.Lock()
+
+def _get_synthesis_executor() -> ThreadPoolExecutor:
+    # Created on first use, so a process that forks workers (prefork.py) has no threads to lose
+    global _synthesis_executor
+    with _synthesis_executor_lock:
+        if _synthesis_executor is None:
+            _synthesis_executor = ThreadPoolExecutor(max_workers=SYNTHESIS_CONCURRENCY,
+                                                     thread_name_prefix="Synthesis")
+        return _synthesis_executor
+
+async def synthesize(prompt, voice=DEFAULT_VOICE, output_file=None, temperature=TEMPERATURE,
+                     top_p=TOP_P, max_tokens=MAX_TOKENS, use_batching=True, max_batch_chars=2500,
+                     output_format: Optional[str] = "wav",
+                     decode_mode: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Awaitable generate_speech_from_api for async callers such as the FastAPI endpoints.
+
+    The LLM request streams on the engine loop as before; decoding and file
+    writing run on one of ORPHEUS_SYNTHESIS_CONCURRENCY executor threads, so
+    the calling event loop keeps serving other requests meanwhile. Log records
+    keep the caller's request id. Returns and raises like generate_speech_from_api.
+    """
+    call = functools.partial(generate_speech_from_api, prompt, voice=voice, output_file=output_file,
+                             temperature=temperature, top_p=top_p, max_tokens=max_tokens,
+                             use_batching=use_batching, max_batch_chars=max_batch_chars,
+                             output_format=output_format, decode_mode=decode_mode)
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_get_synthesis_executor(), context.run, call)
 
 def stitch_wav_files(input_files, output_file, crossfade_ms=100):
     """Stitch multiple WAV files together with crossfading for smooth transitions."""
     if not input_files:
         return
         
-    print(f"Stitching {len(input_files)} WAV files together with {crossfade_ms}ms crossfade")
+    logger.info(f"Stitching {len(input_files)} WAV files together with {crossfade_ms}ms crossfade")
     
     # If only one file, just copy it
     if len(input_files) == 1:
@@ -895,7 +1474,7 @@ def stitch_wav_files(input_files, output_file, crossfade_ms=100):
     
     # Convert crossfade_ms to samples
     crossfade_samples = int(SAMPLE_RATE * crossfade_ms / 1000)
-    print(f"Using {crossfade_samples} samples for crossfade at {SAMPLE_RATE}Hz")
+    logger.info(f"Using {crossfade_samples} samples for crossfade at {SAMPLE_RATE}Hz")
     
     # Build the final audio in memory with crossfades
     final_audio = np.array([], dtype=np.int16)
@@ -907,7 +1486,7 @@ def stitch_wav_files(input_files, output_file, crossfade_ms=100):
                 if first_params is None:
                     first_params = wav.getparams()
                 elif wav.getparams() != first_params:
-                    print(f"Warning: WAV file {input_file} has different parameters")
+                    logger.warning(f"WAV file {input_file} has different parameters")
                     
                 frames = wav.readframes(wav.getnframes())
                 audio = np.frombuffer(frames, dtype=np.int16)
@@ -932,10 +1511,10 @@ def stitch_wav_files(input_files, output_file, crossfade_ms=100):
                                                     audio[crossfade_samples:]])
                     else:
                         # One segment too short for crossfade, just append
-                        print(f"Segment {i} too short for crossfade, concatenating directly")
+                        logger.info(f"Segment {i} too short for crossfade, concatenating directly")
                         final_audio = np.concatenate([final_audio, audio])
         except Exception as e:
-            print(f"Error processing file {input_file}: {e}")
+            logger.error(f"Error processing file {input_file}: {e}")
             if i == 0:
                 raise  # Critical failure if first file fails
     
@@ -948,9 +1527,9 @@ def stitch_wav_files(input_files, output_file, crossfade_ms=100):
             output_wav.setparams(first_params)
             output_wav.writeframes(final_audio.tobytes())
         
-        print(f"Successfully stitched audio to {output_file} with crossfading")
+        logger.info(f"Successfully stitched audio to {output_file} with crossfading")
     except Exception as e:
-        print(f"Error writing output file {output_file}: {e}")
+        logger.error(f"Error writing output file {output_file}: {e}")
         raise
 
 def list_available_voices():
@@ -1000,7 +1579,7 @@ def main():
         # Generate a filename based on the voice and a timestamp
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         output_file = f"outputs/{args.voice}_{timestamp}.wav"
-        print(f"No output file specified. Saving to {output_file}")
+        logger.info(f"No output file specified. Saving to {output_file}")
     
     # Generate speech
     start_time = time.time()
@@ -1014,11 +1593,11 @@ def main():
     )
     end_time = time.time()
     
-    print(f"Speech generation completed in {end_time - start_time:.2f} seconds")
+    logger.info(f"Speech generation completed in {end_time - start_time:.2f} seconds")
     if success:
-        print(f"Audio saved to {output_file}")
+        logger.info(f"Audio saved to {output_file}")
     else:
-        print(f"Speech generation failed. Error: {error_msg}")
+        logger.error(f"Speech generation failed. Error: {error_msg}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,74 @@
+"""
+Logging setup shared by the engine, the FastAPI app and the RunPod handler.
+
+Every record carries the id of the request it belongs to (%(request_id)s),
+taken from a context variable set with request_context(). Debug messages on
+hot paths (per token chunk, per decoded window) are guarded at the call site
+with logger.isEnabledFor(logging.DEBUG), so at the default INFO level they
+cost a cached level lookup and no string formatting.
+"""
+
+import os
+import sys
+import uuid
+import logging
+import contextlib
+import contextvars
+from typing import Iterator, Optional, Union
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s"
+
+# Id of the request being served by the current thread / task ("-" outside requests)
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("orpheus_request_id", default="-")
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to every record passing through a handler."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+def get_log_level() -> int:
+    """Read ORPHEUS_LOG_LEVEL (DEBUG, INFO, WARNING, ERROR), defaulting to INFO."""
+    name = os.environ.get("ORPHEUS_LOG_LEVEL", "INFO").strip().upper()
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else logging.INFO
+
+_configured = False
+# False when the host application configured the root logger before us
+_owns_root = False
+
+def configure_logging(level: Optional[Union[int, str]] = None) -> None:
+    """Install the request-aware log format on the root logger and apply the log level.
+
+    The handler is installed once; later calls only apply the level again.
+    If the root logger already has handlers (configured by the host
+    application), they are kept and only gain the request id filter, and
+    the level is set on the tts_engine logger rather than on the root.
+    """
+    global _configured, _owns_root
+    root = logging.getLogger()
+    if not _configured:
+        if not root.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            root.addHandler(handler)
+            _owns_root = True
+        for handler in root.handlers:
+            handler.addFilter(RequestIdFilter())
+        _configured = True
+    if level is None:
+        level = get_log_level()
+    (root if _owns_root else logging.getLogger("tts_engine")).setLevel(level)
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+@contextlib.contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """Tag all log records emitted inside the block with request_id."""
+    token = request_id_var.set(request_id or new_request_id())
+    try:
+        yield request_id_var.get()
+    finally:
+        request_id_var.reset(token)
@@ -0,0 +1,199 @@
+"""
+Long-lived executor for the token-to-audio pipelines of all requests.
+
+A pipeline feeds one request's token chunks through a decoder (an async
+generator such as inference.tokens_decoder) and hands the audio to the
+caller. tokens_decoder_sync used to start a thread and a new event loop
+(asyncio.run) for every call, and every batch of a long text did it again.
+Here ORPHEUS_PIPELINE_WORKERS threads are started on first use, and each
+runs one event loop for its lifetime. A pipeline is a task on the loop of
+the worker with the fewest pipelines:
+
+- token chunks are awaited, so a pipeline waiting for the LLM does not
+  hold up the others on its loop (pass an async iterable, such as
+  inference.relay_tokens_from_api(); a synchronous one blocks the loop
+  between chunks);
+- decodes run inline and block the loop while SNAC runs, so pipelines on
+  one worker decode in turn and the worker count bounds parallel decodes
+  alongside ORPHEUS_DECODE_SLOTS.
+
+The caller reads the audio from an AudioStream. Reading blocks until a
+chunk arrives or the pipeline ends. The end marker is queued right after
+the last chunk, so the caller wakes as soon as the decoder finishes and
+never polls. A failed pipeline ends the stream too, and the caller finds
+the exception in AudioStream.error.
+"""
+
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+import contextvars
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+try:
+    PIPELINE_WORKERS = max(1, int(os.environ.get("ORPHEUS_PIPELINE_WORKERS", "8")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_PIPELINE_WORKERS value, using 8 as fallback")
+    PIPELINE_WORKERS = 8
+
+# Queued after a pipeline's last chunk
+_END = object()
+
+class StreamClosed(Exception):
+    """Raised inside a pipeline whose caller stopped reading its AudioStream."""
+
+class AudioStream:
+    """Audio chunks of one pipeline, in order. Iterating blocks until the next chunk or the end."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self._loop = loop
+        self._maxsize = max(1, maxsize)
+        # Unbounded; the pipeline waits for room itself so its loop keeps running meanwhile
+        self._queue = queue.Queue()
+        self._room: Optional[asyncio.Event] = None
+        self._waiting = False
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None
+        # When the pipeline was submitted, for per-stream timings
+        self.started = time.time()
+
+    async def put(self, audio: bytes) -> None:
+        """Queue a chunk, waiting while maxsize chunks are unread. Runs on the worker loop."""
+        while self._queue.qsize() >= self._maxsize and not self._closed:
+            if self._room is None:
+                self._room = asyncio.Event()
+            self._room.clear()
+            self._waiting = True
+            # The reader checks _waiting after taking a chunk; check again so a chunk taken before is not missed
+            if self._queue.qsize() >= self._maxsize and not self._closed:
+                await self._room.wait()
+            self._waiting = False
+        if self._closed:
+            raise StreamClosed()
+        self._queue.put(audio)
+
+    def _wake(self) -> None:
+        if self._room is not None:
+            self._room.set()
+
+    def _cancel(self) -> None:
+        self._wake()
+        # Also stops a pipeline that is still waiting for tokens rather than writing audio
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        self.error = error
+        self._queue.put(_END)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            audio = self._queue.get()
+            if audio is _END:
+                return
+            if self._waiting:
+                self._loop.call_soon_threadsafe(self._wake)
+            yield audio
+
+    def close(self) -> None:
+        """Stop the pipeline early; chunks not read yet are dropped. Does nothing once it has ended."""
+        self._closed = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._loop.call_soon_threadsafe(self._cancel)
+
+class _Worker:
+    def __init__(self, index: int):
+        self.loop = asyncio.new_event_loop()
+        self.pipelines = 0
+        # The loop only keeps weak references to its tasks
+        self.tasks: Set[asyncio.Task] = set()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=f"Pipeline-{index}", daemon=True)
+        self.thread.start()
+
+    def start(self, decoder, chunks, stream: AudioStream) -> None:
+        # Runs on the loop, in the caller's context, which the task copies
+        task = self.loop.create_task(_run(decoder, chunks, stream))
+        stream._task = task
+        self.tasks.add(task)
+        task.add_done_callback(lambda task: self._finished(task, stream))
+
+    def _finished(self, task: asyncio.Task, stream: AudioStream) -> None:
+        # A callback rather than a finally block, so a pipeline cancelled before its first step ends its stream too
+        global _completed
+        self.tasks.discard(task)
+        with _workers_lock:
+            self.pipelines -= 1
+            _completed += 1
+        stream._finish(None if task.cancelled() else task.exception())
+
+_workers: List[_Worker] = []
+_workers_lock = threading.Lock()
+_completed = 0
+
+async def _pump(decoder, chunks, stream: AudioStream) -> None:
+    if hasattr(chunks, "__aiter__"):
+        token_gen = chunks
+    else:
+        async def token_gen_from(iterable):
+            for chunk in iterable:
+                yield chunk
+        token_gen = token_gen_from(chunks)
+
+    audio_gen = decoder(token_gen)
+    try:
+        async for audio in audio_gen:
+            if audio:
+                await stream.put(audio)
+    finally:
+        # The loop outlives the pipeline, so close the generators now rather than at loop shutdown
+        await audio_gen.aclose()
+        await token_gen.aclose()
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+async def _run(decoder, chunks, stream: AudioStream) -> None:
+    try:
+        await _pump(decoder, chunks, stream)
+    except StreamClosed:
+        pass
+
+def _start_workers() -> List[_Worker]:
+    # Started on first use, so a process that forks workers (prefork.py) has no threads to lose
+    with _workers_lock:
+        if not _workers:
+            _workers.extend(_Worker(index) for index in range(PIPELINE_WORKERS))
+            logger.debug(f"Started {PIPELINE_WORKERS} pipeline workers")
+        return _workers
+
+def submit(decoder, chunks, maxsize: int = 50) -> AudioStream:
+    """
+    Run decoder over the token chunks (an async or synchronous iterable) on
+    a pipeline worker. At most maxsize chunks wait to be read before the
+    decoder pauses. The pipeline's log records keep the caller's request id.
+    """
+    workers = _start_workers()
+    with _workers_lock:
+        worker = min(workers, key=lambda candidate: candidate.pipelines)
+        worker.pipelines += 1
+    stream = AudioStream(worker.loop, maxsize)
+    worker.loop.call_soon_threadsafe(worker.start, decoder, chunks, stream, context=contextvars.copy_context())
+    return stream
+
+def pipeline_stats() -> Dict[str, Any]:
+    """Pipeline workers, the pipelines running on each, and pipelines finished."""
+    with _workers_lock:
+        return {
+            "workers": len(_workers) or PIPELINE_WORKERS,
+            "pipelines": [worker.pipelines for worker in _workers],
+            "completed": _completed,
+        }
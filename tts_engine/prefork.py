@@ -0,0 +1,180 @@
+"""
+Preload-then-fork launcher for serving with several workers (ORPHEUS_WORKERS).
+
+`uvicorn --workers N` starts N fresh interpreters, and each one imports the
+app and loads and warms its own SNAC decoder. This launcher does that once.
+It imports the app, loads and warms the decoder, binds the listening socket,
+and then forks N uvicorn workers from that process. The workers share the
+model weights and the imported modules copy-on-write, so there is only one
+copy in memory. They start serving as soon as they are forked. The parent
+only supervises: it replaces workers that die and forwards SIGTERM/SIGINT.
+
+Preloading applies to the PyTorch decoder on CPU. In the following cases the
+workers load the decoder themselves, as they do under uvicorn:
+- CUDA: a forked child cannot use CUDA once its parent has, and each GPU
+  worker holds its own copy on the device anyway.
+- MPS, for the same reason.
+- The ONNX backend: ONNX Runtime's thread pools do not survive a fork.
+- Decode workers (ORPHEUS_DECODE_WORKERS): they hold the models.
+
+Usage:
+    python -m tts_engine.prefork app:app --workers 4 --host 0.0.0.0 --port 5005
+"""
+
+import gc
+import os
+import sys
+import signal
+import logging
+import argparse
+from typing import Optional
+
+from . import decode_workers, governor, speechpipe
+
+logger = logging.getLogger(__name__)
+
+# Exit status of a worker whose app failed to start (uvicorn uses the same)
+STARTUP_FAILURE = 3
+
+try:
+    WORKERS = max(1, int(os.environ.get("ORPHEUS_WORKERS", "1")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_WORKERS value, using 1 as fallback")
+    WORKERS = 1
+
+try:
+    PORT = int(os.environ.get("ORPHEUS_PORT", "5005"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_PORT value, using 5005 as fallback")
+    PORT = 5005
+
+HOST = os.environ.get("ORPHEUS_HOST") or "0.0.0.0"
+
+def preload_unsupported_reason() -> Optional[str]:
+    """Why the decoder cannot be loaded before forking, or None if it can."""
+    if decode_workers.DECODE_WORKERS:
+        return "ORPHEUS_DECODE_WORKERS is set, so the decode workers hold the models"
+    if speechpipe.SNAC_BACKEND != "torch":
+        return "ONNX Runtime sessions do not survive a fork"
+    # NVML answers without initializing CUDA in this process, which would break it in the workers
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+    import torch
+    if torch.cuda.is_available():
+        return "CUDA cannot be used in a forked worker once the parent has used it"
+    if torch.backends.mps.is_available():
+        return "MPS cannot be used in a forked worker once the parent has used it"
+    return None
+
+def preload() -> Optional[int]:
+    """
+    Load and warm up the decoder in this process ahead of forking workers.
+    Returns the torch thread count the workers should apply after the fork,
+    or None if the decoder was not preloaded.
+    """
+    reason = preload_unsupported_reason()
+    if reason:
+        logger.info(f"Not preloading the SNAC decoder ({reason}); each worker loads its own")
+        return None
+    # OpenMP's worker threads do not exist in a forked child, and a child whose
+    # parent ran a multi-threaded op hangs on its own first one. The parent
+    # stays single-threaded; workers set their thread count after the fork.
+    threads = governor.INTRA_OP_THREADS
+    governor.configure(intra_op_threads=1)
+    speechpipe.initialize()
+    speechpipe.warm_up()
+    return threads
+
+def _run_worker(config, sock, threads: Optional[int]) -> None:
+    """Body of a forked worker: serve the app on the inherited socket, then exit."""
+    import uvicorn
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    status = 1
+    try:
+        if threads is not None:
+            governor.configure(intra_op_threads=threads)
+        server = uvicorn.Server(config)
+        server.run(sockets=[sock])
+        status = 0 if server.started else STARTUP_FAILURE
+    except KeyboardInterrupt:
+        status = 0
+    except Exception as e:
+        logger.exception(f"Worker {os.getpid()} failed: {e}")
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Skip the parent's atexit handlers and finalizers
+        os._exit(status)
+
+def serve(app: str, host: str = HOST, port: int = PORT, workers: int = WORKERS) -> int:
+    """
+    Import app ("module:attribute"), preload the decoder, and run workers
+    forked from this process until SIGTERM/SIGINT. Returns the exit status.
+    """
+    import uvicorn
+    config = uvicorn.Config(app, host=host, port=port)
+    # Import the app here so the workers share its modules too
+    config.load()
+    threads = preload()
+    sock = config.bind_socket()
+    # Keep the collector from writing to every inherited object (and copying its page) in each worker
+    gc.freeze()
+
+    children = set()
+    stopping = False
+    exit_status = 0
+
+    def stop(signum=None, frame=None):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(config, sock, threads)
+        children.add(pid)
+        if stopping:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Starting {workers} workers on {host}:{port} "
+                f"({'sharing the preloaded decoder' if threads is not None else 'each loading its own decoder'})")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        pid, status = os.wait()
+        if pid not in children:
+            continue
+        children.discard(pid)
+        code = os.waitstatus_to_exitcode(status)
+        if stopping:
+            continue
+        if code == STARTUP_FAILURE:
+            logger.error(f"Worker {pid} failed to start the app; shutting down")
+            exit_status = STARTUP_FAILURE
+            stop()
+        else:
+            logger.warning(f"Worker {pid} exited with status {code}; starting a replacement")
+            spawn()
+    sock.close()
+    logger.info("All workers stopped")
+    return exit_status
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an app with workers forked after loading the SNAC decoder")
+    parser.add_argument("app", nargs="?", default="app:app", help="App to serve, as module:attribute")
+    parser.add_argument("--host", default=HOST, help="Address to bind (default: ORPHEUS_HOST or 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=PORT, help="Port to bind (default: ORPHEUS_PORT or 5005)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Worker processes (default: ORPHEUS_WORKERS or 1)")
+    args = parser.parse_args()
+    sys.exit(serve(args.app, args.host, args.port, max(1, args.workers)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Retry and failure-isolation primitives for LLM backend calls.
+
+- Deadline: one time budget per generation, shared by every attempt, backoff
+  sleep and slot wait until the first token arrives.
+- backoff_delay(): exponential backoff with full jitter, awaited with
+  asyncio.sleep on the engine loop so no thread is held while waiting.
+- CircuitBreaker: per-backend closed / open / half-open state. After
+  ORPHEUS_BREAKER_FAILURES consecutive failures a backend gets no traffic for
+  ORPHEUS_BREAKER_RESET seconds, then a single probe request decides whether
+  it closes again.
+- BackendUnavailableError: raised when no backend can serve a generation
+  (every circuit open, retries or deadline exhausted); the API maps it to 503.
+- StreamInterruptedError: a BackendUnavailableError for a token stream that
+  broke after tokens had arrived, so the audio would be truncated.
+"""
+
+import os
+import time
+import random
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    REQUEST_DEADLINE = float(os.environ.get("ORPHEUS_REQUEST_DEADLINE", os.environ.get("ORPHEUS_API_TIMEOUT", "120")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_REQUEST_DEADLINE value, using 120 seconds as fallback")
+    REQUEST_DEADLINE = 120.0
+
+try:
+    BACKOFF_BASE = float(os.environ.get("ORPHEUS_RETRY_BACKOFF_BASE", "0.5"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_RETRY_BACKOFF_BASE value, using 0.5 seconds as fallback")
+    BACKOFF_BASE = 0.5
+
+try:
+    BACKOFF_MAX = float(os.environ.get("ORPHEUS_RETRY_BACKOFF_MAX", "8"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_RETRY_BACKOFF_MAX value, using 8 seconds as fallback")
+    BACKOFF_MAX = 8.0
+
+try:
+    BREAKER_FAILURES = int(os.environ.get("ORPHEUS_BREAKER_FAILURES", "5"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_BREAKER_FAILURES value, using 5 as fallback")
+    BREAKER_FAILURES = 5
+
+try:
+    BREAKER_RESET = float(os.environ.get("ORPHEUS_BREAKER_RESET", "30"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_BREAKER_RESET value, using 30 seconds as fallback")
+    BREAKER_RESET = 30.0
+
+class BackendUnavailableError(Exception):
+    """No LLM backend can serve the request right now."""
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class StreamInterruptedError(BackendUnavailableError):
+    """The backend's token stream broke midway; the audio produced so far is incomplete."""
+    def __init__(self, message: str, tokens: int = 0):
+        super().__init__(message)
+        self.tokens = tokens
+
+class Deadline:
+    """Absolute time budget for one generation."""
+    def __init__(self, seconds: float = REQUEST_DEADLINE):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+def backoff_delay(retry: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Full-jitter exponential backoff for the given retry number (1 = first retry).
+
+    Spreading retries uniformly over [0, base * 2**retry] keeps clients that
+    failed together from retrying in lockstep.
+    """
+    return random.uniform(0.0, min(cap, base * (2 ** retry)))
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one backend. Used from the engine loop only."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def available(self) -> bool:
+        """True if a request may be sent now (closed, or half-open with no probe running)."""
+        if self.failure_threshold <= 0:
+            return True
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probe_in_flight)
+
+    def on_dispatch(self) -> None:
+        """A request was sent; in half-open state it becomes the probe."""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def on_release(self) -> None:
+        """The request ended without a verdict (e.g. cancelled); let another probe through."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probe_in_flight = False
+        self._state = self.CLOSED
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this opened the circuit."""
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.failure_threshold <= 0:
+            return False
+        if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def stats(self) -> Dict:
+        return {"state": self.state, "consecutive_failures": self._failures, "times_opened": self.times_opened}
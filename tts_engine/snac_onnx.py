@@ -0,0 +1,185 @@
+"""
+Optional ONNX Runtime backend for the SNAC decoder (ORPHEUS_SNAC_BACKEND=onnx).
+
+At these small window sizes eager PyTorch spends much of each call in per-op
+dispatch. This module exports model.decode (codes -> audio) once to ONNX,
+with dynamic batch and frame dimensions so every window size shares one
+graph. It caches the graph on disk under a fingerprint of the model weights,
+and runs it through an ONNX Runtime session with configurable intra/inter-op
+thread counts. SNAC's noise blocks are exported as ONNX random ops, so the
+output varies from call to call the same way PyTorch's does.
+
+With int8=True (ORPHEUS_SNAC_PRECISION=int8) the graph is exported with the
+decoder's pointwise convolutions written as MatMul and then dynamically
+quantized by ONNX Runtime: int8 weights, activations quantized per call.
+The quantized graph is cached next to the float one.
+"""
+
+import os
+import types
+import hashlib
+import logging
+import warnings
+import contextlib
+from typing import Optional
+
+import numpy as np
+import torch
+
+from . import governor
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+ONNX_CACHE_DIR = os.path.expanduser(os.environ.get("ORPHEUS_ONNX_CACHE_DIR", "~/.cache/orpheus"))
+
+try:
+    # Defaults to the governor's per-decode thread count; 0 lets ONNX Runtime
+    # use one thread per physical core of the host
+    ONNX_INTRA_OP_THREADS = max(0, int(os.environ.get("ORPHEUS_ONNX_INTRA_OP_THREADS", governor.INTRA_OP_THREADS)))
+except (ValueError, TypeError):
+    logger.warning(f"Invalid ORPHEUS_ONNX_INTRA_OP_THREADS value, using {governor.INTRA_OP_THREADS} as fallback")
+    ONNX_INTRA_OP_THREADS = governor.INTRA_OP_THREADS
+
+try:
+    ONNX_INTER_OP_THREADS = max(1, int(os.environ.get("ORPHEUS_ONNX_INTER_OP_THREADS", "1")))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_ONNX_INTER_OP_THREADS value, using 1 as fallback")
+    ONNX_INTER_OP_THREADS = 1
+
+ONNX_OPSET = 17
+
+class _CodesToAudio(torch.nn.Module):
+    """model.decode with the three code levels as separate inputs, as ONNX needs them."""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, codes_0, codes_1, codes_2):
+        # quantizer.from_codes, except that repeat_interleave (which traces to a
+        # fixed-size Reshape) is written as expand + flatten to keep frames dynamic
+        z_q = 0
+        for quantizer, codes in zip(self.model.quantizer.quantizers, (codes_0, codes_1, codes_2)):
+            z_q_i = quantizer.out_proj(quantizer.decode_code(codes))
+            z_q = z_q + z_q_i.unsqueeze(-1).expand(-1, -1, -1, quantizer.stride).flatten(2)
+        return self.model.decoder(z_q)
+
+def _pointwise_matmul(self, x):
+    y = torch.matmul(x.transpose(1, 2), self.weight[:, :, 0].t())
+    if self.bias is not None:
+        y = y + self.bias
+    return y.transpose(1, 2)
+
+@contextlib.contextmanager
+def _pointwise_convs_as_matmul(model):
+    """Temporarily run the decoder's 1x1 convolutions as MatMul, which ONNX Runtime quantizes
+    to its fast integer GEMM (ConvInteger has no comparable kernel)."""
+    patched = [module for module in model.decoder.modules()
+               if isinstance(module, torch.nn.Conv1d) and module.kernel_size == (1,) and module.groups == 1]
+    for module in patched:
+        module.forward = types.MethodType(_pointwise_matmul, module)
+    try:
+        yield
+    finally:
+        for module in patched:
+            del module.forward
+
+def model_fingerprint(model) -> str:
+    """Hash of the weights used by decode, so a cached graph is never reused for a different model."""
+    digest = hashlib.sha1()
+    for name, tensor in model.state_dict().items():
+        if name.startswith(("quantizer.", "decoder.")):
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def export_decoder(model, path: str, int8: bool = False) -> None:
+    """Export model.decode (model on CPU) to an ONNX file with dynamic batch and frame dimensions."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write next to the target and rename, so a concurrent loader never sees a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        float_path = f"{path}.{os.getpid()}.float.tmp"
+        try:
+            with _pointwise_convs_as_matmul(model):
+                export_decoder(model, float_path)
+            quantize_dynamic(float_path, tmp_path, op_types_to_quantize=["MatMul"], weight_type=QuantType.QInt8)
+        finally:
+            if os.path.exists(float_path):
+                os.remove(float_path)
+        os.replace(tmp_path, path)
+        return
+    frames = 4
+    example = tuple(torch.zeros(1, frames * stride, dtype=torch.int64) for stride in (1, 2, 4))
+    # ResidualUnit's cropping branch is traced as a constant; its convolutions
+    # are length-preserving, so the crop never applies and the warning is noise
+    with torch.inference_mode(), warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=torch.jit.TracerWarning)
+        torch.onnx.export(
+            _CodesToAudio(model).eval(), example, tmp_path,
+            input_names=["codes_0", "codes_1", "codes_2"],
+            output_names=["audio"],
+            dynamic_axes={
+                "codes_0": {0: "batch", 1: "frames"},
+                "codes_1": {0: "batch", 1: "frames_x2"},
+                "codes_2": {0: "batch", 1: "frames_x4"},
+                "audio": {0: "batch", 2: "samples"},
+            },
+            opset_version=ONNX_OPSET,
+            dynamo=False,
+        )
+    os.replace(tmp_path, path)
+
+class OnnxSnacDecoder:
+    """ONNX Runtime session for the exported SNAC decode graph (CPU execution provider)."""
+    def __init__(self, path: str, intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+                 inter_op_threads: int = ONNX_INTER_OP_THREADS):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    def decode(self, batch: np.ndarray, window_frames: int) -> np.ndarray:
+        """Decode a (batch, 7 * window_frames) deinterleave_codes() stack; returns float32 audio (batch, samples)."""
+        batch = batch.astype(np.int64)
+        audio = self.session.run(None, {
+            "codes_0": batch[:, :window_frames],
+            "codes_1": batch[:, window_frames:3 * window_frames],
+            "codes_2": batch[:, 3 * window_frames:],
+        })[0]
+        return audio[:, 0]
+
+def decoder_path(model, cache_dir: str = ONNX_CACHE_DIR, int8: bool = False) -> str:
+    """Cache file of the exported (and optionally quantized) graph for model."""
+    suffix = "_int8" if int8 else ""
+    return os.path.join(cache_dir, f"snac_decoder_{model_fingerprint(model)}_opset{ONNX_OPSET}{suffix}.onnx")
+
+def load_decoder(model, cache_dir: str = ONNX_CACHE_DIR, int8: bool = False,
+                 staged_dir: Optional[str] = None) -> OnnxSnacDecoder:
+    """
+    ONNX decoder for model. Uses the graph staged in staged_dir (tts_engine.artifacts)
+    if there is one, else exports (and quantizes) it into cache_dir on first use.
+    """
+    path = decoder_path(model, cache_dir, int8)
+    staged = os.path.join(staged_dir, os.path.basename(path)) if staged_dir else None
+    if staged and os.path.exists(staged):
+        path = staged
+        logger.info(f"Loading staged SNAC ONNX graph from {path}")
+    elif os.path.exists(path):
+        logger.info(f"Loading cached SNAC ONNX graph from {path}")
+    else:
+        logger.info(f"Exporting {'int8-quantized ' if int8 else ''}SNAC decoder to ONNX at {path}")
+        export_decoder(model, path, int8)
+    decoder = OnnxSnacDecoder(path)
+    logger.info(f"SNAC decoder running on ONNX Runtime {ort.__version__}{' (int8)' if int8 else ''} "
+                f"(intra-op threads {ONNX_INTRA_OP_THREADS or 'auto'}, inter-op threads {ONNX_INTER_OP_THREADS})")
+    return decoder
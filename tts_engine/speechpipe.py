@@ -1,12 +1,16 @@
-from snac import SNAC
 import numpy as np
-import torch
-import asyncio
 import threading
-import queue
 import time
 import os
+import re
 import sys
+import logging
+import copy
+import functools
+
+from . import decode_workers, governor, pipeline
+
+logger = logging.getLogger(__name__)
 
 # Helper to detect if running in Uvicorn's reloader (same as in inference.py)
 def is_reloader_process():
@@ -17,132 +21,480 @@ def is_reloader_process():
 # Set a flag to avoid repeat messages
 IS_RELOADER = is_reloader_process()
 
-# Try to enable torch.compile if PyTorch 2.0+ is available
+# torch and SNAC are imported, and the model is loaded, by initialize(): the
+# engine initializer calls it at startup, and the first decode does otherwise.
+# Importing this module stays cheap (token parsing, voice lists, CLI help).
+torch = None
 TORCH_COMPILE_AVAILABLE = False
+CUDA_GRAPHS_AVAILABLE = False
+
+# SNAC decoder backend: "torch" (eager PyTorch) or "onnx" (ONNX Runtime, CPU only)
+SNAC_BACKENDS = ("torch", "onnx")
+SNAC_BACKEND = os.environ.get("ORPHEUS_SNAC_BACKEND", "torch").strip().lower()
+if SNAC_BACKEND not in SNAC_BACKENDS:
+    logger.warning(f"Invalid ORPHEUS_SNAC_BACKEND value '{SNAC_BACKEND}', using 'torch' as fallback")
+    SNAC_BACKEND = "torch"
+
+# Decoder precision: "float32"; "int8" (dynamically quantized, runs on the ONNX
+# backend); or "bfloat16" / "float16" (PyTorch backend, after a startup self-test)
+SNAC_PRECISIONS = ("float32", "int8", "bfloat16", "float16")
+SNAC_PRECISION = os.environ.get("ORPHEUS_SNAC_PRECISION", "float32").strip().lower()
+if SNAC_PRECISION not in SNAC_PRECISIONS:
+    logger.warning(f"Invalid ORPHEUS_SNAC_PRECISION value '{SNAC_PRECISION}', using 'float32' as fallback")
+    SNAC_PRECISION = "float32"
+if SNAC_PRECISION == "int8" and SNAC_BACKEND != "onnx":
+    logger.info("ORPHEUS_SNAC_PRECISION=int8 runs on the ONNX backend")
+    SNAC_BACKEND = "onnx"
+
 try:
-    if hasattr(torch, 'compile'):
-        TORCH_COMPILE_AVAILABLE = True
+    # Lowest SNR against float32 at which a reduced precision passes the startup self-test
+    PRECISION_MIN_SNR = float(os.environ.get("ORPHEUS_SNAC_PRECISION_MIN_SNR", "30"))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_SNAC_PRECISION_MIN_SNR value, using 30 dB as fallback")
+    PRECISION_MIN_SNR = 30.0
+
+# Frames in the self-test's reference window
+PRECISION_TEST_FRAMES = 8
+
+# Set by initialize(). Reading them as attributes of this module (speechpipe.model)
+# initializes on demand; code in this module calls initialize() first instead.
+_LAZY_ATTRIBUTES = ("model", "snac_device", "onnx_decoder", "SNAC_DTYPE", "cuda_stream")
+_initialized = False
+_init_lock = threading.Lock()
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        initialize()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def precision_supported(dtype, device=None):
+    """Whether the device has native kernels for dtype; MPS is left to the self-test."""
+    device = device or snac_device
+    if device == "cuda":
+        return dtype == torch.float16 or torch.cuda.is_bf16_supported()
+    if device == "cpu":
+        # oneDNN reports whether the CPU has bf16 / fp16 instructions (AVX512-BF16, AMX, AVX512-FP16)
+        check = "_is_mkldnn_bf16_supported" if dtype == torch.bfloat16 else "_is_mkldnn_fp16_supported"
+        try:
+            return bool(getattr(torch.ops.mkldnn, check)())
+        except (AttributeError, RuntimeError):
+            return False
+    return True
+
+def precision_self_test(candidate, reference=None, frames=PRECISION_TEST_FRAMES):
+    """
+    SNR in dB of candidate's decode against the float32 reference model on a
+    fixed window of codes. Both models run with SNAC's noise blocks bypassed,
+    so the result measures only the precision loss. Returns -inf if the
+    candidate produces non-finite audio.
+    """
+    from snac.layers import NoiseBlock
+    reference = reference if reference is not None else model
+    generator = torch.Generator().manual_seed(0)
+    codes = [torch.randint(0, 4096, (1, frames * stride), generator=generator).to(snac_device)
+             for stride in (1, 2, 4)]
+    noise_blocks = {module for net in (reference, candidate) for module in net.modules()
+                    if isinstance(module, NoiseBlock)}
+    for module in noise_blocks:
+        module.forward = lambda x: x
+    try:
+        with torch.inference_mode():
+            expected = reference.decode(codes).float()
+            actual = candidate.decode(codes).float()
+    finally:
+        for module in noise_blocks:
+            del module.forward
+    if not torch.isfinite(actual).all():
+        return float("-inf")
+    error = (expected - actual).pow(2).sum()
+    if error == 0:
+        return float("inf")
+    return float(10 * torch.log10(expected.pow(2).sum() / error))
+
+def _reduced_precision_model(precision):
+    """model converted to precision if the device supports it and the self-test passes, else None."""
+    dtype = getattr(torch, precision)
+    if onnx_decoder is not None:
+        logger.warning(f"ORPHEUS_SNAC_PRECISION={precision} applies to the PyTorch backend; ONNX runs float32")
+        return None
+    if not precision_supported(dtype):
+        logger.warning(f"{snac_device} has no native {precision} support; using float32")
+        return None
+    try:
+        candidate = copy.deepcopy(model).to(dtype)
+        snr = precision_self_test(candidate)
+    except Exception as e:
+        logger.warning(f"{precision} self-test failed to run ({e}); using float32")
+        return None
+    if snr < PRECISION_MIN_SNR:
+        logger.warning(f"{precision} self-test SNR {snr:.1f} dB is below {PRECISION_MIN_SNR:g} dB; using float32")
+        return None
+    logger.info(f"SNAC decoder running in {precision} (self-test SNR {snr:.1f} dB against float32)")
+    return candidate
+
+def initialize():
+    """
+    Import torch and SNAC, size torch's threads (governor), load the model
+    onto the best device and set up the configured backend and precision.
+    Runs once per process; later calls return immediately.
+    """
+    global torch, model, snac_device, onnx_decoder, SNAC_DTYPE, cuda_stream
+    global TORCH_COMPILE_AVAILABLE, CUDA_GRAPHS_AVAILABLE, _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        start = phase_start = time.perf_counter()
+        # Seconds per load phase, logged once the decoder is ready
+        phases = {}
+        import torch as torch_module
+        import snac  # noqa: F401 (imported here so the phases below only time loading)
+        from . import artifacts, snac_onnx
+        torch = torch_module
+        phases["import"] = time.perf_counter() - phase_start
+
+        # Try to enable torch.compile if PyTorch 2.0+ is available
+        try:
+            if hasattr(torch, 'compile'):
+                TORCH_COMPILE_AVAILABLE = True
+                if not IS_RELOADER:
+                    logger.info("PyTorch 2.0+ detected, torch.compile is available")
+        except:
+            pass
+
+        # Try to enable CUDA graphs if available
+        try:
+            if torch.cuda.is_available() and hasattr(torch.cuda, 'make_graphed_callables'):
+                CUDA_GRAPHS_AVAILABLE = True
+                if not IS_RELOADER:
+                    logger.info("CUDA graphs support is available")
+        except:
+            pass
+
+        # Size torch's thread pools from the container's CPU quota before any decode runs
+        governor.configure()
         if not IS_RELOADER:
-            print("PyTorch 2.0+ detected, torch.compile is available")
-except:
-    pass
+            logger.info(f"CPU budget {governor.CPU_BUDGET} ({governor.CPU_BUDGET_SOURCE}): "
+                        f"{governor.INTRA_OP_THREADS} torch threads per decode, {governor.DECODE_SLOTS} decode slots")
 
-# Try to enable CUDA graphs if available
-CUDA_GRAPHS_AVAILABLE = False
-try:
-    if torch.cuda.is_available() and hasattr(torch.cuda, 'make_graphed_callables'):
-        CUDA_GRAPHS_AVAILABLE = True
+        # A staged artifact is memory-mapped without touching the network; otherwise the hub is used
+        model, artifact_path = artifacts.load_snac(phases)
+
+        # Check if CUDA is available and set device accordingly
+        snac_device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
         if not IS_RELOADER:
-            print("CUDA graphs support is available")
-except:
-    pass
+            logger.info(f"Using device: {snac_device}")
+        phase_start = time.perf_counter()
+        model = model.to(snac_device)
+        phases["device"] = time.perf_counter() - phase_start
 
-model = SNAC.from_pretrained("hubertsiuzdak/snac_24khz").eval()
+        # Disable torch.compile as it requires Triton which isn't installed
+        # We'll use regular PyTorch optimization techniques instead
+        if not IS_RELOADER:
+            logger.info("Using standard PyTorch optimizations (torch.compile disabled)")
 
-# Check if CUDA is available and set device accordingly
-snac_device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
-if not IS_RELOADER:
-    print(f"Using device: {snac_device}")
-model = model.to(snac_device)
+        onnx_decoder = None
+        phase_start = time.perf_counter()
+        if SNAC_BACKEND == "onnx":
+            if snac_device != "cpu":
+                logger.warning(f"ORPHEUS_SNAC_BACKEND=onnx only runs on CPU; using float32 PyTorch on {snac_device}")
+            elif not snac_onnx.ONNXRUNTIME_AVAILABLE:
+                logger.warning("ORPHEUS_SNAC_BACKEND=onnx but onnxruntime is not installed; using float32 PyTorch")
+            else:
+                try:
+                    onnx_decoder = snac_onnx.load_decoder(model, int8=SNAC_PRECISION == "int8",
+                                                          staged_dir=artifact_path)
+                except Exception as e:
+                    logger.exception(f"Could not load the SNAC ONNX decoder, using float32 PyTorch: {e}")
+            phases["onnx"] = time.perf_counter() - phase_start
+
+        SNAC_DTYPE = torch.float32
+        if SNAC_PRECISION in ("bfloat16", "float16"):
+            phase_start = time.perf_counter()
+            reduced_model = _reduced_precision_model(SNAC_PRECISION)
+            if reduced_model is not None:
+                model, SNAC_DTYPE = reduced_model, getattr(torch, SNAC_PRECISION)
+            phases["precision"] = time.perf_counter() - phase_start
+
+        # Prepare CUDA streams for parallel processing if available
+        cuda_stream = None
+        if snac_device == "cuda":
+            cuda_stream = torch.cuda.Stream()
+            if not IS_RELOADER:
+                logger.info("Using CUDA stream for parallel processing")
 
-# Disable torch.compile as it requires Triton which isn't installed
-# We'll use regular PyTorch optimization techniques instead
-if not IS_RELOADER:
-    print("Using standard PyTorch optimizations (torch.compile disabled)")
+        _initialized = True
+        # Always logged: only a process that loads the model gets here
+        logger.info(f"SNAC decoder ready in {time.perf_counter() - start:.2f} s "
+                    f"({', '.join(f'{name} {seconds:.2f} s' for name, seconds in phases.items())})")
 
-# Prepare CUDA streams for parallel processing if available
-cuda_stream = None
-if snac_device == "cuda":
-    cuda_stream = torch.cuda.Stream()
-    if not IS_RELOADER:
-        print("Using CUDA stream for parallel processing")
 
+# Position of each token within a 7-token frame, grouped by SNAC code level:
+# level 0 <- [0], level 1 <- [1, 4], level 2 <- [2, 3, 5, 6]
+FRAME_CODE_POSITIONS = ((0,), (1, 4), (2, 3, 5, 6))
+
+@functools.lru_cache(maxsize=64)
+def _deinterleave_index(num_frames):
+    """Flat gather index that puts all level-0 codes first, then level 1, then level 2."""
+    frames = np.arange(num_frames * 7).reshape(num_frames, 7)
+    index = np.concatenate([frames[:, list(positions)].ravel() for positions in FRAME_CODE_POSITIONS])
+    index.setflags(write=False)
+    return index
+
+def deinterleave_codes(multiframe):
+    """
+    Split whole 7-token frames into the three SNAC code levels on the host.
+    
+    Returns (codes, num_frames): codes is one contiguous int32 array holding the
+    num_frames level-0 codes, then 2 * num_frames level-1 codes, then
+    4 * num_frames level-2 codes. Returns None if there is no complete frame or
+    any code is outside 0..4096.
+    """
+    num_frames = len(multiframe) // 7
+    if num_frames == 0:
+        return None
+    tokens = np.asarray(multiframe[:num_frames * 7], dtype=np.int32)
+    codes = tokens[_deinterleave_index(num_frames)]
+    # One reduction checks both bounds: negative codes wrap to huge unsigned values
+    if codes.view(np.uint32).max() > 4096:
+        return None
+    return codes, num_frames
+
+# Each 7-token frame decodes to 2048 samples at 24 kHz
+SAMPLES_PER_FRAME = 2048
 
 def convert_to_audio(multiframe, count):
     """
     Optimized version of convert_to_audio that eliminates inefficient tensor operations
     and reduces CPU-GPU transfers for much faster inference on high-end GPUs.
+    
+    multiframe is a list of token IDs or an int32 np.ndarray (e.g. a
+    TokenRingBuffer window view). The sliding-window decoders keep only the
+    second frame of each window; see decode_frames.
+    """
+    return decode_frames(multiframe, 1, 1)
+
+def decode_frames(multiframe, first_frame, num_frames):
     """
-    if len(multiframe) < 7:
+    Decode a window of 7-token frames and return int16 PCM bytes for frames
+    first_frame .. first_frame + num_frames - 1 of it; the other frames only
+    give the decoder context. Codes are de-interleaved and validated on the
+    host, then uploaded with a single copy. Returns None for invalid windows.
+    """
+    deinterleaved = deinterleave_codes(multiframe)
+    if deinterleaved is None:
         return None
-  
-    num_frames = len(multiframe) // 7
-    frame = multiframe[:num_frames*7]
+    host_codes, window_frames = deinterleaved
+    return decode_code_windows([host_codes], window_frames, [(first_frame, num_frames)])[0]
+
+def decode_code_windows(host_codes, window_frames, keep):
+    """
+    Decode several windows of the same length with one batched model.decode
+    (or one ONNX Runtime call with ORPHEUS_SNAC_BACKEND=onnx), in a decode
+    worker process when ORPHEUS_DECODE_WORKERS is set.
     
-    # Pre-allocate tensors instead of incrementally building them
-    codes_0 = torch.zeros(num_frames, dtype=torch.int32, device=snac_device)
-    codes_1 = torch.zeros(num_frames * 2, dtype=torch.int32, device=snac_device)
-    codes_2 = torch.zeros(num_frames * 4, dtype=torch.int32, device=snac_device)
+    host_codes holds deinterleave_codes() arrays of window_frames frames each;
+    keep holds one (first_frame, num_frames) pair per window. Returns the PCM
+    bytes of each window's kept frames, in order.
+    """
+    pool = decode_workers.get_pool()
+    if pool is not None:
+        audio = pool.decode(host_codes, window_frames, keep)
+        if audio is not None:
+            return audio
+    if not _initialized:
+        initialize()
     
-    # Use vectorized operations where possible
-    frame_tensor = torch.tensor(frame, dtype=torch.int32, device=snac_device)
+    batch = host_codes[0][np.newaxis] if len(host_codes) == 1 else np.stack(host_codes)
     
-    # Direct indexing is much faster than concatenation in a loop
-    for j in range(num_frames):
-        idx = j * 7
-        
-        # Code 0 - single value per frame
-        codes_0[j] = frame_tensor[idx]
-        
-        # Code 1 - two values per frame
-        codes_1[j*2] = frame_tensor[idx+1]
-        codes_1[j*2+1] = frame_tensor[idx+4]
-        
-        # Code 2 - four values per frame
-        codes_2[j*4] = frame_tensor[idx+2]
-        codes_2[j*4+1] = frame_tensor[idx+3]
-        codes_2[j*4+2] = frame_tensor[idx+5]
-        codes_2[j*4+3] = frame_tensor[idx+6]
+    if onnx_decoder is not None:
+        with governor.decode_slot():
+            audio = onnx_decoder.decode(batch, window_frames)
+        return [(audio[i, first_frame * SAMPLES_PER_FRAME:(first_frame + num_frames) * SAMPLES_PER_FRAME] * 32767)
+                .astype(np.int16).tobytes() for i, (first_frame, num_frames) in enumerate(keep)]
     
-    # Reshape codes into expected format
+    # The three code levels are views into one device tensor
+    codes_tensor = torch.from_numpy(batch).to(snac_device)
     codes = [
-        codes_0.unsqueeze(0), 
-        codes_1.unsqueeze(0), 
-        codes_2.unsqueeze(0)
+        codes_tensor[:, :window_frames],
+        codes_tensor[:, window_frames:3 * window_frames],
+        codes_tensor[:, 3 * window_frames:]
     ]
-    
-    # Check tokens are in valid range
-    if (torch.any(codes[0] < 0) or torch.any(codes[0] > 4096) or 
-        torch.any(codes[1] < 0) or torch.any(codes[1] > 4096) or 
-        torch.any(codes[2] < 0) or torch.any(codes[2] > 4096)):
-        return None
 
     # Use CUDA stream for parallel processing if available
     stream_ctx = torch.cuda.stream(cuda_stream) if cuda_stream is not None else torch.no_grad()
     
     with stream_ctx, torch.inference_mode():
-        # Decode the audio
-        audio_hat = model.decode(codes)
+        # Decode the audio; reduced-precision output is scaled to int16 in float32
+        with governor.decode_slot():
+            audio_hat = model.decode(codes).float()
         
-        # Extract the relevant slice and efficiently convert to bytes
+        # Extract the relevant slices and efficiently convert to bytes
         # Keep data on GPU as long as possible
-        audio_slice = audio_hat[:, :, 2048:4096]
+        audio_slices = [audio_hat[i, :, first_frame * SAMPLES_PER_FRAME:(first_frame + num_frames) * SAMPLES_PER_FRAME]
+                        for i, (first_frame, num_frames) in enumerate(keep)]
         
         # Process on GPU if possible, with minimal data transfer
         if snac_device == "cuda":
             # Scale directly on GPU
-            audio_int16_tensor = (audio_slice * 32767).to(torch.int16)
-            # Only transfer the final result to CPU
-            audio_bytes = audio_int16_tensor.cpu().numpy().tobytes()
+            audio_int16_tensor = (torch.cat(audio_slices, dim=-1) * 32767).to(torch.int16)
+            # Only transfer the final result to CPU, in one copy for the whole batch
+            audio_int16 = audio_int16_tensor.cpu().numpy()
+            offsets = np.cumsum([audio_slice.shape[-1] for audio_slice in audio_slices])[:-1]
+            audio_bytes = [part.tobytes() for part in np.split(audio_int16, offsets, axis=-1)]
         else:
             # For non-CUDA devices, fall back to the original approach
-            detached_audio = audio_slice.detach().cpu()
-            audio_np = detached_audio.numpy()
-            audio_int16 = (audio_np * 32767).astype(np.int16)
-            audio_bytes = audio_int16.tobytes()
+            audio_bytes = []
+            for audio_slice in audio_slices:
+                audio_np = audio_slice.detach().cpu().numpy()
+                audio_bytes.append((audio_np * 32767).astype(np.int16).tobytes())
             
     return audio_bytes
 
+def decode_utterance(token_ids, first_frame, segment_frames, context_frames, max_batch):
+    """
+    Decode a complete token sequence in a few large SNAC calls, for responses
+    that are delivered whole rather than streamed.
+
+    Yields the PCM bytes of frames first_frame .. end, one segment of up to
+    segment_frames frames at a time. Each segment is decoded with
+    context_frames frames of context on both sides; every window has the same
+    length (the last one is shifted left to end at the final frame), so they
+    are decoded max_batch at a time. A sequence that fits in one window is
+    decoded in a single pass. Frames with codes outside 0..4096 are dropped
+    before decoding, and first_frame counts the frames that remain.
+    """
+    num_frames = len(token_ids) // 7
+    frames = np.asarray(token_ids[:num_frames * 7], dtype=np.int32).reshape(num_frames, 7)
+    valid = frames.view(np.uint32).max(axis=1) <= 4096
+    if not valid.all():
+        logger.warning(f"Dropping {num_frames - int(valid.sum())} of {num_frames} frames with invalid codes")
+        frames = frames[valid]
+        num_frames = len(frames)
+    if num_frames <= first_frame:
+        return
+
+    window_frames = min(num_frames, segment_frames + 2 * context_frames)
+    windows = []
+    next_frame = first_frame
+    while next_frame < num_frames:
+        start = min(max(0, next_frame - context_frames), num_frames - window_frames)
+        end = min(next_frame + segment_frames, num_frames)
+        windows.append((start, next_frame - start, end - next_frame))
+        next_frame = end
+
+    for i in range(0, len(windows), max_batch):
+        batch = windows[i:i + max_batch]
+        host_codes = [deinterleave_codes(frames[start:start + window_frames].ravel())[0]
+                      for start, _, _ in batch]
+        yield from decode_code_windows(host_codes, window_frames, [(first, count) for _, first, count in batch])
+
+# Startup warm-up: the first decode of each window shape pays for kernel
+# selection, allocator growth and first-touch page faults, so run them before
+# the server reports ready
+WARMUP_ENABLED = os.environ.get("ORPHEUS_WARMUP", "true").strip().lower() in ("1", "true", "yes", "on")
+
+try:
+    # Tokens per warm-up window (7 per frame): one frame, the sliding window, seven frames
+    WARMUP_TOKENS = tuple(sorted({max(7, int(t) // 7 * 7)
+                                  for t in os.environ.get("ORPHEUS_WARMUP_TOKENS", "7,28,49").split(",")}))
+except (ValueError, TypeError):
+    logger.warning("Invalid ORPHEUS_WARMUP_TOKENS value, using 7,28,49 as fallback")
+    WARMUP_TOKENS = (7, 28, 49)
+
+_ready = threading.Event()
+
+def is_ready():
+    """Whether the decoder has finished its warm-up (or warm-up is disabled) and can serve at full speed."""
+    return _ready.is_set()
+
+def wait_until_ready(timeout=None):
+    """Block until is_ready(), or until timeout seconds have passed; returns is_ready()."""
+    return _ready.wait(timeout)
+
+def warm_up(batch_sizes=None):
+    """
+    Run representative decodes for each ORPHEUS_WARMUP_TOKENS window, logging
+    the first (cold) and second (warm) call of each, then mark the decoder
+    ready. With decode workers each worker warms itself before it starts, so
+    this only starts the pool; a decoder that is already ready is not warmed
+    again. Failures are logged; the decoder is marked
+    ready regardless, since it still works, only slower on first use.
+
+    batch_sizes defaults to 1, plus the largest batch when cross-request
+    batching is on. Returns {(tokens, batch): (cold seconds, warm seconds)}.
+    """
+    timings = {}
+    start = time.perf_counter()
+    try:
+        if not WARMUP_ENABLED:
+            logger.info("Decoder warm-up disabled (ORPHEUS_WARMUP=false)")
+            return timings
+        if decode_workers.get_pool() is not None:
+            logger.info("Decode workers warmed up before starting; skipping in-process warm-up")
+            return timings
+        if _ready.is_set():
+            # E.g. a worker forked from a process that had warmed up (tts_engine.prefork)
+            logger.info("Decoder already warmed up; skipping warm-up")
+            return timings
+        if batch_sizes is None:
+            from . import decode_scheduler
+            batch_sizes = (1, decode_scheduler.MAX_BATCH) if decode_scheduler.DECODE_BATCHING else (1,)
+        rng = np.random.default_rng(0)
+        for tokens in WARMUP_TOKENS:
+            window_frames = tokens // 7
+            for batch_size in sorted(set(batch_sizes)):
+                host_codes = [deinterleave_codes(rng.integers(0, 4096, tokens).astype(np.int32))[0]
+                              for _ in range(batch_size)]
+                keep = [(0, window_frames)] * batch_size
+                calls = []
+                for _ in range(2):
+                    call_start = time.perf_counter()
+                    decode_code_windows(host_codes, window_frames, keep)
+                    calls.append(time.perf_counter() - call_start)
+                timings[(tokens, batch_size)] = tuple(calls)
+                logger.info(f"Warm-up {tokens} tokens x {batch_size}: first decode {calls[0] * 1000:.1f} ms, "
+                            f"then {calls[1] * 1000:.1f} ms")
+        logger.info(f"Decoder warm-up finished in {time.perf_counter() - start:.2f} s")
+    except Exception as e:
+        logger.exception(f"Decoder warm-up failed after {time.perf_counter() - start:.2f} s: {e}")
+    finally:
+        _ready.set()
+    return timings
+
 # Define the custom token prefix
 CUSTOM_TOKEN_PREFIX = "<custom_token_"
 
-# Use a single global cache for token processing
-token_id_cache = {}
-MAX_CACHE_SIZE = 10000  # Increased cache size for better performance
+# SNAC code = N - 10 - (position % 7) * 4096, where N is the number in
+# <custom_token_N> and position counts the valid tokens before it. The offsets
+# are immutable, so the conversion needs no shared state between requests.
+POSITION_OFFSETS = tuple(10 + position * 4096 for position in range(7))
+_POSITION_OFFSETS_ARRAY = np.array(POSITION_OFFSETS, dtype=np.int64)
+_POSITION_OFFSETS_ARRAY.setflags(write=False)
+
+def custom_token_number(token_string):
+    """
+    Return N from a string ending in <custom_token_N>, or None.
+    
+    Surrounding whitespace is ignored and only the last token in the string
+    counts, matching how the model output has always been read.
+    """
+    token_string = token_string.rstrip()
+    if not token_string.endswith(">"):
+        return None
+    start = token_string.rfind(CUSTOM_TOKEN_PREFIX)
+    if start == -1:
+        return None
+    digits = token_string[start + len(CUSTOM_TOKEN_PREFIX):-1]
+    if not digits.isdecimal():
+        return None
+    return int(digits)
 
 def turn_token_into_id(token_string, index):
     """
-    Optimized token-to-ID conversion with caching.
+    Token-to-ID conversion for a single token string.
     This is the definitive implementation used by both inference.py and speechpipe.py.
     
     Args:
@@ -152,42 +504,138 @@ def turn_token_into_id(token_string, index):
     Returns:
         int: Token ID if valid, None otherwise
     """
-    # Check cache first (significant speedup for repeated tokens)
-    cache_key = (token_string, index % 7)
-    if cache_key in token_id_cache:
-        return token_id_cache[cache_key]
-        
-    # Early rejection for obvious non-matches
-    if CUSTOM_TOKEN_PREFIX not in token_string:
+    number = custom_token_number(token_string)
+    if number is None:
         return None
-        
-    # Process token
-    token_string = token_string.strip()
-    last_token_start = token_string.rfind(CUSTOM_TOKEN_PREFIX)
+    return number - POSITION_OFFSETS[index % 7]
+
+# Captures the number N of each <custom_token_N> in a block of generated text
+CUSTOM_TOKEN_NUMBER_PATTERN = re.compile(r'<custom_token_(\d+)>')
+
+def parse_custom_token_numbers(text):
+    """
+    Extract the raw custom token numbers from generated text in one pass.
     
-    if last_token_start == -1:
-        return None
+    Args:
+        text: Generated text containing <custom_token_N> entries
+        
+    Returns:
+        np.ndarray: int64 array of the N values, in order
+    """
+    numbers = CUSTOM_TOKEN_NUMBER_PATTERN.findall(text)
+    if not numbers:
+        return np.empty(0, dtype=np.int64)
+    # map(int) runs the conversion loop in C; faster than a unicode-array astype
+    return np.array(list(map(int, numbers)), dtype=np.int64)
+
+def token_numbers_to_ids(numbers, start_index):
+    """
+    Vectorized equivalent of calling turn_token_into_id on each token in order.
     
-    last_token = token_string[last_token_start:]
+    The offset of each token depends on its position among the *valid* tokens
+    seen so far (start_index counts those), so the fast path assumes every
+    token is valid and falls back to a sequential pass if any one is not.
     
-    if not (last_token.startswith(CUSTOM_TOKEN_PREFIX) and last_token.endswith(">")):
-        return None
-        
-    try:
-        number_str = last_token[14:-1]
-        token_id = int(number_str) - 10 - ((index % 7) * 4096)
+    Args:
+        numbers: Raw custom token numbers (see parse_custom_token_numbers)
+        start_index: Number of valid tokens already consumed by the decoder
         
-        # Cache the result if it's valid
-        if len(token_id_cache) < MAX_CACHE_SIZE:
-            token_id_cache[cache_key] = token_id
-            
-        return token_id
-    except (ValueError, IndexError):
-        return None
+    Returns:
+        np.ndarray: int64 array of valid token IDs (may be shorter than the input)
+    """
+    numbers = np.asarray(numbers, dtype=np.int64)
+    # Streaming yields a token or two per event; below a frame the per-call
+    # cost of the vectorized path outweighs the plain loop
+    if len(numbers) >= 7:
+        positions = (start_index + np.arange(len(numbers))) % 7
+        ids = numbers - _POSITION_OFFSETS_ARRAY[positions]
+        if ids.min() > 0:
+            return ids
+    
+    # An invalid token shifts the position of every token after it
+    valid = []
+    index = start_index
+    for number in numbers.tolist():
+        token_id = number - POSITION_OFFSETS[index % 7]
+        if token_id > 0:
+            valid.append(token_id)
+            index += 1
+    return np.array(valid, dtype=np.int64)
+
+def token_ids_from_chunk(chunk, start_index):
+    """
+    Convert one item from a token generator to valid token IDs.
+    
+    Generators yield either single token strings or np.ndarray chunks of raw
+    custom token numbers; both become an int64 array of IDs.
+    """
+    if isinstance(chunk, np.ndarray):
+        return token_numbers_to_ids(chunk, start_index)
+    token = turn_token_into_id(chunk, start_index)
+    if token is not None and token > 0:
+        return np.array([token], dtype=np.int64)
+    return np.empty(0, dtype=np.int64)
+
+class TokenRingBuffer:
+    """
+    Fixed-size history of the most recent token IDs for the sliding-window decoders.
+    
+    Every token is stored twice, at (i % capacity) and (i % capacity) + capacity,
+    so the last n <= capacity tokens always form one contiguous slice of the
+    backing array: window() returns a view, never a copy, and memory stays
+    constant however long the generation runs.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=np.int32)
+        self.count = 0  # tokens written so far
+    
+    def __len__(self):
+        return min(self.count, self.capacity)
+    
+    def extend(self, token_ids):
+        n = len(token_ids)
+        if n == 0:
+            return
+        capacity = self.capacity
+        if n == 1:
+            # Streaming backends deliver one token per chunk; skip the slicing
+            index = self.count % capacity
+            self._data[index] = self._data[index + capacity] = token_ids[0]
+            self.count += 1
+            return
+        if n > capacity:
+            # Only the newest `capacity` tokens can ever be read back
+            self.count += n - capacity
+            token_ids = token_ids[-capacity:]
+            n = capacity
+        data = self._data
+        start = self.count % capacity
+        head = min(n, capacity - start)
+        data[start:start + head] = token_ids[:head]
+        data[start + capacity:start + capacity + head] = token_ids[:head]
+        if head < n:
+            data[:n - head] = token_ids[head:]
+            data[capacity:capacity + n - head] = token_ids[head:]
+        self.count += n
+    
+    def window(self, size, end=None):
+        """
+        View of the `size` tokens before absolute position `end` (default: the
+        newest tokens). Only valid until the next extend().
+        """
+        if end is None:
+            end = self.count
+        if end > self.count or end - size < self.count - len(self) or size < 0:
+            raise ValueError(f"window [{end - size}, {end}) is not buffered "
+                             f"(have [{self.count - len(self)}, {self.count}))")
+        start = (end - size) % self.capacity
+        return self._data[start:start + size]
 
 async def tokens_decoder(token_gen):
     """Optimized token decoder with early first-chunk processing for lower latency"""
-    buffer = []
+    # Preallocated history sized to the largest window; see TokenRingBuffer
+    ring = TokenRingBuffer(49)
     count = 0
     
     # Track if first chunk has been processed
@@ -202,167 +650,143 @@ async def tokens_decoder(token_gen):
     start_time = time.time()
     token_count = 0
     last_log_time = start_time
+    # Decided once per request so the per-chunk path skips the clock when INFO is off
+    log_rates = logger.isEnabledFor(logging.INFO)
     
-    async for token_sim in token_gen:
-        token_count += 1
+    async for chunk in token_gen:
+        # Strings and raw-number arrays both become an array of valid token IDs
+        token_ids = token_ids_from_chunk(chunk, count)
+        if token_ids.size == 0:
+            continue
         
-        # Use the unified turn_token_into_id which already handles caching
-        token = turn_token_into_id(token_sim, count)
-        
-        if token is not None and token > 0:
-            buffer.append(token)
-            count += 1
+        previous_count = count
+        count += token_ids.size
+        token_count += token_ids.size
+        written = 0
 
-            # Log throughput periodically
+        # Log throughput periodically
+        if log_rates:
             current_time = time.time()
             if current_time - last_log_time > 5.0:  # Every 5 seconds
                 elapsed = current_time - last_log_time
                 if elapsed > 0:
                     recent_tokens = token_count
                     tokens_per_sec = recent_tokens / elapsed
-                    print(f"Token processing rate: {tokens_per_sec:.1f} tokens/second")
+                    logger.info(f"Token processing rate: {tokens_per_sec:.1f} tokens/second")
                 last_log_time = current_time
                 token_count = 0
+        
+        # Visit every frame boundary this chunk crossed, in order
+        for boundary in range(previous_count - previous_count % process_every_n + process_every_n,
+                              count + 1, process_every_n):
+            # Write up to this boundary only, so its window is still in the ring
+            ring.extend(token_ids[written:boundary - previous_count])
+            written = boundary - previous_count
             
             # Different processing logic based on whether first chunk has been processed
             if not first_chunk_processed:
                 # Process first chunk as soon as possible for minimal latency
-                if count >= min_frames_first:
-                    buffer_to_proc = buffer[-min_frames_first:]
-                    
-                    # Process the first chunk of audio for immediate feedback
-                    print(f"Processing first audio chunk with {len(buffer_to_proc)} tokens for low latency")
-                    audio_samples = convert_to_audio(buffer_to_proc, count)
-                    if audio_samples is not None:
-                        first_chunk_processed = True  # Mark first chunk as processed
-                        yield audio_samples
+                buffer_to_proc = ring.window(min_frames_first)
+                
+                # Process the first chunk of audio for immediate feedback
+                logger.debug(f"Processing first audio chunk with {len(buffer_to_proc)} tokens for low latency")
+                audio_samples = convert_to_audio(buffer_to_proc, boundary)
+                if audio_samples is not None:
+                    first_chunk_processed = True  # Mark first chunk as processed
+                    yield audio_samples
             else:
-                # For subsequent chunks, use original processing with proper batching
-                if count % process_every_n == 0:
-                    # Use same prioritization logic as before
-                    if len(buffer) >= ideal_frames:
-                        buffer_to_proc = buffer[-ideal_frames:]
-                    elif len(buffer) >= min_frames_subsequent:
-                        buffer_to_proc = buffer[-min_frames_subsequent:]
-                    else:
-                        continue
-                    
-                    # Debug output to help diagnose issues
-                    if count % 28 == 0:
-                        print(f"Processing buffer with {len(buffer_to_proc)} tokens, total collected: {len(buffer)}")
-                    
-                    # Process the tokens
-                    audio_samples = convert_to_audio(buffer_to_proc, count)
-                    if audio_samples is not None:
-                        yield audio_samples
+                # Use same prioritization logic as before
+                if boundary >= ideal_frames:
+                    buffer_to_proc = ring.window(ideal_frames)
+                elif boundary >= min_frames_subsequent:
+                    buffer_to_proc = ring.window(min_frames_subsequent)
+                else:
+                    continue
+                
+                # Debug output to help diagnose issues
+                if boundary % 28 == 0 and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Processing buffer with {len(buffer_to_proc)} tokens, total collected: {boundary}")
+                
+                # Process the tokens
+                audio_samples = convert_to_audio(buffer_to_proc, boundary)
+                if audio_samples is not None:
+                    yield audio_samples
+        
+        if written < token_ids.size:
+            ring.extend(token_ids[written:])
     
     # CRITICAL: End-of-generation handling - process all remaining frames
     # Process remaining complete frames (ideal size)
-    if len(buffer) >= ideal_frames:
-        buffer_to_proc = buffer[-ideal_frames:]
+    if count >= ideal_frames:
+        buffer_to_proc = ring.window(ideal_frames)
         audio_samples = convert_to_audio(buffer_to_proc, count)
         if audio_samples is not None:
             yield audio_samples
             
     # Process any additional complete frames (minimum size)
-    elif len(buffer) >= min_frames_subsequent:
-        buffer_to_proc = buffer[-min_frames_subsequent:]
+    elif count >= min_frames_subsequent:
+        buffer_to_proc = ring.window(min_frames_subsequent)
         audio_samples = convert_to_audio(buffer_to_proc, count)
         if audio_samples is not None:
             yield audio_samples
             
     # Final special case: even if we don't have minimum frames, try to process
     # what we have by padding with silence tokens that won't affect the audio
-    elif len(buffer) >= process_every_n:
+    elif count >= process_every_n:
         # Pad to minimum frame requirement with copies of the final token
         # This is more continuous than using unrelated tokens from the beginning
-        last_token = buffer[-1]
-        padding_needed = min_frames_subsequent - len(buffer)
+        buffered = ring.window(count)
+        padding_needed = min_frames_subsequent - count
         
         # Create a padding array of copies of the last token
         # This maintains continuity much better than circular buffering
-        padding = [last_token] * padding_needed
-        padded_buffer = buffer + padding
+        padding = np.full(padding_needed, buffered[-1], dtype=buffered.dtype)
+        padded_buffer = np.concatenate((buffered, padding))
         
-        print(f"Processing final partial frame: {len(buffer)} tokens + {padding_needed} repeated-token padding")
+        logger.debug(f"Processing final partial frame: {count} tokens + {padding_needed} repeated-token padding")
         audio_samples = convert_to_audio(padded_buffer, count)
         if audio_samples is not None:
             yield audio_samples
 # ------------------ Synchronous Tokens Decoder Wrapper ------------------ #
 def tokens_decoder_sync(syn_token_gen):
-    """Optimized synchronous decoder with larger queue and parallel processing"""
+    """Optimized synchronous decoder running on a long-lived pipeline worker"""
+    initialize()
     # Use a larger queue for RTX 4090 to maximize GPU utilization
     max_queue_size = 32 if snac_device == "cuda" else 8
-    audio_queue = queue.Queue(maxsize=max_queue_size)
-    
-    # Collect tokens in batches for higher throughput
-    batch_size = 16 if snac_device == "cuda" else 4
     
-    # Convert the synchronous token generator into an async generator with batching
-    async def async_token_gen():
-        token_batch = []
-        for token in syn_token_gen:
-            token_batch.append(token)
-            # Process in batches for efficiency
-            if len(token_batch) >= batch_size:
-                for t in token_batch:
-                    yield t
-                token_batch = []
-        # Process any remaining tokens
-        for t in token_batch:
-            yield t
-
-    async def async_producer():
-        # Start timer for performance logging
-        start_time = time.time()
-        chunk_count = 0
-        
-        try:
-            # Process audio chunks from the token decoder
-            async for audio_chunk in tokens_decoder(async_token_gen()):
-                if audio_chunk:  # Validate audio chunk before adding to queue
-                    audio_queue.put(audio_chunk)
-                    chunk_count += 1
-                    
-                    # Log performance stats periodically
-                    if chunk_count % 10 == 0:
-                        elapsed = time.time() - start_time
-                        print(f"Generated {chunk_count} chunks in {elapsed:.2f}s ({chunk_count/elapsed:.2f} chunks/sec)")
-        except Exception as e:
-            print(f"Error in audio producer: {e}")
-            import traceback
-            traceback.print_exc()
-        finally:    
-            # Signal completion
-            print("Audio producer completed - finalizing all chunks")
-            audio_queue.put(None)  # Sentinel
-
-    def run_async():
-        asyncio.run(async_producer())
-
-    # Use a higher priority thread for RTX 4090 to ensure it stays fed with work
-    thread = threading.Thread(target=run_async)
-    thread.daemon = True  # Allow the thread to be terminated when the main thread exits
-    thread.start()
+    # Token chunks arrive pre-batched, so they are forwarded without extra buffering
+    stream = pipeline.submit(tokens_decoder, syn_token_gen, max_queue_size)
 
     # Use larger buffer for final audio assembly
     buffer_size = 5
     audio_buffer = []
     
-    while True:
-        audio = audio_queue.get()
-        if audio is None:
-            break
-        
-        audio_buffer.append(audio)
-        # Yield buffered audio chunks for smoother playback
-        if len(audio_buffer) >= buffer_size:
-            for chunk in audio_buffer:
-                yield chunk
-            audio_buffer = []
+    # Start timer for performance logging
+    start_time = time.time()
+    chunk_count = 0
+    
+    try:
+        for audio in stream:
+            audio_buffer.append(audio)
+            chunk_count += 1
+            
+            # Log performance stats periodically
+            if chunk_count % 10 == 0 and logger.isEnabledFor(logging.DEBUG):
+                elapsed = time.time() - start_time
+                logger.debug(f"Generated {chunk_count} chunks in {elapsed:.2f}s ({chunk_count/elapsed:.2f} chunks/sec)")
+            
+            # Yield buffered audio chunks for smoother playback
+            if len(audio_buffer) >= buffer_size:
+                for chunk in audio_buffer:
+                    yield chunk
+                audio_buffer = []
+    finally:
+        # Stops the decoder if the caller stops reading early
+        stream.close()
+    
+    if stream.error is not None:
+        logger.error(f"Error in audio producer: {stream.error}", exc_info=stream.error)
     
     # Yield any remaining audio in the buffer
     for chunk in audio_buffer:
         yield chunk
-
-    thread.join()